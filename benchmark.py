@@ -0,0 +1,585 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course,
+# and is released under the "MIT License Agreement". Please see the LICENSE
+# file that should have been included as part of this package.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+
+"""
+benchmark
+~~~~~~~~~~~~~~~~~
+
+This module provides micro and load benchmarks for the daemon package.
+
+The ``backend`` benchmark starts ``start_backend.py`` in a subprocess for each
+serving mode and opens N concurrent client connections against it from a
+single selectors-driven client, reporting throughput, latency percentiles
+and the requests shed with ``503`` (``pool`` mode).
+
+The ``routing`` micro-benchmark measures the per-request cost of matching a
+``Host`` header with the compiled proxy routing table, alone and with the
+upstream pick, next to the dictionary lookups and string splitting it
+replaced (which had no wildcards, health checks or balancing).
+
+The ``router`` micro-benchmark measures the backend route lookup with
+hundreds of ``(METHOD, path)`` routes: the compiled trie, next to the flat
+dictionary lookup it replaced (exact paths only, no parameters) and a scan
+of one regular expression per route, the usual way to add parameters.
+
+The ``template`` micro-benchmark renders the chat page with N messages
+through the compiled template, next to the ``str +=`` and ``replace``
+rendering it replaced (which did not escape the messages).
+
+The ``msgstore`` micro-benchmark appends N messages to the message log
+and reads the newest ones back, next to the text file it replaced, which
+was re-read and split in full on every page render.
+
+The ``longpoll`` benchmark parks N long-poll requests on an in-process
+event-loop backend, then bumps the watched counter once and measures how
+long each request takes to be answered, with the threads and memory the
+parked connections cost. The chat page it serves used to reload itself
+every 5 seconds instead.
+
+The ``websocket`` benchmark sends N chat-sized messages to an event-loop
+backend in a forked process, one ``POST`` per message on a keep-alive
+connection, then over a WebSocket waiting for each reply, then streamed
+without waiting. It reports the messages per second and per second of
+server CPU time, i.e. of one core.
+
+Usage::
+
+  python benchmark.py backend --connections 1000 5000 10000
+  python benchmark.py backend --modes eventloop --path /css/styles.css
+  python benchmark.py backend --modes thread pool --connections 5000
+  python benchmark.py routing --vhosts 10 1000
+  python benchmark.py router --routes 100 500
+  python benchmark.py template --messages 100 1000 10000
+  python benchmark.py msgstore --messages 1000 100000
+  python benchmark.py longpoll --connections 1000 5000
+  python benchmark.py websocket --messages 20000 --size 64
+"""
+
+import os
+import sys
+import time
+import socket
+import re
+import shutil
+import timeit
+import tempfile
+import argparse
+import resource
+import selectors
+import threading
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    """Returns a TCP port that is currently free on the loopback interface."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def wait_listening(port, timeout=10.0):
+    """Blocks until something accepts connections on ``port``."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def percentile(values, pct):
+    """Returns the ``pct`` percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def run_clients(port, connections, request, timeout=60.0):
+    """
+    Opens ``connections`` concurrent sockets, sends ``request`` on each and
+    reads until the server closes the connection.
+
+    :rtype dict: completed/shed/failed counts, elapsed seconds and latencies (ms)
+                 of the completed requests.
+    """
+    sel = selectors.DefaultSelector()
+    state = {}
+    started = time.perf_counter()
+
+    for _ in range(connections):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.connect_ex(("127.0.0.1", port))
+        state[sock] = [time.perf_counter(), memoryview(request), 0, b""]
+        sel.register(sock, selectors.EVENT_WRITE)
+
+    done, shed, failed, latencies = 0, 0, 0, []
+    deadline = time.time() + timeout
+    while state and time.time() < deadline:
+        for key, mask in sel.select(timeout=1.0):
+            sock = key.fileobj
+            begin, pending, received, head = state[sock]
+            try:
+                if mask & selectors.EVENT_WRITE:
+                    sent = sock.send(pending)
+                    pending = pending[sent:]
+                    state[sock][1] = pending
+                    if not pending:
+                        sel.modify(sock, selectors.EVENT_READ)
+                    continue
+                data = sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                data, received = b"", -1
+            if data:
+                state[sock][2] = received + len(data)
+                if len(head) < 12:
+                    state[sock][3] = head + data[:12]
+                continue
+            sel.unregister(sock)
+            sock.close()
+            del state[sock]
+            if received > 0 and head[9:12] == b"503":
+                shed += 1
+            elif received > 0:
+                done += 1
+                latencies.append((time.perf_counter() - begin) * 1000.0)
+            else:
+                failed += 1
+
+    for sock in state:
+        sock.close()
+    failed += len(state)
+    latencies.sort()
+    return {
+        "completed": done,
+        "shed": shed,
+        "failed": failed,
+        "elapsed": time.perf_counter() - started,
+        "latencies": latencies,
+    }
+
+
+def bench_backend(args):
+    request = ("GET {} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+               "Connection: close\r\n\r\n".format(args.path)).encode()
+    print("{:<10} {:>7} {:>9} {:>7} {:>7} {:>10} {:>9} {:>9} {:>9}".format(
+        "mode", "conns", "completed", "shed", "failed", "req/s", "p50 ms", "p99 ms", "max ms"))
+    for mode in args.modes:
+        for connections in args.connections:
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "start_backend.py", "--server-ip", "127.0.0.1",
+                 "--server-port", str(port), "--mode", mode, "--backlog", str(args.backlog)],
+                cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                if not wait_listening(port):
+                    print("{:<10} server did not start".format(mode))
+                    continue
+                result = run_clients(port, connections, request, args.timeout)
+            finally:
+                server.terminate()
+                server.wait()
+            lat = result["latencies"]
+            print("{:<10} {:>7} {:>9} {:>7} {:>7} {:>10.0f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                mode, connections, result["completed"], result["shed"], result["failed"],
+                result["completed"] / result["elapsed"] if result["elapsed"] else 0,
+                percentile(lat, 50), percentile(lat, 99), lat[-1] if lat else 0.0))
+
+
+def legacy_route(host_header, port, routes):
+    """The dict-based lookup of the proxy before the compiled table."""
+    hostname_noport = host_header.split(':', 1)[0].strip()
+    hostname_with_listen = "{}:{}".format(hostname_noport, port)
+    if host_header in routes:
+        key = host_header
+    elif hostname_with_listen in routes:
+        key = hostname_with_listen
+    else:
+        key = hostname_noport
+    proxy_map, policy = routes.get(key, ('127.0.0.1:9000', 'round-robin'))[:2]
+    entry = proxy_map[0] if isinstance(proxy_map, list) else proxy_map
+    host, port = entry.split(":", 1)
+    return host, int(port)
+
+
+def bench_routing(args):
+    sys.path.insert(0, HERE)
+    from daemon.routing import compile_routes
+    from daemon.proxy import select_upstream
+
+    print("{:<8} {:<22} {:>10} {:>10} {:>10}".format(
+        "vhosts", "host header", "legacy ns", "match ns", "+pick ns"))
+    for count in args.vhosts:
+        routes = {"app{}.local".format(i): ("10.0.{}.{}:9000".format(i // 250, i % 250 + 1), "round-robin")
+                  for i in range(count)}
+        routes["*.apps.local"] = (["10.1.0.1:9000", "10.1.0.2:9000"], "round-robin")
+        table = compile_routes(routes)
+        for header in ("app0.local", "app0.local:8080", "svc.apps.local", "unknown.example"):
+            legacy = timeit.timeit(lambda: legacy_route(header, 8080, routes), number=args.number)
+            match = timeit.timeit(lambda: table.match(header, 8080), number=args.number)
+            # Matching plus health filtering and the balancing policy.
+            pick = timeit.timeit(lambda: select_upstream(table.match(header, 8080), "10.0.0.9"),
+                                 number=args.number)
+            print("{:<8} {:<22} {:>10.0f} {:>10.0f} {:>10.0f}".format(
+                count, header, *(t / args.number * 1e9 for t in (legacy, match, pick))))
+
+
+def regex_route(method, path, patterns):
+    """A linear scan of one compiled regular expression per route."""
+    path = path.split("?", 1)[0]
+    for route_method, regex, handler in patterns:
+        m = regex.match(path)
+        if m and route_method == method:
+            return handler, m.groupdict()
+    return None, {}
+
+
+def bench_router(args):
+    sys.path.insert(0, HERE)
+    from daemon.router import compile_router
+
+    print("{:<8} {:<26} {:>10} {:>10} {:>10}".format(
+        "routes", "request", "dict ns", "regex ns", "trie ns"))
+    for count in args.routes:
+        # Half static routes, half parameterized ones, spread over resources.
+        routes = {}
+        for i in range(count // 2):
+            routes[("GET", "/api/res{}/list".format(i))] = i
+            routes[("GET", "/api/res{}/{{id}}/items/{{item}}".format(i))] = i
+        routes[("POST", "/api/res0/list")] = -1
+        routes[("GET", "/files/*path")] = -2
+        router = compile_router(routes)
+        patterns = [(m, re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", p)
+                                   .replace("*path", "(?P<path>.*)") + "$"), h)
+                    for (m, p), h in routes.items()]
+        last = count // 2 - 1
+        requests = (
+            ("GET", "/api/res0/list"),
+            ("GET", "/api/res{}/list?x=1".format(last)),
+            ("GET", "/api/res{}/42/items/7".format(last)),
+            ("GET", "/files/css/styles.css"),
+            ("DELETE", "/api/res0/list"),
+            ("GET", "/missing/path"),
+        )
+        for method, path in requests:
+            # The flat dictionary could only match exact targets.
+            legacy = timeit.timeit(lambda: routes.get((method, path)), number=args.number)
+            regex = timeit.timeit(lambda: regex_route(method, path, patterns), number=args.number)
+            trie = timeit.timeit(lambda: router.match(method, path), number=args.number)
+            print("{:<8} {:<26} {:>10.0f} {:>10.0f} {:>10.0f}".format(
+                count, method + " " + path[:20], *(t / args.number * 1e9 for t in (legacy, regex, trie))))
+
+
+def legacy_chat_page(template, addr, messages):
+    """The string concatenation of the chat page before the template engine."""
+    html = template.replace("{{addr}}", "Chatroom: " + addr)
+    msgs = ""
+    for msg in messages:
+        msgs += "<div class=\"message-wrapper {}\">".format(msg["role"])
+        msgs += f"<div class=\"name\">{msg['sender']}</div>"
+        msgs += f"<div class=\"message {msg['role']}\">{msg['content']}</div>"
+        msgs += "</div>"
+    return html.replace("{{msgs}}", msgs)
+
+
+def bench_template(args):
+    sys.path.insert(0, HERE)
+    from daemon.template import TEMPLATES
+
+    path = os.path.join(HERE, "www", "chat_form.html")
+    legacy_template = "<div>{{addr}}</div><div>{{msgs}}</div>"
+    print("{:<10} {:>12} {:>12} {:>12}".format("messages", "legacy ms", "template ms", "per msg us"))
+    for count in args.messages:
+        messages = [{"sender": "10.0.0.{}:8000".format(i % 4), "content": "message <{}> & more".format(i),
+                     "role": "host" if i % 4 == 0 else "user"} for i in range(count)]
+        number = max(1, args.number // count)
+        legacy = timeit.timeit(lambda: legacy_chat_page(legacy_template, "10.0.0.0:8000", messages),
+                               number=number) / number
+        # Includes the cache lookup (a stat) done on every request.
+        render = timeit.timeit(lambda: TEMPLATES.get(path).render(
+            connected=True, addr="10.0.0.0:8000", messages=messages), number=number) / number
+        print("{:<10} {:>12.2f} {:>12.2f} {:>12.2f}".format(
+            count, legacy * 1e3, render * 1e3, render / count * 1e6))
+
+
+def bench_msgstore(args):
+    sys.path.insert(0, HERE)
+    from daemon.msgstore import MessageLog
+
+    print("{:<10} {:<6} {:>10} {:>12} {:>12} {:>12}".format(
+        "messages", "sync", "append/s", "legacy ms", "tail ms", "since ms"))
+    for count in args.messages:
+        for sync in args.sync:
+            tmp = tempfile.mkdtemp()
+            try:
+                log = MessageLog(os.path.join(tmp, "log"), sync=sync)
+                text_file = os.path.join(tmp, "msg_hist.txt")
+                start = time.perf_counter()
+                for i in range(count):
+                    log.append("10.0.0.{}:8000".format(i % 4), "message number {}".format(i))
+                appends = count / (time.perf_counter() - start)
+                with open(text_file, "w") as f:
+                    f.writelines("10.0.0.{}:8000 - message number {}\n".format(i % 4, i) for i in range(count))
+
+                def legacy():
+                    with open(text_file) as f:
+                        return [line.strip().split(" - ", 1) for line in f if line.strip()][-args.tail:]
+
+                number = 50
+                legacy_ms = timeit.timeit(legacy, number=number) / number * 1e3
+                tail_ms = timeit.timeit(lambda: log.tail(args.tail), number=number) / number * 1e3
+                since_ms = timeit.timeit(lambda: log.since(log.last_seq - 5), number=number) / number * 1e3
+                log.close()
+                print("{:<10} {:<6} {:>10.0f} {:>12.3f} {:>12.3f} {:>12.3f}".format(
+                    count, sync, appends, legacy_ms, tail_ms, since_ms))
+            finally:
+                shutil.rmtree(tmp)
+
+
+def process_status(*fields):
+    """Returns the ``/proc/self/status`` lines of ``fields`` (Linux only)."""
+    try:
+        with open("/proc/self/status") as f:
+            return {line.split(":")[0]: line.split(":")[1].strip()
+                    for line in f if line.split(":")[0] in fields}
+    except OSError:
+        return {}
+
+
+def bench_longpoll(args):
+    sys.path.insert(0, HERE)
+    from daemon.weaprous import WeApRous
+    from daemon.router import compile_router
+    from daemon.eventloop import EventLoop
+    from daemon.notify import Notifier
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = 2 * max(args.connections) + 100
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    counter = [0]
+    changed = Notifier(lambda: counter[0])
+    app = WeApRous()
+
+    @app.route("/updates", methods=["GET"])
+    async def updates(headers, body, query):
+        return {"seq": await changed.wait(int(query["since"]), args.wait)}
+
+    port = free_port()
+    loop = EventLoop("127.0.0.1", port, compile_router(app.routes), backlog=args.backlog)
+    loop.listen()
+    # The daemon logs every request.
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    threading.Thread(target=loop.serve_forever, daemon=True).start()
+
+    try:
+        stdout.write("{:<12} {:>8} {:>10} {:>10} {:>10} {:>10} {:>10}\n".format(
+            "connections", "threads", "RSS MiB", "p50 ms", "p99 ms", "all ms", "answered"))
+        for count in args.connections:
+            rss = int(process_status("VmRSS").get("VmRSS", "0 kB").split()[0])
+            request = ("GET /updates?since={} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                       "Connection: close\r\n\r\n".format(counter[0])).encode()
+            sel = selectors.DefaultSelector()
+            for _ in range(count):
+                sock = socket.create_connection(("127.0.0.1", port))
+                sock.sendall(request)
+                sock.setblocking(False)
+                sel.register(sock, selectors.EVENT_READ)
+            deadline = time.time() + args.wait
+            while len(changed._waiters) < count and time.time() < deadline:
+                time.sleep(0.01)
+            status = process_status("Threads", "VmRSS")
+            parked_rss = int(status.get("VmRSS", "0 kB").split()[0]) - rss
+
+            started = time.perf_counter()
+            counter[0] += 1
+            changed.notify()
+            latencies = []
+            while len(latencies) < count and time.time() < deadline + 5:
+                for key, _ in sel.select(timeout=1.0):
+                    try:
+                        data = key.fileobj.recv(65536)
+                    except (BlockingIOError, InterruptedError):
+                        continue
+                    except OSError:
+                        data = b""
+                    if not data:
+                        sel.unregister(key.fileobj)
+                        key.fileobj.close()
+                        latencies.append((time.perf_counter() - started) * 1000.0)
+            for key in list(sel.get_map().values()):
+                key.fileobj.close()
+            latencies.sort()
+            stdout.write("{:<12} {:>8} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10}\n".format(
+                count, status.get("Threads", "?"), parked_rss / 1024.0, percentile(latencies, 50),
+                percentile(latencies, 99), latencies[-1] if latencies else 0.0, len(latencies)))
+    finally:
+        sys.stdout = stdout
+
+
+def process_cpu(pid):
+    """Returns the user + system CPU seconds used by ``pid`` (Linux only)."""
+    try:
+        with open("/proc/{}/stat".format(pid)) as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return 0.0
+    # utime and stime, fields 14 and 15 of stat(5).
+    return (int(fields[11]) + int(fields[12])) / float(os.sysconf("SC_CLK_TCK"))
+
+
+def bench_websocket(args):
+    sys.path.insert(0, HERE)
+    import asyncio
+    import http.client
+    from daemon.weaprous import WeApRous
+    from daemon.router import compile_router
+    from daemon.eventloop import EventLoop
+    from daemon.websocket import connect
+
+    app = WeApRous()
+
+    @app.route("/ingest", methods=["POST"])
+    def ingest(headers, body):
+        return "ok"
+
+    @app.websocket("/ingest")
+    async def ingest_socket(ws, headers):
+        async for message in ws:
+            await ws.send("ok")
+
+    port = free_port()
+    loop = EventLoop("127.0.0.1", port, compile_router(app.routes))
+    loop.listen()
+    server = os.fork()
+    if server == 0:
+        # The daemon logs every request.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+        try:
+            loop.serve_forever()
+        finally:
+            os._exit(0)
+    loop.server.close()
+
+    message = "x" * args.size
+
+    def over_http(count):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        for _ in range(count):
+            conn.request("POST", "/ingest", body=message)
+            conn.getresponse().read()
+        conn.close()
+
+    async def round_trip(count):
+        ws = await connect("127.0.0.1", port, "/ingest")
+        for _ in range(count):
+            await ws.send(message)
+            await ws.receive()
+        await ws.close()
+
+    async def streamed(count):
+        ws = await connect("127.0.0.1", port, "/ingest")
+
+        async def produce():
+            for _ in range(count):
+                await ws.send(message)
+
+        producer = asyncio.ensure_future(produce())
+        for _ in range(count):
+            await ws.receive()
+        await producer
+        await ws.close()
+
+    runs = (
+        ("http", over_http),
+        ("ws round-trip", lambda count: asyncio.run(round_trip(count))),
+        ("ws streamed", lambda count: asyncio.run(streamed(count))),
+    )
+    try:
+        if not wait_listening(port):
+            print("server did not start")
+            return
+        print("{:<14} {:>9} {:>10} {:>10} {:>14}".format(
+            "path", "messages", "msg/s", "server s", "msg/server-s"))
+        for name, run in runs:
+            cpu = process_cpu(server)
+            started = time.perf_counter()
+            run(args.messages)
+            elapsed = time.perf_counter() - started
+            used = process_cpu(server) - cpu
+            print("{:<14} {:>9} {:>10.0f} {:>10.2f} {:>14.0f}".format(
+                name, args.messages, args.messages / elapsed, used,
+                args.messages / used if used else 0.0))
+    finally:
+        os.kill(server, 15)
+        os.waitpid(server, 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='Benchmark', description='Daemon benchmarks')
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    backend = sub.add_parser('backend', help='concurrent connections against start_backend.py')
+    backend.add_argument('--modes', nargs='+', default=['thread', 'eventloop', 'pool'])
+    backend.add_argument('--connections', nargs='+', type=int, default=[1000, 5000, 10000])
+    backend.add_argument('--path', default='/css/styles.css')
+    backend.add_argument('--backlog', type=int, default=4096)
+    backend.add_argument('--timeout', type=float, default=60.0)
+    backend.set_defaults(func=bench_backend)
+
+    routing = sub.add_parser('routing', help='per-request cost of proxy host routing')
+    routing.add_argument('--vhosts', nargs='+', type=int, default=[10, 1000])
+    routing.add_argument('--number', type=int, default=200000)
+    routing.set_defaults(func=bench_routing)
+
+    router = sub.add_parser('router', help='per-request cost of backend route lookup')
+    router.add_argument('--routes', nargs='+', type=int, default=[100, 500])
+    router.add_argument('--number', type=int, default=100000)
+    router.set_defaults(func=bench_router)
+
+    template = sub.add_parser('template', help='rendering cost of the chat page template')
+    template.add_argument('--messages', nargs='+', type=int, default=[100, 1000, 10000])
+    template.add_argument('--number', type=int, default=100000)
+    template.set_defaults(func=bench_template)
+
+    msgstore = sub.add_parser('msgstore', help='append and read cost of the message log')
+    msgstore.add_argument('--messages', nargs='+', type=int, default=[1000, 100000])
+    msgstore.add_argument('--sync', nargs='+', default=['batch', 'os'])
+    msgstore.add_argument('--tail', type=int, default=50)
+    msgstore.set_defaults(func=bench_msgstore)
+
+    longpoll = sub.add_parser('longpoll', help='fan-out latency of parked long-poll requests')
+    longpoll.add_argument('--connections', nargs='+', type=int, default=[1000, 5000])
+    longpoll.add_argument('--backlog', type=int, default=4096)
+    longpoll.add_argument('--wait', type=float, default=20.0)
+    longpoll.set_defaults(func=bench_longpoll)
+
+    websocket = sub.add_parser('websocket', help='messages per second over HTTP and WebSocket')
+    websocket.add_argument('--messages', type=int, default=20000)
+    websocket.add_argument('--size', type=int, default=64)
+    websocket.set_defaults(func=bench_websocket)
+
+    args = parser.parse_args()
+    args.func(args)
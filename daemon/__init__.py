@@ -13,7 +13,7 @@
 from .backend import create_backend
 from .proxy import create_proxy
 from .weaprous import WeApRous
-from .response import Response
+from .response import Response, AppResponse, redirect
 from .request import Request
 from .backend import create_backend
 from .httpadapter import HttpAdapter
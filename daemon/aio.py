@@ -0,0 +1,126 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.aio
+~~~~~~~~~~~~~~~~~
+
+This module runs the ``async def`` route handlers of a WeApRous app.
+
+A sync handler that talks to another daemon holds its serving thread (or,
+in the event-loop mode, the whole server) for the duration of the call.
+An ``async def`` handler awaits its outbound I/O instead, e.g. with
+:func:`http_request_async <daemon.client.http_request_async>`, and runs on
+a :class:`HandlerLoop <HandlerLoop>`: one asyncio loop on a background
+thread, shared by every handler of the process, which interleaves any
+number of pending outbound calls.
+
+- The event-loop serving mode hands the coroutine over and keeps serving
+  other connections, the response is sent when the coroutine completes.
+- The thread and pool modes wait for the coroutine on the serving thread,
+  the outbound I/O itself still runs on the shared loop.
+
+Handlers must not block: a blocking call in an ``async def`` handler
+stalls every other async handler of the process.
+
+Usage Example:
+--------------
+>>> @app.route("/getList", methods=["GET"])
+... async def get_list(headers, body):
+...     status, _, content = await http_request_async(TRACKER_IP, TRACKER_PORT, "GET", "/returnList")
+...     return status
+"""
+
+import os
+import asyncio
+import inspect
+import threading
+
+#: Seconds an async handler may run before it is cancelled.
+HANDLER_TIMEOUT = 30.0
+
+
+def is_async_handler(result):
+    """
+    Tells whether a handler returned an awaitable to run on the loop.
+
+    :param result: value returned by calling the handler.
+
+    :rtype bool: True for coroutines and other awaitables.
+    """
+    return inspect.isawaitable(result)
+
+
+class HandlerLoop:
+    """
+    An asyncio event loop running on a daemon thread.
+
+    The loop is started on first use, and again in a forked worker
+    process, which does not inherit the thread of its parent.
+
+    Attributes:
+        timeout (float): seconds a coroutine may run before it is cancelled.
+    """
+
+    def __init__(self, timeout=HANDLER_TIMEOUT):
+        self.timeout = timeout
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def loop(self):
+        """
+        Returns the running loop, starting it if needed.
+
+        :rtype asyncio.AbstractEventLoop: the loop.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    loop = asyncio.new_event_loop()
+                    ready = threading.Event()
+
+                    def run():
+                        asyncio.set_event_loop(loop)
+                        loop.call_soon(ready.set)
+                        loop.run_forever()
+
+                    threading.Thread(target=run, name="handler-loop", daemon=True).start()
+                    ready.wait()
+                    self._loop, self._pid = loop, os.getpid()
+        return self._loop
+
+    def submit(self, awaitable):
+        """
+        Schedules an awaitable on the loop.
+
+        :param awaitable: the coroutine returned by an ``async def`` handler.
+
+        :rtype concurrent.futures.Future: its result, thread-safe.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            asyncio.wait_for(awaitable, self.timeout), self.loop())
+
+    def run(self, awaitable):
+        """
+        Runs an awaitable on the loop and waits for its result.
+
+        :param awaitable: the coroutine returned by an ``async def`` handler.
+
+        :rtype: the value it returns.
+        :raises asyncio.TimeoutError: If it runs longer than :attr:`timeout`.
+        """
+        return self.submit(awaitable).result()
+
+
+#: Loop shared by the async handlers of this process.
+HANDLER_LOOP = HandlerLoop()
@@ -31,26 +31,46 @@ Requirements:
 Notes:
 ------
 - The server create daemon threads for client handling.
+- An alternative event-loop mode (see :mod:`daemon.eventloop`) serves every
+  connection from a single thread using non-blocking sockets.
+- The ``"pool"`` mode serves connections with a fixed number of threads fed
+  by a bounded queue and sheds the excess with ``503`` (see
+  :mod:`daemon.workerpool`), memory and latency stay bounded under overload.
+  Its queue depth and queue wait are read with :func:`serving_stats`.
+- With ``workers`` > 1, any mode runs in pre-forked worker processes
+  sharing the port (see :mod:`daemon.prefork`).
 - The current implementation error handling is minimal, socket errors are printed to the console.
 - The actual request processing is delegated to the HttpAdapter class.
 
 Usage Example:
 --------------
 >>> create_backend("127.0.0.1", 9000, routes={})
+>>> create_backend("127.0.0.1", 9000, routes={}, mode="eventloop", backlog=1024)
+>>> create_backend("127.0.0.1", 9000, routes={}, mode="pool", pool_size=32, queue_size=128)
+>>> create_backend("127.0.0.1", 9000, routes={}, workers=4)
 
 """
 
 import socket
 import threading
 import argparse
+from functools import partial
 
 from .response import *
 from .httpadapter import HttpAdapter
+from .router import compile_router
 from .dictionary import CaseInsensitiveDict
+from .eventloop import run_eventloop
+from .prefork import STOP, GRACEFUL_TIMEOUT, listen_socket, accept_pending, connection_thread_name, run_workers
+from .workerpool import WorkerPool, WORKER_POOL_SIZE, ACCEPT_QUEUE_SIZE, QUEUE_MAX_WAIT
 
+#: Serving modes accepted by :func:`create_backend`.
+SERVING_MODES = ("thread", "eventloop", "pool")
+#: Worker pool serving this process in the ``"pool"`` mode, None otherwise.
+WORKER_POOL = None
 
 
-def handle_client(ip, port, conn, addr, routes):
+def handle_client(ip, port, conn, addr, routes, linger=None):
     """
     Initializes an HttpAdapter instance and delegates the client handling logic to it.
 
@@ -59,13 +79,29 @@ def handle_client(ip, port, conn, addr, routes):
     :param conn (socket.socket): Client connection socket.
     :param addr (tuple): client address (IP, port).
     :param routes (dict): Dictionary of route handlers.
+    :param linger (callable): Whether the connection may stay open after a response.
     """
     daemon = HttpAdapter(ip, port, conn, addr, routes)
 
     # Handle client
-    daemon.handle_client(conn, addr, routes)
+    daemon.handle_client(conn, addr, routes, linger)
 
-def run_backend(ip, port, routes):
+def start_client_thread(ip, port, conn, addr, routes):
+    """
+    Serves one accepted connection on its own daemon thread.
+
+    :param conn (socket.socket): Client connection socket.
+    :param addr (tuple): client address (IP, port).
+    """
+    # Tạo thread mới để xử lý client -> Luồng mới được tạo nhưng chưa chạy ngay lập tức.
+    client_thread = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes),
+                                     name=connection_thread_name(addr))
+    # chương trình chính (main thread) kết thúc, các daemon thread sẽ tự động dừng lại
+    client_thread.daemon = True
+    #Bắt đầu chạy luồng
+    client_thread.start()
+
+def run_backend(ip, port, routes, backlog=50, reuse_port=False, pool=None):
     """
     Starts the backend server, binds to the specified IP and port, and listens for incoming
     connections. Each connection is handled in a separate thread. The backend accepts incoming
@@ -75,41 +111,129 @@ def run_backend(ip, port, routes):
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict): Dictionary of route handlers.
+    :param backlog (int): Listen backlog of the server socket.
+    :param reuse_port (bool): Share the port with other worker processes.
+    :param pool (WorkerPool): Serves the connections instead of one thread each.
     """
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server = None
+    dispatch = pool.submit if pool is not None else partial(start_client_thread, ip, port, routes=routes)
 
     try:
-        server.bind((ip, port))
-        server.listen(50)
+        server = listen_socket(ip, port, backlog, reuse_port)
         print("[Backend] Listening on port {}".format(port))
-        if routes != {}:
+        if routes:
             print("[Backend] route settings {}".format(routes))
 
-        while True:
-            conn, addr = server.accept()
+        while not STOP.is_set():
+            try:
+                conn, addr = server.accept()
+            except socket.timeout:
+                continue
             #
             #  TODO: implement the step of the client incomping connection
             #        using multi-thread programming with the
             #        provided handle_client routine
             #
             #########IMPLEMENT##########################################
-            # Tạo thread mới để xử lý client -> Luồng mới được tạo nhưng chưa chạy ngay lập tức.
-            client_thread = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes))
-            # chương trình chính (main thread) kết thúc, các daemon thread sẽ tự động dừng lại
-            client_thread.daemon = True
-            #Bắt đầu chạy luồng
-            client_thread.start()
+            dispatch(conn, addr)
             ############################################################
     except socket.error as e:
       print("Socket error: {}".format(e))
+    finally:
+        # A stopping worker closes its socket first, new connections go to
+        # the other workers while this one finishes its requests.
+        if server is not None:
+            for conn, addr in accept_pending(server):
+                dispatch(conn, addr)
+            server.close()
+        if pool is not None:
+            pool.shutdown(GRACEFUL_TIMEOUT)
+
+def run_pool(ip, port, routes, backlog=50, reuse_port=False, pool_size=WORKER_POOL_SIZE,
+             queue_size=ACCEPT_QUEUE_SIZE, max_wait=QUEUE_MAX_WAIT):
+    """
+    Starts the backend server with a bounded worker pool.
 
-def create_backend(ip, port, routes={}):
+    :param pool_size (int): Worker threads.
+    :param queue_size (int): Accepted connections that may wait for a worker.
+    :param max_wait (float): Seconds a connection may wait before it is shed.
+
+    See :func:`run_backend` for the other parameters.
+    """
+    global WORKER_POOL
+    pool = WorkerPool(lambda conn, addr: handle_client(ip, port, conn, addr, routes, pool.has_capacity),
+                      pool_size, queue_size, max_wait)
+    pool.start()
+    WORKER_POOL = pool
+    print("[Backend] {} workers, accept queue of {}".format(pool_size, queue_size))
+    try:
+        run_backend(ip, port, routes, backlog, reuse_port, pool)
+    finally:
+        WORKER_POOL = None
+
+def serving_stats():
+    """
+    Returns the counters of the worker pool serving this process, e.g. for
+    a route handler to report the queue depth and queue wait time.
+
+    :rtype dict: :meth:`WorkerPool.stats <daemon.workerpool.WorkerPool.stats>`
+                 in the ``"pool"`` mode, empty in the other modes.
+    """
+    pool = WORKER_POOL
+    return pool.stats() if pool is not None else {}
+
+def serve(ip, port, routes, mode="thread", backlog=50, reuse_port=False, **pool_options):
+    """
+    Runs the backend server in the current process.
+
+    :param ip (str): IP address to bind the server.
+    :param port (int): Port number to listen on.
+    :param routes (dict): Dictionary of route handlers.
+    :param mode (str): Serving mode, ``"thread"`` or ``"eventloop"``.
+    :param backlog (int): Listen backlog of the server socket.
+    :param reuse_port (bool): Share the port with other worker processes.
+    :param pool_options: ``pool_size``, ``queue_size`` and ``max_wait`` of the ``"pool"`` mode.
+
+    :raises ValueError: If the serving mode is unknown.
+    """
+    if mode == "thread":
+        run_backend(ip, port, routes, backlog, reuse_port)
+    elif mode == "eventloop":
+        run_eventloop(ip, port, routes, backlog, reuse_port)
+    elif mode == "pool":
+        run_pool(ip, port, routes, backlog, reuse_port, **pool_options)
+    else:
+        raise ValueError("Invalid serving mode {}, expected one of {}".format(mode, SERVING_MODES))
+
+def create_backend(ip, port, routes={}, mode="thread", backlog=50, workers=1,
+                   pool_size=WORKER_POOL_SIZE, queue_size=ACCEPT_QUEUE_SIZE, max_wait=QUEUE_MAX_WAIT):
     """
     Entry point for creating and running the backend server.
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
-    :param routes (dict, optional): Dictionary of route handlers. Defaults to empty dict.
+    :param routes (dict or Router, optional): ``(METHOD, pattern)`` to route handler, compiled
+                                              with :func:`compile_router <daemon.router.compile_router>`.
+                                              Defaults to empty dict.
+    :param mode (str, optional): Serving mode, ``"thread"`` (one thread per connection),
+                                 ``"eventloop"`` (single-threaded selectors loop) or
+                                 ``"pool"`` (bounded worker pool with load shedding).
+    :param backlog (int, optional): Listen backlog of the server socket. Defaults to 50.
+    :param workers (int, optional): Pre-forked worker processes sharing the port. Defaults to 1,
+                                    which serves from the current process.
+    :param pool_size (int, optional): Worker threads of the ``"pool"`` mode.
+    :param queue_size (int, optional): Accept queue of the ``"pool"`` mode, connections
+                                       beyond it are answered ``503`` with ``Retry-After``.
+    :param max_wait (float, optional): Seconds a queued connection may wait before it is shed.
+
+    :raises ValueError: If the serving mode or a route pattern is invalid.
     """
 
-    run_backend(ip, port, routes)
\ No newline at end of file
+    if mode not in SERVING_MODES:
+        raise ValueError("Invalid serving mode {}, expected one of {}".format(mode, SERVING_MODES))
+    # Compiled once, before forking, an invalid pattern fails here.
+    routes = compile_router(routes)
+    options = {}
+    if mode == "pool":
+        options = dict(pool_size=pool_size, queue_size=queue_size, max_wait=max_wait)
+    run_workers(partial(serve, ip, port, routes, mode, backlog, **options), workers, "Backend")
@@ -0,0 +1,372 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.balancer
+~~~~~~~~~~~~~~~~~
+
+This module provides the load-balancing policies of the proxy.
+
+The proxy records, for every upstream (host, port), the number of requests
+in flight and a peak-EWMA of its response latency in an
+:class:`UpstreamLoad <UpstreamLoad>`. A :class:`Balancer <Balancer>`
+picks one member of a ``proxy_pass`` list with the ``dist_policy`` of the
+virtual host:
+
+- ``round-robin``: members in turn.
+- ``random``: uniformly random member.
+- ``weighted-round-robin``: members in turn, proportionally to their
+  ``weight=`` (smooth weighted round-robin, no bursts on heavy members).
+- ``least-outstanding``: fewest requests in flight per unit of weight.
+- ``peak-ewma``: lowest expected latency, the latency EWMA (which jumps
+  up to any slower sample and decays over time) times the requests in
+  flight, per unit of weight.
+- ``consistent-hash``: session affinity, the request affinity key (client
+  IP or a cookie, see ``hash_key``) is looked up on a :class:`HashRing
+  <HashRing>` with virtual nodes, so adding or removing one of N members
+  only remaps about 1/N of the keys.
+
+All selection state is guarded by locks, the proxy serves each client on
+its own thread.
+
+Usage Example:
+--------------
+>>> members = [("10.0.0.1", 9002, 1), ("10.0.0.2", 9002, 3)]
+>>> BALANCER.select("app2.local", members, "weighted-round-robin")
+('10.0.0.2', 9002, 3)
+"""
+
+import math
+import time
+import bisect
+import random
+import hashlib
+import threading
+
+#: Time constant of the latency EWMA decay, in seconds.
+PEAK_EWMA_DECAY = 10.0
+#: Cost added to an upstream with requests in flight but no latency sample
+#: yet, so a burst does not pile up on a member nothing is known about.
+PEAK_EWMA_PENALTY = 1000.0
+
+#: Virtual nodes placed on the hash ring per unit of weight.
+HASH_RING_VNODES = 160
+#: Hash rings kept per balancer, one per distinct member list.
+HASH_RING_CACHE_SIZE = 64
+
+#: Policies understood by :meth:`Balancer.select`.
+POLICIES = ("round-robin", "random", "weighted-round-robin",
+            "least-outstanding", "peak-ewma", "consistent-hash")
+#: Alternative spellings accepted in ``dist_policy``.
+POLICY_ALIASES = {
+    "round_robin": "round-robin",
+    "weighted": "weighted-round-robin",
+    "least-conn": "least-outstanding",
+    "least_conn": "least-outstanding",
+    "ewma": "peak-ewma",
+    "hash": "consistent-hash",
+    "ip-hash": "consistent-hash",
+    "sticky": "consistent-hash",
+}
+
+
+def normalize_policy(policy):
+    """
+    Maps a ``dist_policy`` value to its canonical name.
+
+    :param policy (str): policy as written in the configuration.
+
+    :rtype str: canonical policy name, unknown names are returned as is.
+    """
+    policy = (policy or "round-robin").strip().lower()
+    return POLICY_ALIASES.get(policy, policy)
+
+
+class UpstreamLoad:
+    """
+    Live load counters of one upstream.
+
+    Attributes:
+        outstanding (int): requests currently in flight.
+        ewma (float): peak-EWMA of the response latency, in seconds.
+        samples (int): latency samples observed.
+        requests (int): requests started in total.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.outstanding = 0
+        self.ewma = 0.0
+        self.samples = 0
+        self.requests = 0
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """
+        Records the start of a request.
+
+        :rtype float: start time, to pass to :meth:`observe`.
+        """
+        with self._lock:
+            self.outstanding += 1
+            self.requests += 1
+        return time.monotonic()
+
+    def end(self):
+        """
+        Records the end of a request started with :meth:`begin`.
+        """
+        with self._lock:
+            self.outstanding -= 1
+
+    def observe(self, started):
+        """
+        Folds the latency of a request into the peak-EWMA.
+
+        :param started (float): value returned by :meth:`begin`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._update(now, now - started)
+            self.samples += 1
+
+    def _update(self, now, rtt):
+        # Peak sensitive: a slower sample replaces the average at once,
+        # faster samples pull it down at a rate set by the time elapsed
+        # since the previous update.
+        elapsed = max(0.0, now - self._stamp)
+        self._stamp = now
+        if rtt > self.ewma:
+            self.ewma = rtt
+        else:
+            weight = math.exp(-elapsed / PEAK_EWMA_DECAY)
+            self.ewma = self.ewma * weight + rtt * (1.0 - weight)
+
+    def cost(self):
+        """
+        Returns the peak-EWMA cost of sending one more request.
+
+        :rtype float: expected latency times the requests it would queue behind.
+        """
+        with self._lock:
+            if not self.samples:
+                return PEAK_EWMA_PENALTY + self.outstanding if self.outstanding else 0.0
+            # An idle period counts as fast samples, a member that was
+            # slow once is tried again eventually.
+            self._update(time.monotonic(), 0.0)
+            return self.ewma * (self.outstanding + 1)
+
+    def stats(self):
+        """
+        Returns the counters.
+
+        :rtype dict: outstanding, requests and latency EWMA (ms).
+        """
+        with self._lock:
+            return {
+                "outstanding": self.outstanding,
+                "requests": self.requests,
+                "ewma_ms": round(self.ewma * 1000.0, 3),
+            }
+
+
+def ring_hash(value):
+    """
+    Hashes a string onto the 64-bit ring.
+
+    :param value (str): ring node name or affinity key.
+
+    :rtype int: position on the ring.
+    """
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring over a list of members.
+
+    Each member is placed at ``HASH_RING_VNODES * weight`` pseudo-random
+    points, a key belongs to the first point clockwise from its hash. The
+    points of a member only depend on its address, so the rings built for
+    two member lists agree on every key that neither list's extra members
+    claim.
+
+    Attributes:
+        members (tuple): ``(host, port, weight)`` tuples.
+    """
+
+    def __init__(self, members, vnodes=HASH_RING_VNODES):
+        self.members = tuple(members)
+        points = []
+        for index, (host, port, weight) in enumerate(self.members):
+            for replica in range(vnodes * weight):
+                points.append((ring_hash("{}:{}#{}".format(host, port, replica)), index))
+        points.sort()
+        self._hashes = [point[0] for point in points]
+        self._owners = [point[1] for point in points]
+
+    def lookup(self, key):
+        """
+        Returns the member owning a key.
+
+        :param key (str): affinity key.
+
+        :rtype tuple: the ``(host, port, weight)`` member.
+        """
+        index = bisect.bisect(self._hashes, ring_hash(key))
+        if index == len(self._hashes):
+            index = 0
+        return self.members[self._owners[index]]
+
+
+class LoadRegistry:
+    """
+    One :class:`UpstreamLoad <UpstreamLoad>` per (host, port), created on
+    first use.
+    """
+
+    def __init__(self):
+        self._loads = {}
+        self._lock = threading.Lock()
+
+    def get(self, host, port):
+        """
+        Returns the load counters of an upstream.
+
+        :param host (str): upstream IP address.
+        :param port (int): upstream port.
+
+        :rtype UpstreamLoad: the counters, shared by all callers.
+        """
+        key = (host, port)
+        load = self._loads.get(key)
+        if load is None:
+            with self._lock:
+                load = self._loads.get(key)
+                if load is None:
+                    load = self._loads[key] = UpstreamLoad(host, port)
+        return load
+
+    def stats(self):
+        """
+        Returns the counters of every upstream.
+
+        :rtype dict: "host:port" to :meth:`UpstreamLoad.stats`.
+        """
+        with self._lock:
+            loads = list(self._loads.items())
+        return {"{}:{}".format(*key): load.stats() for key, load in loads}
+
+
+class Balancer:
+    """
+    Selects an upstream among the members of a virtual host.
+
+    Members are ``(host, port, weight)`` tuples. Round-robin cursors and
+    smooth weighted round-robin state are kept per virtual host, and reset
+    when its member list changes.
+
+    Attributes:
+        loads (LoadRegistry): live counters read by the load-aware policies.
+    """
+
+    def __init__(self, loads):
+        self.loads = loads
+        self._rr_index = {}
+        self._wrr_state = {}
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def select(self, hostname, members, policy, key=None):
+        """
+        Picks the upstream for the next request to a virtual host.
+
+        :param hostname (str): virtual host the members belong to.
+        :param members (list): ``(host, port, weight)`` tuples, non empty.
+        :param policy (str): a name of :data:`POLICIES` (or an alias).
+        :param key (str): affinity key of the request, for ``consistent-hash``.
+
+        :rtype tuple: the chosen member.
+        :raises ValueError: If the policy is unknown.
+        """
+        if policy not in POLICIES:
+            policy = normalize_policy(policy)
+        if len(members) == 1:
+            chosen = members[0]
+        elif policy == "round-robin":
+            with self._lock:
+                index = self._rr_index.get(hostname, 0) % len(members)
+                self._rr_index[hostname] = index + 1
+            chosen = members[index]
+        elif policy == "random":
+            chosen = random.choice(members)
+        elif policy == "weighted-round-robin":
+            chosen = self._smooth_weighted(hostname, members)
+        elif policy == "least-outstanding":
+            chosen = min(members, key=lambda m: (
+                self.loads.get(m[0], m[1]).outstanding / m[2], random.random()))
+        elif policy == "peak-ewma":
+            chosen = min(members, key=lambda m: (
+                self.loads.get(m[0], m[1]).cost() / m[2], random.random()))
+        elif policy == "consistent-hash":
+            chosen = self.ring(members).lookup(key or "")
+        else:
+            raise ValueError("unknown dist_policy {!r}".format(policy))
+        return chosen
+
+    def ring(self, members):
+        """
+        Returns the hash ring of a member list, built once and cached.
+
+        Health checks change the member list a ring is built for, each
+        distinct list gets its own ring.
+
+        :param members (list): ``(host, port, weight)`` tuples.
+
+        :rtype HashRing: the ring.
+        """
+        key = tuple(members)
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = HashRing(key)
+            with self._lock:
+                if len(self._rings) >= HASH_RING_CACHE_SIZE:
+                    self._rings.clear()
+                self._rings[key] = ring
+        return ring
+
+    def _smooth_weighted(self, hostname, members):
+        # Each pick raises every member by its weight and lowers the chosen
+        # one by the total, which interleaves heavy and light members.
+        key = tuple(members)
+        total = sum(m[2] for m in members)
+        with self._lock:
+            state = self._wrr_state.get(hostname)
+            if state is None or state[0] != key:
+                state = (key, [0] * len(members))
+                self._wrr_state[hostname] = state
+            current = state[1]
+            best = 0
+            for i, member in enumerate(members):
+                current[i] += member[2]
+                if current[i] > current[best]:
+                    best = i
+            current[best] -= total
+        return members[best]
+
+
+#: Load counters maintained by the proxy for every upstream.
+LOADS = LoadRegistry()
+#: Balancer shared by the proxy threads.
+BALANCER = Balancer(LOADS)
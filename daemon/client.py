@@ -0,0 +1,171 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.client
+~~~~~~~~~~~~~~~~~
+
+This module provides a minimal HTTP client used by applications to talk to
+other WeApRous daemons (e.g. a peer asking the tracker for the peer list).
+
+Responses are framed with :mod:`daemon.reader`, so bodies of any size are
+read completely, and gzip/deflate bodies are transparently decoded.
+
+:func:`http_request` blocks the calling thread, :func:`http_request_async`
+is its non-blocking counterpart for ``async def`` route handlers (see
+:mod:`daemon.aio`): many outbound requests share one event loop thread.
+
+Usage Example:
+--------------
+>>> status, headers, body = http_request("10.0.0.2", 8000, "GET", "/returnList")
+>>> status, headers, body = await http_request_async("10.0.0.2", 8000, "GET", "/returnList")
+"""
+
+import gzip
+import zlib
+import socket
+import asyncio
+
+from .reader import ResponseParser, read_message, RECV_SIZE
+
+#: Encodings announced in ``Accept-Encoding`` by :func:`http_request`.
+ACCEPT_ENCODING = "gzip, deflate"
+
+
+def decode_body(body, encoding):
+    """
+    Decodes a body according to its ``Content-Encoding``.
+
+    :param body (bytes): encoded body.
+    :param encoding (str): value of the ``Content-Encoding`` header, or None.
+
+    :rtype bytes: the decoded body.
+    """
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib wrapper.
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+def build_request(method, path, body=b"", headers=None):
+    """
+    Serializes an HTTP/1.1 request.
+
+    :param method (str): HTTP method.
+    :param path (str): request target.
+    :param body (bytes or str): request body.
+    :param headers (dict): extra header fields.
+
+    :rtype bytes: the request bytes.
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    fields = {"Accept-Encoding": ACCEPT_ENCODING, "Connection": "close"}
+    fields.update(headers or {})
+    fields["Content-Length"] = str(len(body))
+    head = "{} {} HTTP/1.1\r\n".format(method, path)
+    head += "".join("{}: {}\r\n".format(k, v) for k, v in fields.items())
+    return (head + "\r\n").encode("utf-8") + body
+
+
+def http_request(host, port, method, path, body=b"", headers=None, timeout=10.0):
+    """
+    Sends one request and reads the complete response.
+
+    :param host (str): IP address of the server.
+    :param port (int): port number of the server.
+    :param method (str): HTTP method.
+    :param path (str): request target.
+    :param body (bytes or str): request body.
+    :param headers (dict): extra header fields.
+    :param timeout (float): socket timeout, in seconds.
+
+    :rtype tuple: (status code (int), headers (CaseInsensitiveDict), body (bytes)).
+    :raises OSError: If the connection fails or the server closes it early.
+    """
+    conn = socket.create_connection((host, port), timeout=timeout)
+    try:
+        fields = {"Host": "{}:{}".format(host, port)}
+        fields.update(headers or {})
+        conn.sendall(build_request(method, path, body, fields))
+        parser = ResponseParser()
+        parser.request_method = method.upper()
+        msg = read_message(conn, parser)
+    finally:
+        conn.close()
+    return parse_response(msg, host, port)
+
+
+def parse_response(msg, host, port):
+    """
+    Unpacks a framed response.
+
+    :param msg (HttpMessage or None): the response, None if the server
+                                      closed the connection first.
+    :param host (str): IP address of the server, for errors.
+    :param port (int): port number of the server, for errors.
+
+    :rtype tuple: (status code (int), headers (CaseInsensitiveDict), body (bytes)).
+    :raises OSError: If there is no response or its status line is invalid.
+    """
+    if msg is None:
+        raise OSError("{}:{} closed the connection without a response".format(host, port))
+
+    try:
+        status = int(msg.start_line.split()[1])
+    except (IndexError, ValueError):
+        raise OSError("invalid status line {!r}".format(msg.start_line))
+    return status, msg.headers, decode_body(msg.body, msg.headers.get("content-encoding"))
+
+
+async def http_request_async(host, port, method, path, body=b"", headers=None, timeout=10.0):
+    """
+    Sends one request and reads the complete response without blocking the
+    event loop, see :func:`http_request`.
+
+    :param timeout (float): seconds for the whole exchange.
+
+    :rtype tuple: (status code (int), headers (CaseInsensitiveDict), body (bytes)).
+    :raises OSError: If the connection fails or the server closes it early.
+    """
+    async def exchange():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            fields = {"Host": "{}:{}".format(host, port)}
+            fields.update(headers or {})
+            writer.write(build_request(method, path, body, fields))
+            await writer.drain()
+            parser = ResponseParser()
+            parser.request_method = method.upper()
+            while True:
+                msg = parser.next_message()
+                if msg is not None:
+                    return msg
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    parser.feed_eof()
+                    return parser.next_message()
+                parser.feed(data)
+        finally:
+            writer.close()
+
+    try:
+        msg = await asyncio.wait_for(exchange(), timeout)
+    except asyncio.TimeoutError:
+        raise socket.timeout("{}:{} timed out".format(host, port))
+    return parse_response(msg, host, port)
@@ -0,0 +1,393 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.eventloop
+~~~~~~~~~~~~~~~~~
+
+This module provides a non-blocking, single-threaded serving engine for the
+backend daemon. Instead of spawning one thread per accepted connection, every
+client socket is registered on a :mod:`selectors` selector and driven by a
+single loop that reads requests, delegates them to
+:meth:`HttpAdapter.handle_request <daemon.httpadapter.HttpAdapter.handle_request>`
+and writes the responses back as the sockets become writable.
+
+Notes:
+------
+- Sync route hooks are executed inline on the loop thread, a hook that
+  blocks (e.g. outbound socket I/O) stalls every other connection while it
+  runs. ``async def`` hooks run on the shared handler loop (see
+  :mod:`daemon.aio`): the connection waits for its response, later
+  pipelined requests stay buffered, and the loop keeps serving the other
+  connections. A socket pair wakes the selector up when a hook completes.
+- The listen backlog is configurable, the kernel may still cap it at
+  ``net.core.somaxconn``.
+- A WebSocket handshake (see :mod:`daemon.websocket`) hands the socket
+  over to the handler loop once the 101 response is sent.
+- Connections are persistent; idle ones are swept once per loop tick after
+  :data:`KEEPALIVE_TIMEOUT <daemon.httpadapter.KEEPALIVE_TIMEOUT>` seconds.
+- When a pre-forked worker is asked to stop (see :data:`daemon.prefork.STOP`),
+  the loop closes the listening socket and finishes the responses in
+  progress before returning.
+
+Usage Example:
+--------------
+>>> EventLoop("127.0.0.1", 9000, routes={}, backlog=1024).serve_forever()
+
+"""
+
+import time
+import socket
+import selectors
+from collections import deque
+
+from .response import Response, FileBody
+from .reader import RequestParser, HttpParseError, RECV_SIZE
+from .httpadapter import HttpAdapter, KEEPALIVE_TIMEOUT, KEEPALIVE_MAX_REQUESTS
+from .prefork import STOP, listen_socket, ACCEPT_POLL_INTERVAL, GRACEFUL_TIMEOUT
+from .aio import HANDLER_LOOP, is_async_handler
+
+#: Selector data of the wakeup socket, listening sockets have None.
+_WAKEUP = "wakeup"
+
+
+class _Connection:
+    """Per-socket state tracked by the :class:`EventLoop <EventLoop>`."""
+
+    __slots__ = ("sock", "addr", "parser", "outbuf", "closing", "served", "last_active",
+                 "pending", "upgrade")
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        #: Number of requests answered on this connection.
+        self.served = 0
+        #: Monotonic time of the last read or write activity.
+        self.last_active = time.monotonic()
+        #: Incremental framer holding bytes not yet framed into a request.
+        self.parser = RequestParser()
+        #: Pending response buffers (memoryviews or :class:`FileBody`) waiting to be sent.
+        self.outbuf = deque()
+        #: Close the socket once ``outbuf`` has been flushed.
+        self.closing = False
+        #: Adapter whose ``async def`` hook is running, None otherwise.
+        self.pending = None
+        #: WebSocket hand-over to call once the 101 response is flushed.
+        self.upgrade = None
+
+
+class EventLoop:
+    """
+    A selectors-based HTTP serving engine.
+
+    One instance owns a listening socket and all of its accepted client
+    sockets. Each iteration of :meth:`serve_forever` waits on the selector
+    and performs only the reads, writes and accepts that will not block.
+
+    Attributes:
+        ip (str): IP address to bind the server.
+        port (int): Port number to listen on.
+        routes (dict): Mapping of route paths to handler functions.
+        backlog (int): Listen backlog of the server socket.
+        reuse_port (bool): Share the port with other worker processes.
+    """
+
+    def __init__(self, ip, port, routes, backlog=50, reuse_port=False):
+        self.ip = ip
+        self.port = port
+        self.routes = routes
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.selector = selectors.DefaultSelector()
+        self.server = None
+        #: (connection, adapter, future) of the async hooks that completed,
+        #: appended from the handler loop thread.
+        self._completed = deque()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ, _WAKEUP)
+
+    def listen(self):
+        """
+        Creates, binds and registers the non-blocking listening socket.
+        """
+        server = listen_socket(self.ip, self.port, self.backlog, self.reuse_port)
+        server.setblocking(False)
+        self.selector.register(server, selectors.EVENT_READ, None)
+        self.server = server
+        return server
+
+    def serve_forever(self):
+        """
+        Runs the event loop until interrupted or asked to stop.
+        """
+        if self.server is None:
+            self.listen()
+        next_sweep = time.monotonic() + 1.0
+        while not STOP.is_set():
+            self._poll(ACCEPT_POLL_INTERVAL)
+            now = time.monotonic()
+            if now >= next_sweep:
+                self._sweep_idle(now)
+                next_sweep = now + 1.0
+        self.drain(GRACEFUL_TIMEOUT)
+
+    def _poll(self, timeout):
+        for key, mask in self.selector.select(timeout=timeout):
+            if key.data is None:
+                self._accept(key.fileobj)
+                continue
+            if key.data is _WAKEUP:
+                self._on_completed()
+                continue
+            conn = key.data
+            if mask & selectors.EVENT_READ:
+                self._on_readable(conn)
+            if mask & selectors.EVENT_WRITE and conn.sock.fileno() >= 0:
+                self._on_writable(conn)
+
+    def drain(self, timeout):
+        """
+        Stops accepting and serves the connections left until their
+        responses are sent, or the timeout.
+
+        :param timeout (float): seconds to wait at most.
+        """
+        if self.server is not None:
+            # Take over the connections queued on this socket before it
+            # is closed, see :func:`accept_pending <daemon.prefork.accept_pending>`.
+            self._accept(self.server)
+            self.selector.unregister(self.server)
+            self.server.close()
+            self.server = None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            # Connections between requests are closed, the others are
+            # served until they are.
+            for conn in self._connections():
+                if not conn.outbuf and conn.pending is None and not conn.parser.has_pending():
+                    self._close(conn)
+            if not self._connections():
+                break
+            self._poll(0.1)
+        for conn in self._connections():
+            self._close(conn)
+
+    def _connections(self):
+        return [key.data for key in self.selector.get_map().values()
+                if isinstance(key.data, _Connection)]
+
+    def _sweep_idle(self, now):
+        # Close persistent connections that have neither pending output
+        # nor activity within the keep-alive timeout.
+        idle = [conn for conn in self._connections()
+                if not conn.outbuf and conn.pending is None
+                and now - conn.last_active > KEEPALIVE_TIMEOUT]
+        for conn in idle:
+            self._close(conn)
+
+    def _accept(self, server):
+        # Drain the accept queue, a single readiness event may cover
+        # many pending connections.
+        while True:
+            try:
+                sock, addr = server.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                # e.g. EMFILE, keep serving the sockets we already have.
+                print("[EventLoop] accept error: {}".format(e))
+                return
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ,
+                                   _Connection(sock, addr))
+
+    def _on_readable(self, conn):
+        try:
+            data = conn.sock.recv(RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._close(conn)
+            return
+        if not data:
+            self._close(conn)
+            return
+        conn.last_active = time.monotonic()
+        if conn.closing:
+            return
+
+        conn.parser.feed(data)
+        if self._dispatch(conn):
+            self._on_writable(conn)
+
+    def _dispatch(self, conn):
+        # Answer every complete request already buffered, in order, so
+        # pipelined requests are served without waiting for another read.
+        # Stops at a request whose async hook is still running.
+        queued = False
+        while not conn.closing and conn.pending is None and conn.upgrade is None:
+            try:
+                msg = conn.parser.next_message()
+            except HttpParseError as e:
+                print("[EventLoop] bad request from {}: {}".format(conn.addr, e))
+                conn.outbuf.append(memoryview(Response().build_error(e.status_code, e.reason)))
+                conn.closing = queued = True
+                break
+            if msg is None:
+                break
+            conn.served += 1
+            adapter = HttpAdapter(self.ip, self.port, conn.sock, conn.addr, self.routes)
+            try:
+                response = adapter.begin_request(
+                    msg, self.routes,
+                    keep_alive=conn.served < KEEPALIVE_MAX_REQUESTS)
+            except HttpParseError as e:
+                print("[EventLoop] bad request from {}: {}".format(conn.addr, e))
+                conn.outbuf.append(memoryview(Response().build_error(e.status_code, e.reason)))
+                conn.closing = queued = True
+                break
+            except Exception as e:
+                print("[EventLoop] error handling {}: {}".format(conn.addr, e))
+                response = None
+            if is_async_handler(response):
+                conn.pending = adapter
+                future = HANDLER_LOOP.submit(response)
+                future.add_done_callback(
+                    lambda future, conn=conn, adapter=adapter: self._complete(conn, adapter, future))
+                break
+            self._queue_response(conn, adapter, response)
+            queued = True
+            if adapter.upgrade is not None:
+                # A WebSocket handshake, the following bytes are frames.
+                conn.upgrade, conn.closing = adapter.upgrade, False
+                break
+        return queued
+
+    def _queue_response(self, conn, adapter, response):
+        # A None response stands for a failed handler.
+        if response is None:
+            conn.outbuf.append(memoryview((
+                "HTTP/1.1 500 Internal Server Error\r\n"
+                "Content-Length: 0\r\n"
+                "Connection: close\r\n"
+                "\r\n"
+            ).encode('utf-8')))
+            conn.closing = True
+            return
+        conn.closing = not adapter.response.keep_alive
+        conn.outbuf.append(memoryview(response))
+        for part in adapter.response.body_parts:
+            conn.outbuf.append(part if isinstance(part, FileBody) else memoryview(part))
+
+    def _complete(self, conn, adapter, future):
+        # Runs on the handler loop thread: hand over and wake the selector.
+        self._completed.append((conn, adapter, future))
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            # Full of pending wakeups already, or the loop is gone.
+            pass
+
+    def _on_completed(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self._completed:
+            conn, adapter, future = self._completed.popleft()
+            conn.pending = None
+            if conn.sock.fileno() < 0:
+                continue
+            try:
+                response = adapter.finish_request(future.result())
+            except Exception as e:
+                print("[EventLoop] error handling {}: {}".format(conn.addr, e))
+                response = None
+            self._queue_response(conn, adapter, response)
+            # Requests pipelined behind this one may be waiting.
+            self._dispatch(conn)
+            self._on_writable(conn)
+
+    def _on_writable(self, conn):
+        while conn.outbuf:
+            view = conn.outbuf[0]
+            if isinstance(view, FileBody):
+                try:
+                    done = view.send_nonblocking(conn.sock)
+                except OSError:
+                    self._close(conn)
+                    return
+                conn.last_active = time.monotonic()
+                if not done:
+                    break
+                conn.outbuf.popleft()
+                continue
+            try:
+                sent = conn.sock.send(view)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                self._close(conn)
+                return
+            conn.last_active = time.monotonic()
+            if sent < len(view):
+                conn.outbuf[0] = view[sent:]
+                break
+            conn.outbuf.popleft()
+
+        if conn.outbuf:
+            self.selector.modify(conn.sock, selectors.EVENT_WRITE, conn)
+        elif conn.upgrade is not None:
+            # The socket now belongs to the websocket handler.
+            self.selector.unregister(conn.sock)
+            conn.upgrade(conn.sock, bytes(conn.parser.buffer))
+        elif conn.closing:
+            self._close(conn)
+        else:
+            self.selector.modify(conn.sock, selectors.EVENT_READ, conn)
+
+    def _close(self, conn):
+        if conn.sock.fileno() < 0:
+            return
+        for item in conn.outbuf:
+            if isinstance(item, FileBody):
+                item.close()
+        conn.outbuf.clear()
+        try:
+            self.selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        conn.sock.close()
+
+
+def run_eventloop(ip, port, routes, backlog=50, reuse_port=False):
+    """
+    Starts the event-loop backend server.
+
+    :param ip (str): IP address to bind the server.
+    :param port (int): Port number to listen on.
+    :param routes (dict): Dictionary of route handlers.
+    :param backlog (int): Listen backlog of the server socket.
+    :param reuse_port (bool): Share the port with other worker processes.
+    """
+    loop = EventLoop(ip, port, routes, backlog, reuse_port)
+    try:
+        loop.listen()
+        print("[Backend] Event loop listening on port {}".format(port))
+        if routes:
+            print("[Backend] route settings {}".format(routes))
+        loop.serve_forever()
+    except socket.error as e:
+        print("Socket error: {}".format(e))
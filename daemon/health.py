@@ -0,0 +1,300 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.health
+~~~~~~~~~~~~~~~~~
+
+This module tracks the health of the proxy upstreams.
+
+Passive checks: the proxy reports the outcome of every forwarded request.
+:data:`MAX_FAILS` consecutive failures (refused connections, timeouts,
+malformed responses) eject the upstream for a backoff period, which
+doubles on every ejection up to :data:`MAX_EJECTION`. Once the backoff
+expires the upstream receives traffic again; a single failure before its
+next success ejects it once more.
+
+Active checks: an optional :class:`HealthChecker <HealthChecker>` thread
+probes every upstream at a fixed interval, so a dead upstream is ejected
+before clients hit it and a recovered one is restored without waiting
+for its backoff to expire.
+
+Usage Example:
+--------------
+>>> HEALTH.record_failure("10.0.0.1", 9002, "connection refused")
+>>> HEALTH.is_healthy("10.0.0.1", 9002)
+True
+>>> HealthChecker(HEALTH, [("10.0.0.1", 9002)], interval=5.0).start()
+"""
+
+import time
+import zlib
+import threading
+
+from .client import http_request
+from .reader import HttpParseError
+
+#: Consecutive failures that eject an upstream.
+MAX_FAILS = 3
+#: Duration of the first ejection, in seconds.
+FAIL_TIMEOUT = 10.0
+#: Longest ejection, in seconds.
+MAX_EJECTION = 60.0
+#: Seconds between two rounds of active probes.
+PROBE_INTERVAL = 5.0
+#: Timeout of one active probe, in seconds.
+PROBE_TIMEOUT = 2.0
+#: Path requested by active probes, any status below 500 means healthy.
+PROBE_PATH = "/"
+
+
+class UpstreamHealth:
+    """
+    Health state of one upstream.
+
+    Attributes:
+        failures (int): consecutive failures since the last success.
+        ejections (int): consecutive ejections since the last success.
+        unhealthy_until (float): monotonic time the current ejection ends.
+        last_error (str): reason of the last failure.
+    """
+
+    def __init__(self, host, port, on_eject=None):
+        self.host = host
+        self.port = port
+        self.on_eject = on_eject
+        self.failures = 0
+        self.ejections = 0
+        self.unhealthy_until = 0.0
+        self.last_error = ""
+        self._lock = threading.Lock()
+
+    def is_healthy(self, now=None):
+        """
+        Tells whether the upstream may receive requests.
+
+        :rtype bool: False while the upstream is ejected.
+        """
+        return (now or time.monotonic()) >= self.unhealthy_until
+
+    def retry_after(self, now=None):
+        """
+        Returns the seconds left before the upstream is tried again.
+
+        :rtype float: 0 if the upstream is healthy.
+        """
+        return max(0.0, self.unhealthy_until - (now or time.monotonic()))
+
+    def record_success(self):
+        """
+        Records a successful exchange, which ends any ejection.
+        """
+        with self._lock:
+            recovered = self.ejections > 0
+            self.failures = 0
+            self.ejections = 0
+            self.unhealthy_until = 0.0
+        if recovered:
+            print("[Health] upstream {}:{} is healthy again".format(self.host, self.port))
+
+    def record_failure(self, reason=""):
+        """
+        Records a failed exchange, ejecting the upstream past the threshold.
+
+        :param reason (str): description of the failure, for logs.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.last_error = str(reason)
+            if not self.is_healthy(now):
+                # Already ejected, e.g. requests that were in flight.
+                return
+            self.failures += 1
+            # After an ejection the upstream is on probation until it
+            # answers successfully, one failure is enough to eject it again.
+            if self.failures < MAX_FAILS and not self.ejections:
+                return
+            backoff = min(MAX_EJECTION, FAIL_TIMEOUT * 2 ** self.ejections)
+            self.ejections += 1
+            self.failures = 0
+            self.unhealthy_until = now + backoff
+        if self.on_eject is not None:
+            self.on_eject(self.unhealthy_until)
+        print("[Health] upstream {}:{} ejected for {:.0f}s: {}".format(
+            self.host, self.port, backoff, reason))
+
+    def stats(self):
+        """
+        Returns the health state.
+
+        :rtype dict: healthy flag, failures, ejections, retry_after and last error.
+        """
+        with self._lock:
+            return {
+                "healthy": self.is_healthy(),
+                "failures": self.failures,
+                "ejections": self.ejections,
+                "retry_after": round(self.retry_after(), 1),
+                "last_error": self.last_error,
+            }
+
+
+class HealthRegistry:
+    """
+    One :class:`UpstreamHealth <UpstreamHealth>` per (host, port), created
+    on first use. Unknown upstreams are healthy.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+        # No upstream is ejected past this monotonic time.
+        self._horizon = 0.0
+
+    def _on_eject(self, until):
+        with self._lock:
+            self._horizon = max(self._horizon, until)
+
+    def all_healthy(self):
+        """
+        Tells cheaply that no upstream is ejected, the common case on the
+        request path.
+
+        :rtype bool: True if no ejection is in progress.
+        """
+        return time.monotonic() >= self._horizon
+
+    def get(self, host, port):
+        """
+        Returns the health state of an upstream.
+
+        :param host (str): upstream IP address.
+        :param port (int): upstream port.
+
+        :rtype UpstreamHealth: the state, shared by all callers.
+        """
+        key = (host, port)
+        state = self._states.get(key)
+        if state is None:
+            with self._lock:
+                state = self._states.get(key)
+                if state is None:
+                    state = self._states[key] = UpstreamHealth(host, port, self._on_eject)
+        return state
+
+    def is_healthy(self, host, port):
+        """
+        Tells whether an upstream may receive requests.
+
+        :rtype bool: False while the upstream is ejected.
+        """
+        state = self._states.get((host, port))
+        return state is None or state.is_healthy()
+
+    def record_success(self, host, port):
+        """Records a successful exchange with an upstream."""
+        self.get(host, port).record_success()
+
+    def record_failure(self, host, port, reason=""):
+        """Records a failed exchange with an upstream."""
+        self.get(host, port).record_failure(reason)
+
+    def retry_after(self, upstreams):
+        """
+        Returns how long until the first of some upstreams is tried again.
+
+        :param upstreams (list): (host, port) pairs.
+
+        :rtype int: whole seconds, at least 1.
+        """
+        now = time.monotonic()
+        waits = [self.get(host, port).retry_after(now) for host, port in upstreams]
+        return max(1, int(min(waits) + 0.999)) if waits else 1
+
+    def stats(self):
+        """
+        Returns the health of every upstream seen so far.
+
+        :rtype dict: "host:port" to :meth:`UpstreamHealth.stats`.
+        """
+        with self._lock:
+            states = list(self._states.items())
+        return {"{}:{}".format(*key): state.stats() for key, state in states}
+
+
+def probe(host, port, path=PROBE_PATH, timeout=PROBE_TIMEOUT):
+    """
+    Sends one active health probe.
+
+    :param host (str): upstream IP address.
+    :param port (int): upstream port.
+    :param path (str): path requested with HEAD.
+    :param timeout (float): socket timeout, in seconds.
+
+    :rtype str or None: None if the upstream answered below 500, otherwise
+                        the reason of the failure, also for a reply that
+                        cannot be parsed or decoded.
+    """
+    try:
+        status, _, _ = http_request(host, port, "HEAD", path, timeout=timeout)
+    except (OSError, HttpParseError, zlib.error, EOFError, ValueError) as e:
+        return str(e) or e.__class__.__name__
+    if status >= 500:
+        return "probe answered {}".format(status)
+    return None
+
+
+class HealthChecker(threading.Thread):
+    """
+    Background thread probing a set of upstreams.
+
+    Attributes:
+        registry (HealthRegistry): health states to update.
+        upstreams (list): (host, port) pairs to probe.
+        interval (float): seconds between two rounds of probes.
+        path (str): path requested by the probes.
+        timeout (float): timeout of one probe.
+    """
+
+    def __init__(self, registry, upstreams, interval=PROBE_INTERVAL,
+                 path=PROBE_PATH, timeout=PROBE_TIMEOUT):
+        super().__init__(name="health-checker", daemon=True)
+        self.registry = registry
+        self.upstreams = list(upstreams)
+        self.interval = interval
+        self.path = path
+        self.timeout = timeout
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            for host, port in self.upstreams:
+                # One misbehaving upstream must not stop the probes of the others.
+                try:
+                    error = probe(host, port, self.path, self.timeout)
+                except Exception as e:
+                    error = "probe failed: {!r}".format(e)
+                if error is None:
+                    self.registry.record_success(host, port)
+                else:
+                    self.registry.record_failure(host, port, error)
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        """
+        Stops probing after the current round.
+        """
+        self._stopped.set()
+
+
+#: Health of the proxy upstreams, shared by the proxy threads.
+HEALTH = HealthRegistry()
@@ -21,17 +21,26 @@ Request and Response objects to handle client-server communication.
 """
 
 import urllib #add
+import socket
 from .request import Request
-from .response import Response
+from .response import Response, FileBody
+from .reader import RequestParser, HttpParseError, read_message
 from .dictionary import CaseInsensitiveDict
+from .aio import HANDLER_LOOP, is_async_handler
+from .websocket import VERSION, accept_key, valid_key, hand_over
 import os #add
-from urllib.parse import parse_qs, unquote_plus #add
+from urllib.parse import parse_qs, parse_qsl, unquote_plus #add
 
 MUST_AUTH_ROUTES = [
     ("GET", "/"),
     ("GET", "/index.html"),
     ("GET", "/chat.html")
 ]
+
+#: Seconds an idle persistent connection is kept open between requests.
+KEEPALIVE_TIMEOUT = 5
+#: Maximum number of requests served on one persistent connection.
+KEEPALIVE_MAX_REQUESTS = 100
 class HttpAdapter:
     """
     A mutable :class:`HTTP adapter <HTTP adapter>` for managing client connections
@@ -50,6 +59,10 @@ class HttpAdapter:
         routes (dict): Mapping of route paths to handler functions.
         request (Request): Request object for parsing incoming data.
         response (Response): Response object for building and sending replies.
+        upgrade (callable): set when the request was a WebSocket handshake,
+                            called as ``upgrade(conn, data)`` once the 101
+                            response is sent, with the bytes received after
+                            the request, to hand the socket over.
     """
 
     __attrs__ = [
@@ -60,6 +73,7 @@ class HttpAdapter:
         "routes",
         "request",
         "response",
+        "upgrade",
     ]
 
     def __init__(self, ip, port, conn, connaddr, routes):
@@ -87,8 +101,10 @@ class HttpAdapter:
         self.request = Request()
         #: Response
         self.response = Response()
+        #: WebSocket hand-over, see :meth:`begin_websocket`.
+        self.upgrade = None
     
-    def handle_client(self, conn, addr, routes):
+    def handle_client(self, conn, addr, routes, linger=None):
         """
         Handle an incoming client connection.
 
@@ -96,39 +112,224 @@ class HttpAdapter:
         invokes the appropriate route handler if available, builds the response,
         and sends it back to the client.
 
+        The connection is persistent: requests are served in order (including
+        pipelined ones already buffered) until the client asks to close, the
+        connection has been idle for :data:`KEEPALIVE_TIMEOUT` seconds or
+        :data:`KEEPALIVE_MAX_REQUESTS` requests have been served.
+
         :param conn (socket): The client socket connection.
         :param addr (tuple): The client's address.
         :param routes (dict): The route mapping for dispatching requests.
+        :param linger (callable): Asked before each response whether the
+                                  connection may stay open, e.g. a worker pool
+                                  closes it while other connections wait.
         """
 
         # Connection handler.
         self.conn = conn        
         # Connection address.
         self.connaddr = addr
+
+        parser = RequestParser()
+        served = 0
+        conn.settimeout(KEEPALIVE_TIMEOUT)
+        try:
+            while True:
+                try:
+                    msg = read_message(conn, parser)
+                except HttpParseError as e:
+                    print("[HttpAdapter] bad request from {}: {}".format(addr, e))
+                    conn.sendall(Response().build_error(e.status_code, e.reason))
+                    break
+                if msg is None:
+                    break
+
+                # Handle the request
+                served += 1
+                keep_alive = served < KEEPALIVE_MAX_REQUESTS and (linger is None or linger())
+                try:
+                    response = self.handle_request(msg, routes, keep_alive=keep_alive)
+                except HttpParseError as e:
+                    print("[HttpAdapter] bad request from {}: {}".format(addr, e))
+                    conn.sendall(Response().build_error(e.status_code, e.reason))
+                    break
+                except Exception as e:
+                    print("[HttpAdapter] error handling {}: {}".format(addr, e))
+                    conn.sendall(Response().build_error(500, "Internal Server Error"))
+                    break
+                conn.sendall(response)
+                for part in self.response.body_parts:
+                    if isinstance(part, FileBody):
+                        part.send_to(conn)
+                    else:
+                        conn.sendall(part)
+                if self.upgrade is not None:
+                    # The socket now belongs to the websocket handler.
+                    self.upgrade(conn, bytes(parser.buffer))
+                    conn = None
+                    break
+                if not self.response.keep_alive:
+                    break
+        except socket.timeout:
+            pass
+        except OSError as e:
+            print("[HttpAdapter] connection {} error: {}".format(addr, e))
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def handle_request(self, msg, routes, keep_alive=False):
+        """
+        Process a single framed HTTP request message and build its response.
+
+        This is the socket-free part of the request lifecycle: it prepares the
+        request object, applies access control, invokes the route hook and
+        builds the response bytes. It is shared by the thread-per-connection
+        mode (:meth:`handle_client`) and the event-loop serving mode, which
+        owns the socket I/O itself.
+
+        A fresh :class:`Request <Request>`/:class:`Response <Response>` pair is
+        used for every call, so one adapter can serve all the requests of a
+        persistent connection. After the call ``self.response.keep_alive``
+        tells the caller whether the connection may stay open, and
+        ``self.response.body_parts`` lists the bytes and file regions the
+        caller must stream after the returned bytes.
+
+        :param msg (HttpMessage): The request framed by :mod:`daemon.reader`.
+        :param routes (dict): The route mapping for dispatching requests.
+        :param keep_alive (bool): Whether the server allows the connection
+                                  to persist after this response.
+
+        :rtype bytes: The complete HTTP response.
+        """
+        response = self.begin_request(msg, routes, keep_alive)
+        if is_async_handler(response):
+            # An ``async def`` hook, its outbound I/O runs on the shared
+            # handler loop while this thread waits.
+            response = self.finish_request(HANDLER_LOOP.run(response))
+        return response
+
+    def begin_request(self, msg, routes, keep_alive=False):
+        """
+        Starts processing a request, see :meth:`handle_request`.
+
+        A sync hook runs here and the response bytes are returned. An
+        ``async def`` hook is only called, the awaitable is returned
+        instead: the caller runs it (see :mod:`daemon.aio`) and passes its
+        result to :meth:`finish_request`.
+
+        :rtype bytes or awaitable: The response, or the pending hook.
+        :raises HttpParseError: If the request line is malformed.
+        """
+
         # Request handler
-        req = self.request
+        req = self.request = Request()
         # Response handler
-        resp = self.response
+        resp = self.response = Response()
+        self.upgrade = None
+
+        if len(msg.start_line.split()) != 3:
+            raise HttpParseError(400, "Bad Request", "malformed request line")
+        req.prepare(msg.head.decode('utf-8', 'replace') + "\r\n\r\n", routes,
+                    body=msg.body.decode('utf-8', 'replace'))
+        resp.keep_alive = keep_alive and req.keep_alive
+        response = self.dispatch(req, resp)
+        if is_async_handler(response):
+            return response
+        return self.omit_body(response)
+
+    def dispatch(self, req, resp):
+        """
+        Applies access control and runs the route hook of a prepared
+        request, see :meth:`begin_request`.
 
-        # Handle the request
-        msg = conn.recv(1024).decode()
-        req.prepare(msg, routes)
+        :rtype bytes or awaitable: The response, or the pending hook.
+        """
         # ===== TASK 1B: COOKIE-BASED ACCESS CONTROL =====
         # Protect both '/' and '/index.html' (Request may normalize '/' -> '/index.html')
         if (req.method, req.path) in MUST_AUTH_ROUTES:
             req.prepare_auth()
+            if not req.auth:
+                # The page may be produced by a hook, do not run it.
+                return resp.build_unauthorized()
         # Handle request hook
         if req.hook:
             print("[HttpAdapter] hook in route-path METHOD {} PATH {}".format(req.hook._route_path,req.hook._route_methods))
-            resp.status_code = req.hook(headers = req.headers,body = req.body)
-            #
-            # TODO: handle for App hook here
-            #
+            params = req.params
+            if getattr(req.hook, "_route_query", False):
+                params = dict(params, query=dict(parse_qsl(req.query, keep_blank_values=True)))
+            if getattr(req.hook, "_route_websocket", False):
+                return self.begin_websocket(params)
+            result = req.hook(headers = req.headers,body = req.body, **params)
+            if is_async_handler(result):
+                return result
+            return resp.build_hook_response(req, result)
+
+        # The path is routed, but not for this method
+        if req.allow:
+            return resp.build_error(405, "Method Not Allowed", allow=req.allow)
 
         # Build response
-        response = resp.build_response(req)
-        conn.sendall(response)
-        conn.close()
+        return resp.build_response(req)
+
+    def begin_websocket(self, params):
+        """
+        Answers the WebSocket handshake of a websocket route, see
+        :mod:`daemon.websocket`.
+
+        On success :attr:`upgrade` is set, the caller sends the returned
+        101 response and then calls it to hand the socket over to the
+        route handler, which runs on the shared handler loop.
+
+        :param params (dict): keyword arguments of the handler.
+
+        :rtype bytes: The 101 response, or 426/400 for a bad handshake.
+        """
+        req, resp = self.request, self.response
+        headers = req.headers
+        tokens = [t.strip().lower() for t in headers.get('connection', '').split(',')]
+        if (headers.get('upgrade', '').lower() != "websocket" or "upgrade" not in tokens
+                or headers.get('sec-websocket-version') != VERSION):
+            return resp.build_error(426, "Upgrade Required",
+                                    headers={"Upgrade": "websocket", "Sec-WebSocket-Version": VERSION})
+        key = headers.get('sec-websocket-key', '')
+        if not valid_key(key):
+            return resp.build_error(400, "Bad Request")
+        hook = req.hook
+        self.upgrade = lambda conn, data: hand_over(conn, hook, headers, params, data)
+        return resp.build_switching_protocols(accept_key(key))
+
+    def finish_request(self, result):
+        """
+        Builds the response of a request once its hook returned.
+
+        :param result: value returned (or awaited) from the route hook, see
+                       :meth:`Response.build_hook_response`.
+
+        :rtype bytes: The complete HTTP response.
+        """
+        return self.omit_body(self.response.build_hook_response(self.request, result))
+
+    def omit_body(self, response):
+        """
+        Drops the body of the response to a ``HEAD`` request.
+
+        The header is kept as built for ``GET``, ``Content-Length``
+        included, and nothing follows it on the connection, so the next
+        response of a persistent connection stays framed.
+
+        :param response (bytes): The response built for the request.
+
+        :rtype bytes: The response, only its header for ``HEAD``.
+        """
+        if self.request.method != "HEAD":
+            return response
+        for part in self.response.body_parts:
+            if isinstance(part, FileBody):
+                part.close()
+        self.response.body_parts = []
+        end = response.find(b"\r\n\r\n")
+        return response if end < 0 else response[:end + 4]
 
     @property
     def extract_cookies(self, req, resp):
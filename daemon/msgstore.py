@@ -0,0 +1,452 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.msgstore
+~~~~~~~~~~~~~~~~~
+
+This module provides the append-only message log of the chat rooms.
+
+A :class:`MessageLog <MessageLog>` is a directory of segment files. Every
+message is one length-prefixed binary record, appended with a single
+``write`` and numbered by a sequence number (``seq``) that only grows,
+also across :meth:`MessageLog.reset`:
+
+    crc32 (4) | seq (8) | time (8) | sender length (2) | text length (4) | sender | text
+
+The CRC covers everything after it, a record torn by a crash is detected
+and cut off when the log is opened.
+
+An in-memory offset index maps each ``seq`` to its position, so
+:meth:`MessageLog.since` and :meth:`MessageLog.tail` read exactly the
+requested records, with one ``pread`` per segment, whatever the size of
+the log. The index of a segment is saved next to it (``.idx``) when the
+segment is sealed, only the active segment is scanned on open.
+
+- The active segment is sealed and a new one started once it grows past
+  ``segment_bytes``; only the newest ``retain_segments`` segments are kept.
+- ``sync`` chooses durability: ``"always"`` fsyncs each append,
+  ``"batch"`` fsyncs every ``sync_every`` appends or ``sync_interval``
+  seconds, ``"os"`` leaves it to the kernel.
+- Appends from several worker processes are serialized with
+  :func:`locked <daemon.shared.locked>`; a reader picks up the records,
+  segments and resets of other processes before it reads.
+
+Usage Example:
+--------------
+>>> log = MessageLog("db/msg_log")
+>>> log.append("10.0.0.2:8000", "hello").seq
+1
+>>> [m.text for m in log.since(0)]
+['hello']
+"""
+
+import os
+import time
+import zlib
+import struct
+import bisect
+import threading
+from array import array
+from collections import namedtuple
+
+from .shared import locked
+
+#: Record header: crc32, seq, time, sender length, text length.
+RECORD_HEADER = struct.Struct(">IQdHI")
+#: Size a segment may reach before a new one is started.
+SEGMENT_BYTES = 4 * 1024 * 1024
+#: Segments kept, older ones are deleted on rotation.
+RETAIN_SEGMENTS = 8
+#: Durability policies of :class:`MessageLog`.
+SYNC_POLICIES = ("always", "batch", "os")
+#: Appends between two fsyncs in ``"batch"`` mode.
+SYNC_EVERY = 64
+#: Seconds between two fsyncs of pending appends in ``"batch"`` mode.
+SYNC_INTERVAL = 1.0
+#: Extension of the segment files and of their saved index.
+SEGMENT_SUFFIX = ".log"
+INDEX_SUFFIX = ".idx"
+
+
+class Message(namedtuple("Message", ("seq", "time", "sender", "text"))):
+    """
+    One stored message.
+
+    :attrs seq (int): sequence number, increasing.
+    :attrs time (float): UNIX time of the append.
+    :attrs sender (str): "ip:port" of the author.
+    :attrs text (str): the message.
+    """
+
+    __slots__ = ()
+
+
+def encode_record(seq, timestamp, sender, text):
+    """
+    Encodes one message record.
+
+    :rtype bytes: header and payload.
+    """
+    sender = sender.encode("utf-8")
+    text = text.encode("utf-8")
+    body = RECORD_HEADER.pack(0, seq, timestamp, len(sender), len(text))[4:] + sender + text
+    return struct.pack(">I", zlib.crc32(body)) + body
+
+
+def decode_records(data, base=0):
+    """
+    Decodes the complete, valid records at the start of a buffer.
+
+    :param data (bytes): records, as read from a segment.
+    :param base (int): file offset of ``data``.
+
+    :rtype tuple: (list of (offset, Message), offset after the last valid record).
+    """
+    records = []
+    pos, size = 0, len(data)
+    view = memoryview(data)
+    while pos + RECORD_HEADER.size <= size:
+        crc, seq, timestamp, slen, tlen = RECORD_HEADER.unpack_from(data, pos)
+        end = pos + RECORD_HEADER.size + slen + tlen
+        if end > size or zlib.crc32(view[pos + 4:end]) != crc:
+            break
+        start = pos + RECORD_HEADER.size
+        records.append((base + pos, Message(seq, timestamp,
+                                            str(view[start:start + slen], "utf-8"),
+                                            str(view[start + slen:end], "utf-8"))))
+        pos = end
+    return records, base + pos
+
+
+class _Segment:
+    """
+    One segment file and its offset index.
+
+    Attributes:
+        base (int): seq of its first record.
+        path (str): the segment file.
+        offsets (array): file offset of each record, by ``seq - base``.
+        end (int): offset after the last indexed record.
+    """
+
+    __slots__ = ("base", "path", "offsets", "end", "fd")
+
+    def __init__(self, base, path):
+        self.base = base
+        self.path = path
+        self.offsets = array("Q")
+        self.end = 0
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+
+    @property
+    def last(self):
+        return self.base + len(self.offsets) - 1
+
+    def scan(self):
+        # Indexes the records appended since the last scan; returns False
+        # if the file ends with an incomplete or corrupt record.
+        size = os.fstat(self.fd).st_size
+        if size <= self.end:
+            return True
+        data = os.pread(self.fd, size - self.end, self.end)
+        records, end = decode_records(data, self.end)
+        for offset, _ in records:
+            self.offsets.append(offset)
+        self.end = end
+        return end == size
+
+    def load_index(self):
+        # Uses the index saved when the segment was sealed, if it matches.
+        try:
+            with open(self.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, "rb") as f:
+                data = f.read()
+            end, offsets = struct.unpack(">Q", data[:8])[0], array("Q")
+            offsets.frombytes(data[8:])
+            if offsets.itemsize != 8:
+                return False
+        except (OSError, ValueError, struct.error):
+            return False
+        if end != os.fstat(self.fd).st_size:
+            return False
+        self.offsets, self.end = offsets, end
+        return True
+
+    def save_index(self):
+        tmp = self.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(struct.pack(">Q", self.end) + self.offsets.tobytes())
+        os.replace(tmp, self.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX)
+
+    def read(self, first, last):
+        # Messages first..last (seqs), all indexed in this segment.
+        start = self.offsets[first - self.base]
+        stop = self.offsets[last - self.base + 1] if last < self.last else self.end
+        return [m for _, m in decode_records(os.pread(self.fd, stop - start, start), start)[0]]
+
+    def close(self):
+        os.close(self.fd)
+
+
+class MessageLog:
+    """
+    Append-only, segmented and indexed message log.
+
+    Attributes:
+        path (str): directory of the segments.
+        segment_bytes (int): size that seals the active segment.
+        retain_segments (int): segments kept on rotation.
+        sync (str): durability policy, one of :data:`SYNC_POLICIES`.
+        sync_every (int): appends between two fsyncs in ``"batch"`` mode.
+        sync_interval (float): seconds pending appends may wait for an fsync.
+    """
+
+    def __init__(self, path, segment_bytes=SEGMENT_BYTES, retain_segments=RETAIN_SEGMENTS,
+                 sync="batch", sync_every=SYNC_EVERY, sync_interval=SYNC_INTERVAL):
+        if sync not in SYNC_POLICIES:
+            raise ValueError("Invalid sync policy {}, expected one of {}".format(sync, SYNC_POLICIES))
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.retain_segments = max(1, retain_segments)
+        self.sync = sync
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._segments = []
+        self._dir_mtime = None
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self._flusher = None
+        self._pid = None
+        os.makedirs(path, exist_ok=True)
+
+    # -- segments ----------------------------------------------------------
+
+    def _segment_path(self, base):
+        return os.path.join(self.path, "{:020d}{}".format(base, SEGMENT_SUFFIX))
+
+    def _load(self):
+        # (Re)opens the segments on disk, under the file lock.
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        names = sorted(n for n in os.listdir(self.path) if n.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            segment = _Segment(int(name[:-len(SEGMENT_SUFFIX)]), os.path.join(self.path, name))
+            if name != names[-1] and segment.load_index():
+                self._segments.append(segment)
+                continue
+            if not segment.scan():
+                # Torn by a crash: no other writer holds the lock.
+                print("[MessageLog] truncating {} at offset {}".format(segment.path, segment.end))
+                os.truncate(segment.path, segment.end)
+            self._segments.append(segment)
+        if not self._segments:
+            self._segments.append(_Segment(1, self._segment_path(1)))
+        self._dir_mtime = os.stat(self.path).st_mtime_ns
+        self._pid = os.getpid()
+
+    def _refresh(self):
+        # Catches up with the appends, rotations and resets of other processes.
+        if self._pid != os.getpid() or os.stat(self.path).st_mtime_ns != self._dir_mtime:
+            with locked(self.path):
+                self._load()
+            return
+        active = self._segments[-1]
+        if os.fstat(active.fd).st_size > active.end:
+            with locked(self.path):
+                active.scan()
+
+    def _rotate(self):
+        active = self._segments[-1]
+        active.save_index()
+        self._segments.append(_Segment(active.last + 1, self._segment_path(active.last + 1)))
+        while len(self._segments) > self.retain_segments:
+            old = self._segments.pop(0)
+            old.close()
+            for path in (old.path, old.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self._dir_mtime = os.stat(self.path).st_mtime_ns
+
+    # -- durability --------------------------------------------------------
+
+    def _synced(self, fd):
+        # Applies the sync policy after an append, called under the lock.
+        if self.sync == "always":
+            os.fsync(fd)
+            return
+        if self.sync == "batch":
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every or \
+                    time.monotonic() - self._synced_at >= self.sync_interval:
+                self.flush()
+            elif self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_later, name="msglog-flush",
+                                                 daemon=True)
+                self._flusher.start()
+
+    def _flush_later(self):
+        time.sleep(self.sync_interval)
+        self.flush()
+
+    def flush(self):
+        """
+        Fsyncs the appends not yet on disk.
+        """
+        with self._lock:
+            if self._unsynced and self._segments:
+                os.fsync(self._segments[-1].fd)
+            self._unsynced = 0
+            self._synced_at = time.monotonic()
+
+    # -- API ---------------------------------------------------------------
+
+    def append(self, sender, text):
+        """
+        Appends a message.
+
+        :param sender (str): "ip:port" of the author.
+        :param text (str): the message.
+
+        :rtype Message: the stored message with its seq.
+        """
+        with self._lock, locked(self.path):
+            if self._pid != os.getpid() or os.stat(self.path).st_mtime_ns != self._dir_mtime:
+                self._load()
+            active = self._segments[-1]
+            if not active.scan():
+                # Torn by a crash, the lock rules out a write in progress.
+                os.truncate(active.path, active.end)
+            if active.end >= self.segment_bytes and active.offsets:
+                if self._unsynced:
+                    self.flush()
+                self._rotate()
+                active = self._segments[-1]
+            message = Message(active.last + 1, time.time(), sender, text)
+            record = encode_record(*message)
+            os.write(active.fd, record)
+            active.offsets.append(active.end)
+            active.end += len(record)
+            self._synced(active.fd)
+            return message
+
+    def since(self, seq, limit=None):
+        """
+        Returns the messages after a sequence number, oldest first.
+
+        :param seq (int): last seq already seen, 0 for the whole log.
+        :param limit (int): most messages returned, the oldest ones first.
+
+        :rtype list: :class:`Message` list, starting at :attr:`first_seq`
+                     if older messages were deleted.
+        """
+        with self._lock:
+            self._refresh()
+            first = max(seq + 1, self._segments[0].base)
+            last = self._segments[-1].last
+            if limit is not None:
+                last = min(last, first + limit - 1)
+            return self._read(first, last)
+
+    def tail(self, count):
+        """
+        Returns the newest messages, oldest first.
+
+        :param count (int): messages wanted.
+
+        :rtype list: at most ``count`` :class:`Message`.
+        """
+        with self._lock:
+            self._refresh()
+            last = self._segments[-1].last
+            first = max(last - count + 1, self._segments[0].base)
+            return self._read(first, last)
+
+    def _read(self, first, last):
+        messages = []
+        bases = [s.base for s in self._segments]
+        i = max(0, bisect.bisect_right(bases, first) - 1)
+        while first <= last and i < len(self._segments):
+            segment = self._segments[i]
+            stop = min(last, segment.last)
+            if first <= stop:
+                messages.extend(segment.read(first, stop))
+                first = stop + 1
+            i += 1
+        return messages
+
+    @property
+    def last_seq(self):
+        """
+        Seq of the newest message, ``first_seq - 1`` when empty.
+        """
+        with self._lock:
+            self._refresh()
+            return self._segments[-1].last
+
+    @property
+    def first_seq(self):
+        """
+        Seq of the oldest message kept.
+        """
+        with self._lock:
+            self._refresh()
+            return self._segments[0].base
+
+    def reset(self):
+        """
+        Deletes every message; numbering goes on from the last seq.
+        """
+        with self._lock, locked(self.path):
+            self._load()
+            base = self._segments[-1].last + 1
+            for segment in self._segments:
+                segment.close()
+                for path in (segment.path, segment.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            self._segments = [_Segment(base, self._segment_path(base))]
+            self._unsynced = 0
+            self._dir_mtime = os.stat(self.path).st_mtime_ns
+
+    def stats(self):
+        """
+        Returns the log counters.
+
+        :rtype dict: segments, messages kept, seq range and bytes on disk.
+        """
+        with self._lock:
+            self._refresh()
+            return {
+                "segments": len(self._segments),
+                "messages": self._segments[-1].last - self._segments[0].base + 1,
+                "first_seq": self._segments[0].base,
+                "last_seq": self._segments[-1].last,
+                "bytes": sum(s.end for s in self._segments),
+                "unsynced": self._unsynced,
+            }
+
+    def close(self):
+        """
+        Flushes and closes the segment files.
+        """
+        with self._lock:
+            self.flush()
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+            self._pid = None
@@ -0,0 +1,135 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.notify
+~~~~~~~~~~~~~~~~~
+
+This module lets ``async def`` route handlers wait for new data, to answer
+long-poll requests: the client asks for what follows the last value it
+has seen, and the response is held until something newer exists or a
+timeout expires.
+
+A :class:`Notifier <Notifier>` watches a counter, e.g. the last sequence
+number of a :class:`MessageLog <daemon.msgstore.MessageLog>`. Handlers
+``await notifier.wait(seen, timeout)`` on the shared handler loop (see
+:mod:`daemon.aio`), and whoever bumps the counter calls
+:meth:`Notifier.notify`, from any thread, to answer them at once.
+
+A waiting request costs a future on the handler loop. In the event-loop
+serving mode the connection itself only stays registered on the selector,
+so thousands of clients can wait at the same time; the thread modes hold
+one thread per waiting request.
+
+The counter may also move in another worker process (see
+:mod:`daemon.prefork`), where :meth:`notify` does not reach. While
+anybody waits, it is also checked every :data:`WATCH_INTERVAL` seconds.
+
+Usage Example:
+--------------
+>>> CHANGED = Notifier(lambda: HISTORY.last_seq)
+>>> @app.route("/updates", methods=["GET"])
+... async def updates(headers, body, query):
+...     await CHANGED.wait(int(query["since"]), POLL_TIMEOUT)
+...     return [m.text for m in HISTORY.since(int(query["since"]))]
+"""
+
+import asyncio
+
+from .aio import HANDLER_LOOP
+
+#: Seconds between two checks of the counter while requests wait.
+WATCH_INTERVAL = 0.25
+#: Longest wait of a long-poll request, below the handler timeout.
+POLL_TIMEOUT = 20.0
+
+
+class Notifier:
+    """
+    Wakes the coroutines waiting for a counter to move past a value.
+
+    The waiters and the watch task live on the handler loop, only
+    :meth:`notify` and :meth:`release` may be called from other threads.
+
+    Attributes:
+        current (callable): returns the counter, an ``int`` that only grows.
+        interval (float): seconds between two checks while anybody waits.
+    """
+
+    def __init__(self, current, interval=WATCH_INTERVAL, handler_loop=HANDLER_LOOP):
+        self.current = current
+        self.interval = interval
+        self._handler_loop = handler_loop
+        #: (value, future) of the waiting coroutines.
+        self._waiters = []
+        self._watching = False
+
+    def notify(self):
+        """
+        Wakes the waiters the counter moved past. Thread-safe, and cheap
+        when nobody waits.
+        """
+        if self._waiters:
+            self._handler_loop.loop().call_soon_threadsafe(self._wake)
+
+    def release(self):
+        """
+        Answers every waiter now, e.g. when the watched data was replaced
+        and they must look again. Thread-safe.
+        """
+        if self._waiters:
+            self._handler_loop.loop().call_soon_threadsafe(self._wake, True)
+
+    def _wake(self, release=False):
+        if not self._waiters:
+            return
+        current = self.current()
+        waiting = []
+        for value, future in self._waiters:
+            if future.done():
+                # Timed out or cancelled.
+                continue
+            if release or current > value:
+                future.set_result(current)
+            else:
+                waiting.append((value, future))
+        self._waiters = waiting
+
+    async def _watch(self):
+        try:
+            while self._waiters:
+                await asyncio.sleep(self.interval)
+                self._wake()
+        finally:
+            self._watching = False
+
+    async def wait(self, value, timeout=POLL_TIMEOUT):
+        """
+        Waits for the counter to move past a value.
+
+        :param value (int): last value the caller has seen.
+        :param timeout (float): seconds to wait at most, 0 to only check.
+
+        :rtype int: the counter, not past ``value`` if the wait timed out.
+        """
+        current = self.current()
+        if current > value or timeout <= 0:
+            return current
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((value, future))
+        if not self._watching:
+            self._watching = True
+            asyncio.ensure_future(self._watch())
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return self.current()
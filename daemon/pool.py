@@ -0,0 +1,256 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.pool
+~~~~~~~~~~~~~~~~~
+
+This module provides pools of persistent upstream connections for the proxy.
+
+A :class:`ConnectionPool <ConnectionPool>` keeps idle keep-alive sockets to
+one (host, port) upstream so consecutive forwarded requests skip the TCP
+handshake. Idle sockets expire before the backend closes them on its own
+keep-alive timeout, and each checkout validates the socket with a
+non-blocking peek: a socket the upstream has already closed (or that holds
+unexpected bytes) is discarded instead of being reused.
+
+Usage Example:
+--------------
+>>> pool = POOLS.get("127.0.0.1", 9000)
+>>> sock, reused = pool.acquire()
+>>> # ... send a request, read the framed response ...
+>>> pool.release(sock, reusable=True)
+"""
+
+import time
+import socket
+import threading
+from collections import deque
+
+#: Idle sockets kept per upstream.
+POOL_MAX_SIZE = 10
+#: Seconds an idle socket stays pooled, kept below the backend
+#: ``KEEPALIVE_TIMEOUT`` so the proxy drops it before the backend does.
+POOL_IDLE_TIMEOUT = 4.0
+#: Seconds allowed to establish a new upstream connection.
+CONNECT_TIMEOUT = 5.0
+
+
+def is_connection_alive(sock):
+    """
+    Tells whether an idle socket can still carry a request.
+
+    An idle keep-alive socket must have nothing to read: EOF means the peer
+    closed it and stray bytes mean the stream is out of sync.
+
+    :param sock (socket.socket): idle connected socket.
+
+    :rtype bool: True if the socket looks reusable.
+    """
+    timeout = sock.gettimeout()
+    try:
+        sock.setblocking(False)
+        sock.recv(1, socket.MSG_PEEK)
+    except (BlockingIOError, InterruptedError):
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.settimeout(timeout)
+    # Readable: either EOF or an unsolicited response.
+    return False
+
+
+class ConnectionPool:
+    """
+    Idle keep-alive connections to a single upstream.
+
+    Sockets are handed out most-recently-used first, the freshest socket
+    is the least likely to have been closed by the upstream.
+
+    Attributes:
+        host (str): upstream IP address.
+        port (int): upstream port.
+        max_size (int): idle sockets kept, extra released sockets are closed.
+        idle_timeout (float): seconds after which an idle socket is dropped.
+        connect_timeout (float): timeout of new connections.
+    """
+
+    def __init__(self, host, port, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT, connect_timeout=CONNECT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        #: (socket, idle since) pairs, the right end is the most recent.
+        self._idle = deque()
+        self._lock = threading.Lock()
+        #: Set once the upstream left the configuration.
+        self.closed = False
+        self.created = 0
+        self.reused = 0
+        self.expired = 0
+        self.stale = 0
+
+    def acquire(self):
+        """
+        Checks out a connection, reusing a healthy idle one if possible.
+
+        :rtype tuple: (socket (socket.socket), reused (bool)).
+        :raises OSError: If a new connection cannot be established.
+        """
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                sock, since = self._idle.pop()
+                if now - since > self.idle_timeout:
+                    self.expired += 1
+                    sock.close()
+                    continue
+            if is_connection_alive(sock):
+                with self._lock:
+                    self.reused += 1
+                return sock, True
+            with self._lock:
+                self.stale += 1
+            sock.close()
+
+        sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self.created += 1
+        return sock, False
+
+    def release(self, sock, reusable=True):
+        """
+        Returns a connection to the pool once its response has been read.
+
+        :param sock (socket.socket): the connection from :meth:`acquire`.
+        :param reusable (bool): False if the exchange left the connection
+                                unusable (error, ``Connection: close``).
+        """
+        if not reusable:
+            sock.close()
+            return
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            if self.closed:
+                # A discarded pool keeps no connection.
+                expired.append(sock)
+                sock = None
+            else:
+                # Expired sockets sit at the left end, the oldest.
+                while self._idle and now - self._idle[0][1] > self.idle_timeout:
+                    expired.append(self._idle.popleft()[0])
+                    self.expired += 1
+                if len(self._idle) < self.max_size:
+                    self._idle.append((sock, now))
+                    sock = None
+        for old in expired:
+            old.close()
+        if sock is not None:
+            sock.close()
+
+    def close(self):
+        """
+        Closes every idle connection, connections released later are
+        closed too.
+        """
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, deque()
+        for sock, _ in idle:
+            sock.close()
+
+    def stats(self):
+        """
+        Returns the pool counters.
+
+        :rtype dict: idle sockets and created/reused/expired/stale counts.
+        """
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "created": self.created,
+                "reused": self.reused,
+                "expired": self.expired,
+                "stale": self.stale,
+            }
+
+
+class PoolManager:
+    """
+    One :class:`ConnectionPool <ConnectionPool>` per (host, port) upstream,
+    created on first use.
+    """
+
+    def __init__(self, **pool_kwargs):
+        self.pool_kwargs = pool_kwargs
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, host, port):
+        """
+        Returns the pool of an upstream.
+
+        :param host (str): upstream IP address.
+        :param port (int): upstream port.
+
+        :rtype ConnectionPool: the pool, shared by all callers.
+        """
+        key = (host, port)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = self._pools[key] = ConnectionPool(host, port, **self.pool_kwargs)
+        return pool
+
+    def discard(self, host, port):
+        """
+        Closes and forgets the pool of an upstream that left the configuration.
+
+        :param host (str): upstream IP address.
+        :param port (int): upstream port.
+        """
+        with self._lock:
+            pool = self._pools.pop((host, port), None)
+        if pool is not None:
+            pool.close()
+
+    def close(self):
+        """
+        Closes the idle connections of every pool.
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
+
+    def stats(self):
+        """
+        Returns the counters of every pool.
+
+        :rtype dict: "host:port" to :meth:`ConnectionPool.stats`.
+        """
+        with self._lock:
+            pools = list(self._pools.items())
+        return {"{}:{}".format(*key): pool.stats() for key, pool in pools}
+
+
+#: Upstream connection pools shared by the proxy threads.
+POOLS = PoolManager()
@@ -0,0 +1,345 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.prefork
+~~~~~~~~~~~~~~~~~
+
+This module provides the pre-forked multi-process mode of the daemons.
+
+A Python process runs one thread at a time, so a single backend or proxy
+process uses one core however many threads it spawns. With ``workers=N``
+a :class:`Supervisor <Supervisor>` forks N worker processes that each open
+their own listening socket on the same port with ``SO_REUSEPORT``; the
+kernel spreads incoming connections over them.
+
+The supervisor itself serves nothing, it:
+
+- restarts a worker that exits unexpectedly (with a delay if it keeps
+  crashing right after starting),
+- on ``SIGHUP``, does a rolling restart: each worker is replaced by a
+  fresh one (which re-reads its configuration files) before the old one
+  is asked to stop, so the port keeps accepting throughout,
+- on ``SIGTERM``/``SIGINT``, stops every worker and exits.
+
+A worker asked to stop (``SIGTERM``) sets :data:`STOP`; its accept loop
+notices within :data:`ACCEPT_POLL_INTERVAL`, takes over the connections
+already queued on its socket and closes it, lets the requests in progress
+finish for up to :data:`GRACEFUL_TIMEOUT` seconds, then exits.
+
+Notes:
+------
+- Workers share nothing in memory: asset caches, upstream pools, load
+  counters and health state are per worker. State that must be shared
+  (e.g. the tracker peer list) lives in files under ``db/``, accessed
+  through :mod:`daemon.shared`.
+- Requires ``os.fork`` and ``SO_REUSEPORT`` (Linux, BSD, macOS); elsewhere
+  the daemon falls back to a single process.
+
+Usage Example:
+--------------
+>>> Supervisor(lambda: run_backend("0.0.0.0", 9000, {}, reuse_port=True), workers=4).run()
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import threading
+import traceback
+
+#: Seconds a stopping worker waits for its requests in progress.
+GRACEFUL_TIMEOUT = 10.0
+#: A worker exiting sooner than this after its start is restarted with a delay.
+MIN_UPTIME = 1.0
+#: Delay before restarting a worker that crashed right after starting.
+RESTART_DELAY = 1.0
+#: Seconds given to a new worker to start listening during a rolling restart.
+READY_DELAY = 0.5
+#: Seconds an accept loop waits before checking :data:`STOP` again.
+ACCEPT_POLL_INTERVAL = 0.5
+#: Name prefix of the threads serving a client connection, waited for on stop.
+CONNECTION_THREAD_PREFIX = "conn-"
+
+#: Set when this worker is asked to stop, checked by the accept loops.
+#: Stopping is not done by raising from the signal handler, which could
+#: land between an ``accept()`` and the start of the connection thread.
+STOP = threading.Event()
+
+
+def reuse_port_supported():
+    """
+    Tells whether the pre-forked mode is available on this platform.
+
+    :rtype bool: True if ``os.fork`` and ``SO_REUSEPORT`` exist.
+    """
+    return hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT")
+
+
+def listen_socket(ip, port, backlog=50, reuse_port=False):
+    """
+    Creates a bound, listening TCP socket.
+
+    ``accept()`` times out every :data:`ACCEPT_POLL_INTERVAL` seconds so
+    the accept loop can check :data:`STOP`.
+
+    :param ip (str): IP address to bind.
+    :param port (int): port to bind.
+    :param backlog (int): listen backlog.
+    :param reuse_port (bool): set ``SO_REUSEPORT`` so that several worker
+                              processes can listen on the same port.
+
+    :rtype socket.socket: the listening socket.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    server.bind((ip, port))
+    server.listen(backlog)
+    server.settimeout(ACCEPT_POLL_INTERVAL)
+    return server
+
+
+def accept_pending(server):
+    """
+    Accepts the connections already queued on a listening socket.
+
+    With ``SO_REUSEPORT`` every worker has its own accept queue; closing
+    the socket of a stopping worker would reset the connections the kernel
+    already queued on it, so they are taken over first.
+
+    :param server (socket.socket): the listening socket, left non-blocking.
+
+    :rtype list: (conn, addr) pairs.
+    """
+    pending = []
+    server.setblocking(False)
+    while True:
+        try:
+            conn, addr = server.accept()
+        except OSError:
+            return pending
+        conn.setblocking(True)
+        pending.append((conn, addr))
+
+
+def connection_thread_name(addr):
+    """
+    Names the thread serving a client, so a stopping worker can wait for it.
+
+    :param addr (tuple): client address (IP, port).
+
+    :rtype str: the thread name.
+    """
+    return "{}{}:{}".format(CONNECTION_THREAD_PREFIX, addr[0], addr[1])
+
+
+def wait_connections(timeout):
+    """
+    Waits until no connection thread is left, or the timeout.
+
+    :param timeout (float): seconds to wait at most.
+
+    :rtype bool: True if every connection finished.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not any(t.name.startswith(CONNECTION_THREAD_PREFIX) for t in threading.enumerate()):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _request_stop(signum, frame):
+    STOP.set()
+
+
+def _worker_main(target, index):
+    # Runs in the forked child and never returns.
+    signal.signal(signal.SIGTERM, _request_stop)
+    # Ctrl-C reaches the whole process group, let the supervisor decide.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    os.environ["WEAPROUS_WORKER"] = str(index)
+    code = 0
+    try:
+        # Returns once STOP is set and the listening socket is closed.
+        target()
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    wait_connections(GRACEFUL_TIMEOUT)
+    sys.stdout.flush()
+    os._exit(code)
+
+
+class Supervisor:
+    """
+    Forks and watches the worker processes of a daemon.
+
+    Attributes:
+        target (callable): serves forever in a worker, called without arguments.
+        workers (int): number of worker processes.
+        name (str): label used in the logs.
+        graceful_timeout (float): seconds a worker gets to stop before it is killed.
+    """
+
+    def __init__(self, target, workers, name="Backend", graceful_timeout=GRACEFUL_TIMEOUT):
+        self.target = target
+        self.workers = workers
+        self.name = name
+        self.graceful_timeout = graceful_timeout
+        #: pid to (worker index, start time).
+        self.children = {}
+        self._stopping = False
+        self._rolling = False
+
+    def spawn(self, index):
+        """
+        Forks one worker.
+
+        :param index (int): worker slot, exported as ``WEAPROUS_WORKER``.
+
+        :rtype int: pid of the worker.
+        """
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            _worker_main(self.target, index)
+        self.children[pid] = (index, time.monotonic())
+        print("[{}] Worker {} started, pid {}".format(self.name, index, pid))
+        return pid
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _on_hup(self, signum, frame):
+        self._rolling = True
+
+    def run(self):
+        """
+        Starts the workers and supervises them until ``SIGTERM``/``SIGINT``.
+        """
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_hup)
+        for index in range(self.workers):
+            self.spawn(index)
+
+        restarts = []
+        while not self._stopping:
+            restarts.extend(self._reap())
+            now = time.monotonic()
+            for due, index in [r for r in restarts if r[0] <= now]:
+                restarts.remove((due, index))
+                self.spawn(index)
+            if self._rolling:
+                self._rolling = False
+                self.rolling_restart()
+            time.sleep(0.1)
+        self.stop()
+
+    def _reap(self):
+        # Collects exited workers, returns (restart time, slot) pairs.
+        restarts = []
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            index, started = self.children.pop(pid, (None, 0.0))
+            if index is None:
+                continue
+            uptime = time.monotonic() - started
+            # A worker dying on startup would otherwise be forked in a loop.
+            delay = RESTART_DELAY if uptime < MIN_UPTIME else 0.0
+            print("[{}] Worker {} (pid {}) exited with status {} after {:.1f}s, "
+                  "restarting in {:.0f}s".format(self.name, index, pid, status, uptime, delay))
+            restarts.append((time.monotonic() + delay, index))
+        return restarts
+
+    def _retire(self, pid):
+        # Asks one worker to stop and waits for it, killing it past the timeout.
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.children.pop(pid, None)
+            return
+        deadline = time.monotonic() + self.graceful_timeout + 1.0
+        while time.monotonic() < deadline:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+            if done:
+                break
+            time.sleep(0.05)
+        else:
+            print("[{}] Worker pid {} did not stop in time, killing it".format(self.name, pid))
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.children.pop(pid, None)
+
+    def rolling_restart(self):
+        """
+        Replaces the workers one at a time, so the port never stops accepting.
+        """
+        print("[{}] Rolling restart of {} workers".format(self.name, len(self.children)))
+        for pid, (index, _) in list(self.children.items()):
+            self.spawn(index)
+            time.sleep(READY_DELAY)
+            self._retire(pid)
+
+    def stop(self):
+        """
+        Stops every worker gracefully.
+        """
+        print("[{}] Stopping {} workers".format(self.name, len(self.children)))
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+        deadline = time.monotonic() + self.graceful_timeout + 1.0
+        while self.children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.children.pop(pid, None)
+            else:
+                time.sleep(0.05)
+        for pid in list(self.children):
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.children.clear()
+
+
+def run_workers(target, workers, name="Backend"):
+    """
+    Runs ``target`` in ``workers`` pre-forked processes, or in this process
+    when a single worker is asked for or the platform lacks support.
+
+    :param target (callable): takes ``reuse_port`` (bool) and serves forever.
+    :param workers (int): number of worker processes.
+    :param name (str): label used in the logs.
+    """
+    if workers > 1 and not reuse_port_supported():
+        print("[{}] Pre-forked workers need os.fork and SO_REUSEPORT, "
+              "running a single process".format(name))
+        workers = 1
+    if workers <= 1:
+        target(reuse_port=False)
+        return
+    Supervisor(lambda: target(reuse_port=True), workers, name).run()
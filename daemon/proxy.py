@@ -24,16 +24,23 @@ Requirement:
 - threading: enables concurrent client handling via threads.
 - response: customized :class: `Response <Response>` utilities.
 - httpadapter: :class: `HttpAdapter <HttpAdapter >` adapter for HTTP request processing.
+- pool: :class: `ConnectionPool <ConnectionPool>` keep-alive connections to the backends.
 - dictionary: :class: `CaseInsensitiveDict <CaseInsensitiveDict>` for managing headers and cookies.
+- prefork: :class: `Supervisor <Supervisor>` for the pre-forked worker processes.
 
 """
 import socket
 import threading
+from functools import partial
 from .response import *
-from .httpadapter import HttpAdapter
+from .httpadapter import HttpAdapter, KEEPALIVE_TIMEOUT
 from .dictionary import CaseInsensitiveDict
-import random
-_RR_INDEX = {}
+from .reader import RequestParser, ResponseParser, HttpParseError, read_head, parse_chunk_size
+from .pool import POOLS
+from .balancer import BALANCER, LOADS
+from .health import HEALTH, HealthChecker
+from .routing import RoutingTable, LiveRoutes, ConfigWatcher, compile_routes
+from .prefork import STOP, listen_socket, accept_pending, connection_thread_name, run_workers
 
 #: A dictionary mapping hostnames to backend IP and port tuples.
 #: Used to determine routing targets for incoming requests.
@@ -45,165 +52,394 @@ PROXY_PASS = {
 
 
 
-def forward_request(host, port, request):
+#: Seconds to wait on an upstream socket while reading a response.
+UPSTREAM_TIMEOUT = 30.0
+#: Size of the relay buffer, the most body bytes held per connection.
+RELAY_BUFFER_SIZE = 64 * 1024
+#: Hop-by-hop fields dropped when a message crosses the proxy.
+HOP_BY_HOP = (b"connection:", b"keep-alive:", b"proxy-connection:")
+
+
+def rewrite_connection(msg, value):
     """
-    Forwards an HTTP request to a backend server and retrieves the response.
+    Serializes a framed message with its ``Connection`` header replaced.
 
-    :params host (str): IP address of the backend server.
-    :params port (int): port number of the backend server.
-    :params request (str): incoming HTTP request.
+    Connection management is hop-by-hop: the proxy keeps persistent
+    connections to the backends while each client hop is closed after
+    its response. The body is forwarded exactly as received.
+
+    :params msg (HttpMessage): message framed by :mod:`daemon.reader`.
+    :params value (str): new ``Connection`` value, "keep-alive" or "close".
 
-    :rtype bytes: Raw HTTP response from the backend server. If the connection
-                  fails, returns a 404 Not Found response.
+    :rtype bytes: the message with a single ``Connection`` header.
     """
+    lines = [line for line in msg.head.split(b"\r\n")
+             if not line.lower().startswith(HOP_BY_HOP)]
+    lines.append(b"Connection: " + value.encode("ascii"))
+    return b"\r\n".join(lines) + b"\r\n\r\n" + msg.raw_body
 
-    backend = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
-    try:
-        backend.connect((host, port))
-        backend.sendall(request.encode())
-        response = b""
-        while True:
-            chunk = backend.recv(4096)
-            if not chunk:
-                break
-            response += chunk
-        return response
-    except socket.error as e:
-      print("Socket error: {}".format(e))
-      return (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
+def upstream_keeps_alive(msg):
+    """
+    Tells whether the upstream connection can carry another request after
+    this response, as far as its headers are concerned.
+
+    :params msg (HttpMessage): the upstream response.
+
+    :rtype bool: True if the connection may go back to the pool.
+    """
+    connection = msg.headers.get("connection", "").lower()
+    if msg.start_line.startswith("HTTP/1.0"):
+        return "keep-alive" in connection
+    return "close" not in connection
+
+
+class BodyReadError(OSError):
+    """
+    Raised by :func:`pump_body` when the socket the body is read from
+    fails, times out or closes in the middle of the body.
+    """
+
+
+class ClientError(Exception):
+    """
+    Raised by :func:`relay_request` when the client, not the backend,
+    fails while its request body is relayed: it aborted, timed out or
+    sent a malformed chunked body.
+
+    :attrs cause (Exception): the :class:`BodyReadError` or
+                              :class:`HttpParseError <daemon.reader.HttpParseError>`.
+    """
 
+    def __init__(self, cause):
+        super().__init__(str(cause))
+        self.cause = cause
 
-def resolve_routing_policy(hostname, routes):
+
+class BodyFramer:
     """
-    Handles an routing policy to return the matching proxy_pass.
-    It determines the target backend to forward the request to.
+    Finds where a streamed body ends without buffering it.
+
+    :meth:`consume` is given the bytes as they are received and tells how
+    many of them belong to the body; chunked bodies are tracked with a
+    small state machine so chunk data is never copied.
 
-    :params host (str): IP address of the request target server.
-    :params port (int): port number of the request target server.
-    :params routes (dict): dictionary mapping hostnames and location.
+    Attributes:
+        kind (str): "length", "chunked" or "close", as framed by :mod:`daemon.reader`.
+        done (bool): True once the end of the body has been seen.
     """
 
-    print(hostname)
-    proxy_map, policy = routes.get(hostname,('127.0.0.1:9000','round-robin'))
-    print(proxy_map)
-    print(policy)
-
-    proxy_host = '192.168.1.6'
-    proxy_port = '9000'
-    if isinstance(proxy_map, list):
-        if len(proxy_map) == 0:
-            print("[Proxy] Emtpy resolved routing of hostname {}".format(hostname))
-            print("Empty proxy_map result")
-            # TODO: implement the error handling for non mapped host
-            #       the policy is design by team, but it can be 
-            #       basic default host in your self-defined system
-            # Use a dummy host to raise an invalid connection
-            proxy_host = '127.0.0.1'
-            proxy_port = '9000'
-        elif len(proxy_map) == 1:
-            # proxy_map is a single entry list
-            # Example: ["10.0.19.29:9000"]
-            # => proxy_host = "10.0.19.29"
-            # => proxy_port = "9000"
-            proxy_host, proxy_port = proxy_map[0].split(":", 2)
-            
-        elif len(proxy_map) >= 2:
-            print("[Proxy] resolve route of hostname {} with policy {}".format(hostname, policy))
-            if policy == 'round-robin':
-                global _RR_INDEX
-                index = _RR_INDEX.get(hostname, 0)
-                proxy_host, proxy_port = proxy_map[index].split(":", 2)
-                index = (index + 1) % len(proxy_map)
-                _RR_INDEX[hostname] = index
-            elif policy == 'random':
-                selected = random.choice(proxy_map)
-                proxy_host, proxy_port = selected.split(":", 2)
+    def __init__(self, kind, length=None):
+        self.kind = kind
+        self.remaining = length if kind == "length" else 0
+        self.done = kind == "length" and length == 0
+        # Chunked state: "size", "data", "data_crlf" or "trailer".
+        self._state = "size"
+        self._line = bytearray()
+
+    def consume(self, view):
+        """
+        Accounts for received bytes.
+
+        :params view (memoryview): bytes received after the previous call.
+
+        :rtype int: number of leading bytes of ``view`` that belong to the body.
+        :raises HttpParseError: If the chunked encoding is malformed.
+        """
+        if self.kind == "close":
+            return len(view)
+        if self.kind == "length":
+            n = min(len(view), self.remaining)
+            self.remaining -= n
+            self.done = self.remaining == 0
+            return n
+
+        pos, end = 0, len(view)
+        while pos < end and not self.done:
+            if self._state in ("data", "data_crlf"):
+                n = min(end - pos, self.remaining)
+                pos += n
+                self.remaining -= n
+                if self.remaining == 0:
+                    if self._state == "data":
+                        self._state, self.remaining = "data_crlf", 2
+                    else:
+                        self._state = "size"
+                continue
+            # Size and trailer lines are short, walk them byte by byte.
+            byte = view[pos]
+            pos += 1
+            if byte != 0x0A:
+                self._line.append(byte)
+                if len(self._line) > 1024:
+                    raise HttpParseError(400, "Bad Request", "chunk line too long")
+                continue
+            line = bytes(self._line).rstrip(b"\r")
+            self._line.clear()
+            if self._state == "trailer":
+                self.done = not line
+                continue
+            size = parse_chunk_size(line)
+            if size == 0:
+                self._state = "trailer"
             else:
-                print("[Proxy] Unknown policy {}, using default host".format(policy))
-                # Out-of-handle mapped host
-                proxy_host = '127.0.0.1' 
-                proxy_port = '9000'
-    else:
-        print("[Proxy] resolve route of hostname {} is a singulair to".format(hostname))
-        proxy_host, proxy_port = proxy_map.split(":", 2)
+                self._state, self.remaining = "data", size
+        return pos
+
+
+def pump_body(src, dst, framer, pending, buf):
+    """
+    Copies a body from one socket to another as it arrives.
+
+    Bytes are received into the fixed ``buf`` with ``recv_into`` and sent
+    from a memoryview of it, so at most ``len(buf)`` bytes are held and a
+    slow receiver throttles the sender through the blocking ``sendall``.
+
+    :params src (socket.socket): socket the body is read from.
+    :params dst (socket.socket): socket the body is written to.
+    :params framer (BodyFramer): framing of the body.
+    :params pending (bytes): body bytes already received with the header block.
+    :params buf (bytearray): relay buffer.
+
+    :rtype bool: True if ``src`` ended exactly at the end of the body, False
+                 if it sent extra bytes or delimited the body by closing.
+    :raises BodyReadError: If ``src`` fails or closes mid-body.
+    :raises OSError: If ``dst`` fails.
+    :raises HttpParseError: If the chunked encoding is malformed.
+    """
+    if pending:
+        n = framer.consume(memoryview(pending))
+        dst.sendall(pending[:n])
+        if n < len(pending):
+            return False
+    view = memoryview(buf)
+    while not framer.done:
+        try:
+            received = src.recv_into(buf)
+        except OSError as e:
+            raise BodyReadError(str(e)) from e
+        if received == 0:
+            if framer.kind == "close":
+                return False
+            raise BodyReadError("connection closed in the middle of a body")
+        n = framer.consume(view[:received])
+        dst.sendall(view[:n])
+        if n < received:
+            return False
+    return True
+
+
+def relay_request(host, port, conn, request, framing, pending):
+    """
+    Streams a request to a backend and its response back to the client.
+
+    Neither body is buffered whole: both are piped through a
+    :data:`RELAY_BUFFER_SIZE` buffer as they arrive, so the client gets the
+    first bytes of a large file as soon as the backend sends them. The
+    backend connection comes from the pool and goes back to it when the
+    response ended cleanly. A request whose body was received in full with
+    its header is retried once if a reused connection turns out closed.
+    The request counts as outstanding in the upstream load counters of
+    :mod:`daemon.balancer` until the relay ends.
+
+    :params host (str): IP address of the backend server.
+    :params port (int): port number of the backend server.
+    :params conn (socket.socket): client connection socket.
+    :params request (HttpMessage): request header block, see
+                                   :meth:`RequestParser.next_head <daemon.reader.RequestParser.next_head>`.
+    :params framing (tuple): framing of the request body.
+    :params pending (bytes): request body bytes received with the header.
+
+    :rtype bool: True once the response header was sent to the client,
+                 any later failure only cuts the response short.
+    :raises OSError: If the backend cannot be reached or fails before
+                     answering, the caller still owns the client response.
+    :raises HttpParseError: If the backend response is malformed.
+    :raises ClientError: If the client fails while its body is relayed,
+                         which says nothing about the backend health.
+    """
+    load = LOADS.get(host, port)
+    started = load.begin()
+    try:
+        pool = POOLS.get(host, port)
+        method = request.start_line.split(" ", 1)[0].upper()
+        head = rewrite_connection(request, "keep-alive")
+        kind, length = framing
+        # A body already received in full can be sent again on a retry.
+        replayable = kind == "length" and length <= len(pending)
+        buf = bytearray(RELAY_BUFFER_SIZE)
+
+        for attempt in range(2):
+            upstream, reused = pool.acquire()
+            upstream.settimeout(UPSTREAM_TIMEOUT)
+            parser = ResponseParser()
+            parser.request_method = method
+            try:
+                if replayable:
+                    upstream.sendall(head + pending[:length])
+                else:
+                    upstream.sendall(head)
+                    try:
+                        pump_body(conn, upstream, BodyFramer(kind, length), pending, buf)
+                    except (BodyReadError, HttpParseError) as e:
+                        # The backend got half a request, drop the connection.
+                        upstream.close()
+                        raise ClientError(e)
+                response = read_head(upstream, parser)
+            except OSError:
+                upstream.close()
+                if reused and replayable and attempt == 0:
+                    continue
+                raise
+            except HttpParseError:
+                upstream.close()
+                raise
+            if response is None:
+                upstream.close()
+                if reused and replayable and attempt == 0 and not parser.buffer:
+                    continue
+                raise OSError("{}:{} closed the connection without a response".format(host, port))
+            break
+
+        # Latency is sampled at the response header, the body transfer
+        # time depends on its size rather than on the backend load.
+        load.observe(started)
+        HEALTH.record_success(host, port)
+        msg, resp_framing = response
+        try:
+            conn.sendall(rewrite_connection(msg, "close"))
+            in_sync = pump_body(upstream, conn, BodyFramer(*resp_framing), bytes(parser.buffer), buf)
+        except (OSError, HttpParseError) as e:
+            print("[Proxy] relay from {}:{} cut short: {}".format(host, port, e))
+            upstream.close()
+            return True
+        pool.release(upstream, in_sync and upstream_keeps_alive(msg))
+        return True
+    finally:
+        load.end()
+
+
+def affinity_key(vhost, addr, headers):
+    """
+    Computes the session affinity key of a request for ``consistent-hash``.
+
+    The virtual host ``hash_key`` is ``"ip"`` for the client IP or
+    ``"cookie:<name>"`` for the value of a cookie; a request without that
+    cookie falls back to its client IP.
+
+    :params vhost (VirtualHost): the matched virtual host.
+    :params addr (tuple): client address (IP, port).
+    :params headers (CaseInsensitiveDict): request header fields.
+
+    :rtype str: the affinity key.
+    """
+    if vhost.hash_key.startswith("cookie:"):
+        name = vhost.hash_key[len("cookie:"):]
+        for pair in headers.get("cookie", "").split(";"):
+            key, sep, value = pair.strip().partition("=")
+            if sep and key == name and value:
+                return "cookie:" + value
+    return addr[0]
+
+
+def select_upstream(vhost, key=None):
+    """
+    Applies the routing policy of a virtual host to pick its upstream.
+
+    Upstreams ejected by :mod:`daemon.health` are skipped.
+
+    :params vhost (VirtualHost): the matched virtual host.
+    :params key (str): affinity key of the request, see :func:`affinity_key`.
+
+    :rtype Upstream or None: the upstream, or None when the virtual host
+                             has no healthy upstream left.
+    """
+    members = vhost.upstreams
+    if not HEALTH.all_healthy():
+        members = [m for m in members if HEALTH.is_healthy(m.host, m.port)]
+    if not members:
+        return None
+    if len(members) == 1:
+        return members[0]
+    return BALANCER.select(vhost.name, members, vhost.policy, key)
 
-    return proxy_host, proxy_port
 
 def handle_client(ip, port, conn, addr, routes):
     """
     Handles an individual client connection by parsing the request,
     determining the target backend, and forwarding the request.
 
-    The handler extracts the Host header from the request to
-    matches the hostname against known routes. In the matching
-    condition,it forwards the request to the appropriate backend.
+    The handler matches the Host header of the request against the
+    compiled routing table and forwards the request to the upstream
+    chosen by the policy of the virtual host.
 
     The handler sends the backend response back to the client or
-    returns 404 if the hostname is unreachable or is not recognized.
+    answers 502 Bad Gateway (504 on timeout) if the backend fails, and
+    503 Service Unavailable with ``Retry-After`` when every upstream of
+    the hostname is ejected by the health checks.
 
     :params ip (str): IP address of the proxy server.
     :params port (int): port number of the proxy server.
     :params conn (socket.socket): client connection socket.
     :params addr (tuple): client address (IP, port).
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes (RoutingTable or LiveRoutes): compiled virtual hosts.
     """
 
-    request = conn.recv(1024).decode()
-
-    # Extract Host header (keep original value, we'll test variants)
-    host_header = None
-    for line in request.splitlines():
-        if line.lower().startswith('host:'):
-            host_header = line.split(':', 1)[1].strip()
-            break
-
-    # Normalize variants: full header (may include port), host without port,
-    # and host combined with the proxy listen port (useful when client omits port)
-    hostname_full = host_header
-    hostname_noport = hostname_full.split(':', 1)[0].strip() if hostname_full else None
-    hostname_with_listen = f"{hostname_noport}:{port}" if hostname_noport else None
-
-    print("[Proxy] {} at Host: {}".format(addr, host_header))
-
-    # Try lookup in routes with priority: exact header, host:listen_port, host without port
-    if hostname_full and hostname_full in routes:
-        lookup_key = hostname_full
-    elif hostname_with_listen and hostname_with_listen in routes:
-        lookup_key = hostname_with_listen
-    else:
-        lookup_key = hostname_noport
-
-    # Resolve the matching destination in routes and convert port to int
-    resolved_host, resolved_port = resolve_routing_policy(lookup_key, routes)
+    # The request body is streamed to the backend, not buffered, so it
+    # is not subject to the parser body limit.
+    parser = RequestParser(max_body_size=None)
     try:
-        resolved_port = int(resolved_port)
-    except ValueError:
-        print("Not a valid integer")
-
-    if resolved_host:
-        print("[Proxy] Host name {} is forwarded to {}:{}".format(lookup_key, resolved_host, resolved_port))
-        response = forward_request(resolved_host, resolved_port, request)        
+        conn.settimeout(KEEPALIVE_TIMEOUT)
+        head = read_head(conn, parser)
+    except HttpParseError as e:
+        print("[Proxy] bad request from {}: {}".format(addr, e))
+        conn.sendall(Response().build_error(e.status_code, e.reason))
+        conn.close()
+        return
+    except OSError:
+        conn.close()
+        return
+    if head is None:
+        conn.close()
+        return
+    msg, framing = head
+
+    vhost = routes.match(msg.headers.get('host'), port)
+    upstream = select_upstream(vhost, affinity_key(vhost, addr, msg.headers))
+
+    response = None
+    if upstream is None and not vhost.upstreams:
+        print("[Proxy] Host {} has no proxy_pass".format(vhost.name))
+        response = Response().build_error(502, "Bad Gateway")
+    elif upstream is None:
+        # Every upstream is ejected, tell the client when one is retried.
+        retry_after = HEALTH.retry_after([(m.host, m.port) for m in vhost.upstreams])
+        response = Response().build_error(503, "Service Unavailable", retry_after=retry_after)
     else:
-        response = (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
-    conn.sendall(response)
+        host, upstream_port = upstream.host, upstream.port
+        try:
+            conn.settimeout(UPSTREAM_TIMEOUT)
+            relay_request(host, upstream_port, conn, msg, framing, bytes(parser.buffer))
+        except ClientError as e:
+            print("[Proxy] request body from {} failed: {}".format(addr, e))
+            if isinstance(e.cause, HttpParseError):
+                response = Response().build_error(e.cause.status_code, e.cause.reason)
+        except socket.timeout as e:
+            print("[Proxy] upstream {} timed out".format(upstream))
+            HEALTH.record_failure(host, upstream_port, "timeout")
+            response = Response().build_error(504, "Gateway Timeout")
+        except (OSError, HttpParseError) as e:
+            print("[Proxy] upstream {} failed: {}".format(upstream, e))
+            HEALTH.record_failure(host, upstream_port, e)
+            response = Response().build_error(502, "Bad Gateway")
+    if response is not None:
+        try:
+            conn.sendall(response)
+        except OSError:
+            pass
     conn.close()
 
-def run_proxy(ip, port, routes):
+def run_proxy(ip, port, routes, reuse_port=False):
     """
     Starts the proxy server and listens for incoming connections. 
 
@@ -214,18 +450,21 @@ def run_proxy(ip, port, routes):
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes (RoutingTable or LiveRoutes): compiled virtual hosts.
+    :params reuse_port (bool): share the port with other worker processes.
 
     """
 
-    proxy = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    proxy = None
 
     try:
-        proxy.bind((ip, port))
-        proxy.listen(50)
+        proxy = listen_socket(ip, port, 50, reuse_port)
         print("[Proxy] Listening on IP {} port {}".format(ip,port))
-        while True:
-            conn, addr = proxy.accept()
+        while not STOP.is_set():
+            try:
+                conn, addr = proxy.accept()
+            except socket.timeout:
+                continue
             #
             #  TODO: implement the step of the client incomping connection
             #        using multi-thread programming with the
@@ -235,7 +474,8 @@ def run_proxy(ip, port, routes):
             ######IMPLEMENT######################
             thread = threading.Thread(
                 target=handle_client,
-                args=(ip, port, conn, addr, routes)
+                args=(ip, port, conn, addr, routes),
+                name=connection_thread_name(addr)
             )
             thread.daemon = True
             thread.start()
@@ -243,14 +483,89 @@ def run_proxy(ip, port, routes):
 
     except socket.error as e:
       print("Socket error: {}".format(e))
+    finally:
+        if proxy is not None:
+            for conn, addr in accept_pending(proxy):
+                threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes),
+                                 name=connection_thread_name(addr), daemon=True).start()
+            proxy.close()
+
+def reload_hook(checker=None):
+    """
+    Builds the callback run after the routing table was reloaded.
+
+    Pools, load counters and health state are keyed by (host, port), so
+    upstreams kept by the new configuration keep them as they are. Idle
+    connections to removed upstreams are closed and the active health
+    checker, if any, probes the new upstream list.
 
-def create_proxy(ip, port, routes):
+    :params checker (HealthChecker): the active health checker, or None.
+
+    :rtype callable: ``on_reload(old, new)`` for :class:`ConfigWatcher <daemon.routing.ConfigWatcher>`.
+    """
+    def on_reload(old, new):
+        upstreams = new.upstreams()
+        for upstream in set(old.upstreams()) - set(upstreams):
+            POOLS.discard(upstream.host, upstream.port)
+        if checker is not None:
+            checker.upstreams = [(m.host, m.port) for m in upstreams]
+    return on_reload
+
+
+def serve_proxy(ip, port, routes, health_interval=None, health_path="/",
+                config_file=None, watch_interval=1.0, reuse_port=False):
+    """
+    Runs the proxy server and its background threads in the current process.
+
+    :params routes (RoutingTable): compiled virtual hosts.
+    :params reuse_port (bool): share the port with other worker processes.
+
+    See :func:`create_proxy` for the other parameters.
+    """
+
+    checker = None
+    if health_interval:
+        upstreams = [(m.host, m.port) for m in routes.upstreams()]
+        checker = HealthChecker(HEALTH, upstreams, interval=health_interval, path=health_path)
+        checker.start()
+        print("[Proxy] Probing {} upstreams every {}s".format(len(upstreams), health_interval))
+
+    if config_file:
+        routes = LiveRoutes(routes)
+        watcher = ConfigWatcher(config_file, routes, watch_interval, reload_hook(checker))
+        if reuse_port:
+            # A worker forked by a rolling restart picks up the file as it
+            # is now, not as the supervisor read it at startup.
+            watcher.reload()
+        if threading.current_thread() is threading.main_thread():
+            watcher.install_sighup()
+        watcher.start()
+        print("[Proxy] Watching {} for changes".format(config_file))
+
+    run_proxy(ip, port, routes, reuse_port)
+
+
+def create_proxy(ip, port, routes, health_interval=None, health_path="/",
+                 config_file=None, watch_interval=1.0, workers=1):
     """
     Entry point for launching the proxy server.
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes (RoutingTable or dict): compiled virtual hosts, a routes
+                                          dictionary is compiled first.
+    :params health_interval (float): seconds between active health probes
+                                     of every upstream, None disables them.
+    :params health_path (str): path requested by the active probes.
+    :params config_file (str): file ``routes`` was loaded from; when given,
+                               it is reloaded on change and on SIGHUP.
+    :params watch_interval (float): seconds between two checks of ``config_file``.
+    :params workers (int): pre-forked worker processes sharing the port,
+                           each with its own pools, health and load state.
     """
 
-    run_proxy(ip, port, routes)
+    if not isinstance(routes, RoutingTable):
+        routes = compile_routes(routes)
+
+    run_workers(partial(serve_proxy, ip, port, routes, health_interval, health_path,
+                        config_file, watch_interval), workers, "Proxy")
@@ -0,0 +1,410 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.reader
+~~~~~~~~~~~~~~~~~
+
+This module provides an incremental, framing-aware reader for HTTP messages.
+
+Bytes received from a socket are pushed into a :class:`RequestParser
+<RequestParser>` which splits them into complete messages: the header block
+is read up to the blank line, then exactly ``Content-Length`` bytes or a
+``Transfer-Encoding: chunked`` body are collected. Parsing works on bytes,
+only the (small) header block is decoded, and limits on the header and
+body sizes protect the daemon from unbounded buffering.
+
+The parser never blocks, so it serves both the thread-per-connection mode
+(through :func:`read_message`) and the event-loop mode, which feeds it
+whatever each non-blocking ``recv`` returned. :class:`ResponseParser
+<ResponseParser>` applies the response framing rules, used when reading
+from upstream servers.
+
+Usage Example:
+--------------
+>>> parser = RequestParser()
+>>> parser.feed(b"GET / HTTP/1.1\\r\\nHost: a\\r\\n\\r\\n")
+>>> msg = parser.next_message()
+>>> msg.start_line, msg.headers["host"], msg.body
+('GET / HTTP/1.1', 'a', b'')
+"""
+
+import re
+
+from .dictionary import CaseInsensitiveDict
+
+#: Largest accepted header block (request line + headers), in bytes.
+MAX_HEADER_SIZE = 64 * 1024
+#: Largest accepted body, in bytes.
+MAX_BODY_SIZE = 16 * 1024 * 1024
+#: Size of a single ``recv`` call on a socket.
+RECV_SIZE = 65536
+#: A chunk size field: hex digits only, at most 16 of them (64 bits).
+CHUNK_SIZE = re.compile(rb"[0-9A-Fa-f]{1,16}")
+
+
+class HttpParseError(Exception):
+    """
+    Raised when the received bytes cannot be framed into an HTTP message.
+
+    :attrs status_code (int): status to answer with (400, 413 or 431).
+    :attrs reason (str): matching reason phrase.
+    """
+
+    def __init__(self, status_code, reason, detail=""):
+        super().__init__("{} {}{}".format(status_code, reason, ": " + detail if detail else ""))
+        self.status_code = status_code
+        self.reason = reason
+
+
+class HttpMessage:
+    """
+    One framed HTTP message.
+
+    :attrs start_line (str): request line or status line.
+    :attrs headers (CaseInsensitiveDict): header fields, the last value wins.
+    :attrs head (bytes): raw header block, without the terminating blank line.
+    :attrs body (bytes): message body, de-chunked.
+    :attrs raw_body (bytes): body exactly as received on the wire.
+    """
+
+    __slots__ = ("start_line", "headers", "head", "body", "raw_body")
+
+    def __init__(self, start_line, headers, head, body, raw_body):
+        self.start_line = start_line
+        self.headers = headers
+        self.head = head
+        self.body = body
+        self.raw_body = raw_body
+
+    def __repr__(self):
+        return "<HttpMessage {!r} body={}B>".format(self.start_line, len(self.body))
+
+
+def parse_chunk_size(line):
+    """
+    Parses the size line of a chunk.
+
+    Only hex digits are accepted, optionally followed by extensions
+    after a ``;``, which are ignored. ``int(x, 16)`` alone would also take
+    signs, ``0x`` prefixes, underscores and whitespace, which another
+    parser on the path may read differently.
+
+    :param line (bytes): the line, without its CRLF.
+
+    :rtype int: the chunk size.
+    :raises HttpParseError: If the size field is not valid.
+    """
+    size, ext, _ = line.partition(b";")
+    if ext:
+        # Whitespace is allowed before the extensions only.
+        size = size.rstrip(b" \t")
+    if CHUNK_SIZE.fullmatch(size) is None:
+        raise HttpParseError(400, "Bad Request", "invalid chunk size")
+    return int(size, 16)
+
+
+def parse_head(head):
+    """
+    Parses a raw header block into its start line and header fields.
+
+    :param head (bytes): header block without the terminating blank line.
+
+    :rtype tuple: (start_line (str), headers (CaseInsensitiveDict)).
+    :raises HttpParseError: If a header line is malformed.
+    """
+    lines = head.decode("iso-8859-1").split("\r\n")
+    headers = CaseInsensitiveDict()
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if not sep or not name or name != name.strip():
+            raise HttpParseError(400, "Bad Request", "malformed header line")
+        headers[name] = value.strip()
+    return lines[0], headers
+
+
+class RequestParser:
+    """
+    Incremental HTTP message framer.
+
+    :meth:`feed` appends received bytes, :meth:`next_message` returns the
+    next complete :class:`HttpMessage <HttpMessage>` or None when more bytes
+    are needed. Bytes following a message stay buffered for the next one,
+    which is how pipelined requests are served.
+
+    Attributes:
+        max_header_size (int): limit of the header block, answered with 431.
+        max_body_size (int): limit of the body, answered with 413.
+    """
+
+    def __init__(self, max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE):
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.buffer = bytearray()
+        #: Set once the peer has closed its side of the connection.
+        self.eof = False
+        self._reset()
+
+    def _reset(self):
+        # Offset from which to resume looking for the header terminator,
+        # so a header trickling in byte by byte is scanned only once.
+        self._scan = 0
+        self._head = None
+        self._start_line = None
+        self._headers = None
+        # Body framing: ("length", n), ("chunked", None) or ("close", None).
+        self._framing = None
+        # Chunked decoding state.
+        self._chunk_pos = 0
+        self._chunks = []
+        self._chunk_total = 0
+
+    def feed(self, data):
+        """
+        Appends received bytes to the parser buffer.
+
+        :param data (bytes): bytes returned by ``recv``.
+        """
+        self.buffer += data
+
+    def feed_eof(self):
+        """
+        Signals that the peer closed the connection, which completes a body
+        delimited by the connection close.
+        """
+        self.eof = True
+
+    def has_pending(self):
+        """
+        Tells whether a partial message is buffered.
+
+        :rtype bool: True if bytes of an incomplete message are buffered.
+        """
+        return bool(self.buffer) or self._head is not None
+
+    def next_message(self):
+        """
+        Frames the next complete message out of the buffer.
+
+        :rtype HttpMessage or None: the message, or None if incomplete.
+        :raises HttpParseError: If the message is malformed or too large.
+        """
+        if self._head is None and not self._read_head():
+            return None
+
+        kind, length = self._framing
+        if kind == "length":
+            if len(self.buffer) < length:
+                return None
+            body = bytes(self.buffer[:length])
+            del self.buffer[:length]
+            raw_body = body
+        elif kind == "close":
+            if not self.eof:
+                return None
+            body = raw_body = bytes(self.buffer)
+            del self.buffer[:]
+        else:
+            raw_end = self._read_chunks()
+            if raw_end is None:
+                return None
+            raw_body = bytes(self.buffer[:raw_end])
+            del self.buffer[:raw_end]
+            body = b"".join(self._chunks)
+
+        msg = HttpMessage(self._start_line, self._headers, self._head, body, raw_body)
+        self._reset()
+        return msg
+
+    def next_head(self):
+        """
+        Frames only the header block of the next message, for callers that
+        stream the body themselves.
+
+        The body bytes already received stay at the start of :attr:`buffer`;
+        the caller must consume the whole body, as described by the
+        returned framing, before using the parser again.
+
+        :rtype tuple or None: (message with an empty body, framing), or
+                              None if the header block is incomplete.
+        :raises HttpParseError: If the header block is malformed.
+        """
+        if self._head is None and not self._read_head():
+            return None
+        msg = HttpMessage(self._start_line, self._headers, self._head, b"", b"")
+        framing = self._framing
+        self._reset()
+        return msg, framing
+
+    def _read_head(self):
+        # Tolerate stray CRLFs between pipelined messages.
+        while self.buffer[:2] == b"\r\n":
+            del self.buffer[:2]
+        end = self.buffer.find(b"\r\n\r\n", self._scan)
+        if end < 0:
+            if len(self.buffer) > self.max_header_size:
+                raise HttpParseError(431, "Request Header Fields Too Large")
+            # The terminator may straddle the next feed.
+            self._scan = max(0, len(self.buffer) - 3)
+            return False
+        if end > self.max_header_size:
+            raise HttpParseError(431, "Request Header Fields Too Large")
+
+        head = bytes(self.buffer[:end])
+        del self.buffer[:end + 4]
+        start_line, headers = parse_head(head)
+        self._framing = self.body_framing(start_line, headers)
+
+        self._head = head
+        self._start_line = start_line
+        self._headers = headers
+        return True
+
+    def body_framing(self, start_line, headers):
+        """
+        Decides how the body of a message is delimited.
+
+        A request has a chunked body, a ``Content-Length`` body or no body.
+
+        :param start_line (str): the request line.
+        :param headers (CaseInsensitiveDict): the header fields.
+
+        :rtype tuple: ``("length", n)`` or ``("chunked", None)``.
+        :raises HttpParseError: If the framing headers are invalid.
+        """
+        encoding = headers.get("transfer-encoding", "").lower()
+        if encoding:
+            if encoding.split(",")[-1].strip() != "chunked":
+                raise HttpParseError(400, "Bad Request", "unsupported transfer-encoding")
+            return ("chunked", None)
+        try:
+            length = int(headers.get("content-length", "0") or "0")
+        except ValueError:
+            raise HttpParseError(400, "Bad Request", "invalid content-length")
+        if length < 0:
+            raise HttpParseError(400, "Bad Request", "invalid content-length")
+        if self.max_body_size is not None and length > self.max_body_size:
+            raise HttpParseError(413, "Payload Too Large")
+        return ("length", length)
+
+    def _read_chunks(self):
+        # Walks the chunks available in the buffer, remembering how far it
+        # got. Returns the end offset of the chunked body once the last
+        # chunk and trailer section have been received.
+        buf = self.buffer
+        pos = self._chunk_pos
+        while True:
+            line_end = buf.find(b"\r\n", pos)
+            if line_end < 0:
+                if len(buf) - pos > 1024:
+                    raise HttpParseError(400, "Bad Request", "chunk size line too long")
+                return None
+            size = parse_chunk_size(bytes(buf[pos:line_end]))
+
+            if size == 0:
+                # Skip optional trailer fields up to the blank line.
+                trailer_end = buf.find(b"\r\n\r\n", line_end)
+                if trailer_end < 0:
+                    if len(buf) - line_end > self.max_header_size:
+                        raise HttpParseError(431, "Request Header Fields Too Large")
+                    return None
+                return trailer_end + 4
+
+            data_start = line_end + 2
+            data_end = data_start + size
+            if len(buf) < data_end + 2:
+                return None
+            if buf[data_end:data_end + 2] != b"\r\n":
+                raise HttpParseError(400, "Bad Request", "missing chunk terminator")
+            self._chunk_total += size
+            if self.max_body_size is not None and self._chunk_total > self.max_body_size:
+                raise HttpParseError(413, "Payload Too Large")
+            self._chunks.append(bytes(buf[data_start:data_end]))
+            pos = self._chunk_pos = data_end + 2
+
+
+class ResponseParser(RequestParser):
+    """
+    Incremental framer for HTTP responses.
+
+    Responses to HEAD, and 1xx/204/304 responses, have no body; a response
+    without ``Content-Length`` or chunked encoding is delimited by the
+    server closing the connection. Set :attr:`request_method` before each
+    response is parsed. The body size is unbounded by default.
+
+    Attributes:
+        request_method (str): method of the request being answered.
+    """
+
+    def __init__(self, max_header_size=MAX_HEADER_SIZE, max_body_size=None):
+        super().__init__(max_header_size, max_body_size)
+        self.request_method = "GET"
+
+    def body_framing(self, start_line, headers):
+        try:
+            status = int(start_line.split(None, 2)[1])
+        except (IndexError, ValueError):
+            raise HttpParseError(502, "Bad Gateway", "invalid status line")
+        if self.request_method == "HEAD" or status < 200 or status in (204, 304):
+            return ("length", 0)
+        if "transfer-encoding" not in headers and "content-length" not in headers:
+            return ("close", None)
+        return super().body_framing(start_line, headers)
+
+
+def read_message(conn, parser):
+    """
+    Reads the next complete HTTP message from a blocking socket.
+
+    :param conn (socket.socket): connected socket.
+    :param parser (RequestParser): parser holding any bytes already buffered
+                                   on this connection.
+
+    :rtype HttpMessage or None: the message, or None if the peer closed the
+                                connection before sending a complete one.
+    :raises HttpParseError: If the message is malformed or too large.
+    :raises OSError: On socket errors, including timeouts.
+    """
+    while True:
+        msg = parser.next_message()
+        if msg is not None:
+            return msg
+        data = conn.recv(RECV_SIZE)
+        if not data:
+            parser.feed_eof()
+            return parser.next_message()
+        parser.feed(data)
+
+
+def read_head(conn, parser):
+    """
+    Reads the next header block from a blocking socket, see
+    :meth:`RequestParser.next_head`.
+
+    :param conn (socket.socket): connected socket.
+    :param parser (RequestParser): parser holding any bytes already buffered
+                                   on this connection.
+
+    :rtype tuple or None: (message with an empty body, framing), or None if
+                          the peer closed the connection first.
+    :raises HttpParseError: If the header block is malformed or too large.
+    :raises OSError: On socket errors, including timeouts.
+    """
+    while True:
+        head = parser.next_head()
+        if head is not None:
+            return head
+        data = conn.recv(RECV_SIZE)
+        if not data:
+            parser.feed_eof()
+            return parser.next_head()
+        parser.feed(data)
@@ -19,6 +19,7 @@ request settings (cookies, auth, proxies).
 """
 from daemon.utils import get_auth_from_url
 from .dictionary import CaseInsensitiveDict
+from .router import Router, split_path
 
 class Request():
     """The fully mutable "class" `Request <Request>` object,
@@ -47,6 +48,9 @@ class Request():
         "body",
         "routes",
         "hook",
+        "params",
+        "allow",
+        "keep_alive",
     ]
 
     def __init__(self):
@@ -58,6 +62,8 @@ class Request():
         self.headers = None
         #: HTTP path
         self.path = None        
+        #: Query string of the request target, without the ``?``
+        self.query = ''
         # The cookies set used to create Cookie header
         self.cookies = None
         #: request body to send to the server.
@@ -66,6 +72,12 @@ class Request():
         self.routes = {}
         #: Hook point for routed mapped-path
         self.hook = None
+        #: Path parameters captured by the route, passed to the hook
+        self.params = {}
+        #: Methods of the route when only the method did not match (405)
+        self.allow = ()
+        #: Whether the client asked for a persistent connection
+        self.keep_alive = False
 
     def extract_request_line(self, request):
         """
@@ -83,6 +95,8 @@ class Request():
             first_line = lines[0]
             print("[Request] First line: {}".format(first_line))
             method, path, version = first_line.split()
+            # Query string không thuộc về path (/getList?x=1 => /getList)
+            path, self.query = split_path(path)
 
             if path == '/':
                 path = '/index.html'
@@ -113,7 +127,7 @@ class Request():
                 headers[key.lower()] = val
         return headers
 
-    def prepare(self, request, routes=None):
+    def prepare(self, request, routes=None, body=None):
         """Prepares the entire request with the given parameters."""
         """ 
         Phân tích toàn bộ request HTTP raw text, gồm:
@@ -148,6 +162,9 @@ class Request():
                 'theme': 'dark'
             }
             hook = login_handler
+
+        When the message was framed by :mod:`daemon.reader`, ``request`` only
+        holds the header block and the decoded ``body`` is passed separately.
         """
     
 
@@ -163,16 +180,19 @@ class Request():
         #
         
         # Xử lý routes nếu có
-        if not routes == {}:
+        if routes:
             self.routes = routes
-            self.hook = routes.get((self.method, self.path))
-            #
-            # self.hook manipulation goes here
-            # ...
-            #
+            if isinstance(routes, Router):
+                match = routes.match(self.method, self.path)
+                self.hook, self.params, self.allow = match
+            else:
+                # Routes chưa compile (dict): chỉ so khớp chính xác
+                self.hook = routes.get((self.method, self.path))
         self.auth=True
         # Xử lý headers
         self.headers = self.prepare_headers(request)
+        # Xử lý keep-alive
+        self.prepare_keep_alive()
         # Gán URL từ Host và path
         host = self.headers.get('host', '')
         if host:
@@ -180,11 +200,30 @@ class Request():
         else:
             self.url = self.path
         # Xử lý body nếu có
-        self.prepare_body(request, files=None, json=None)
+        if body is None:
+            self.prepare_body(request, files=None, json=None)
+        else:
+            self.body = body
+            self.prepare_content_length(body)
         # Xử lý cookies nếu có
         self.prepare_cookies(self.headers.get('cookie', ''))
         return
 
+    def prepare_keep_alive(self):
+        """
+        Decides whether the client asked for a persistent connection.
+
+        HTTP/1.1 connections are persistent unless the client sends
+        ``Connection: close``; HTTP/1.0 connections only persist with
+        an explicit ``Connection: keep-alive``.
+        """
+        tokens = [t.strip().lower() for t in self.headers.get('connection', '').split(',')]
+        if self.version == 'HTTP/1.1':
+            self.keep_alive = 'close' not in tokens
+        else:
+            self.keep_alive = 'keep-alive' in tokens
+        return
+
     def prepare_body(self, data, files, json=None):
         # Store provided body data and update Content-Length
         self.body = data
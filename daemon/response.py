@@ -18,15 +18,650 @@ This module provides a :class: `Response <Response>` object to manage and persis
 response settings (cookies, auth, proxies), and to construct HTTP responses
 based on incoming requests. 
 
-The current version supports MIME type detection, content loading and header formatting
+The current version supports MIME type detection, content loading and header formatting.
+Large files are not loaded: they are described by a :class:`FileBody <FileBody>` and
+streamed from disk to the socket with ``sendfile`` (or mmap-backed writes). Small files
+are kept in the process-wide :data:`ASSET_CACHE`, along with their gzip/deflate
+variants for clients that accept them.
+
+Route handlers answer with their own data, serialized straight into the
+response by :meth:`Response.build_hook_response`: ``str`` (HTML), ``bytes``,
+``dict``/``list`` (JSON), an :class:`AppResponse <AppResponse>` with status,
+headers and body, or a bare status ``int`` for the default response of the
+path.
 """
 import datetime
 import os
+import json
+import mmap
+import stat
+import uuid
+import gzip
+import zlib
+import email.utils
+import threading
+import functools
 import mimetypes
+from http import HTTPStatus
+from collections import OrderedDict
 from .dictionary import CaseInsensitiveDict
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..")) + os.sep
 
+#: Files at least this large are streamed from disk instead of read into memory.
+SENDFILE_MIN_SIZE = 32 * 1024
+#: Slice size of the mmap-backed fallback writes.
+MMAP_CHUNK_SIZE = 256 * 1024
+#: Byte budget of the in-memory static asset cache.
+ASSET_CACHE_SIZE = 32 * 1024 * 1024
+
+#: ``Cache-Control`` policy per directory (relative to :data:`BASE_DIR`), the
+#: longest matching prefix wins. Static assets are immutable between deploys
+#: and can be cached long-term; pages in ``www/`` are edited along with the
+#: app and must be revalidated (cheaply, through ETag/304) on each use.
+CACHE_CONTROL_POLICIES = {
+    "static/": "public, max-age=86400",
+    "www/": "no-cache",
+}
+#: ``Cache-Control`` used outside of :data:`CACHE_CONTROL_POLICIES`.
+DEFAULT_CACHE_CONTROL = "no-cache"
+
+#: Bodies smaller than this are sent uncompressed, the framing overhead
+#: of gzip would outweigh the savings.
+COMPRESS_MIN_SIZE = 1024
+#: zlib compression level of on-the-fly compression.
+COMPRESS_LEVEL = 6
+#: Content types worth compressing, besides ``text/*``.
+COMPRESSIBLE_TYPES = (
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+    "image/x-icon",
+)
+#: Encodings the server can produce, in order of preference.
+SUPPORTED_ENCODINGS = ("gzip", "deflate")
+
+
+def is_compressible(content_type):
+    """
+    Tells whether a content type is worth compressing.
+
+    :params content_type (str): value of the ``Content-Type`` header.
+
+    :rtype bool: True for text-like types.
+    """
+    mime_type = content_type.split(";", 1)[0].strip().lower()
+    return mime_type.startswith("text/") or mime_type in COMPRESSIBLE_TYPES
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Picks the content coding to answer with from an ``Accept-Encoding`` header.
+
+    :params accept_encoding (str): value of the ``Accept-Encoding`` header.
+
+    :rtype str or None: ``"gzip"``, ``"deflate"``, or None for identity.
+    """
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[coding.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        q = qualities.get(coding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data, encoding):
+    """
+    Compresses a body with the given content coding.
+
+    :params data (bytes): body to compress.
+    :params encoding (str): ``"gzip"`` or ``"deflate"`` (zlib format).
+
+    :rtype bytes: the encoded body.
+    """
+    if encoding == "gzip":
+        # mtime=0 keeps the output stable for identical input.
+        return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+    return zlib.compress(data, COMPRESS_LEVEL)
+
+
+def cache_control_for(filepath):
+    """
+    Returns the ``Cache-Control`` policy of the directory holding a file.
+
+    :params filepath (str): resolved path of the file.
+
+    :rtype str: the ``Cache-Control`` header value.
+    """
+    relpath = os.path.relpath(filepath, BASE_DIR).replace(os.sep, "/")
+    best, policy = -1, DEFAULT_CACHE_CONTROL
+    for prefix, value in CACHE_CONTROL_POLICIES.items():
+        if relpath.startswith(prefix) and len(prefix) > best:
+            best, policy = len(prefix), value
+    return policy
+
+
+def file_validators(st):
+    """
+    Computes the cache validators of a file from its ``stat`` result.
+
+    The ETag is derived from the size and the nanosecond mtime, so it
+    changes whenever the file is rewritten, without hashing the content.
+
+    :params st (os.stat_result): stat of the file.
+
+    :rtype tuple: (ETag header value, Last-Modified header value).
+    """
+    etag = '"{:x}-{:x}"'.format(st.st_size, st.st_mtime_ns)
+    return etag, email.utils.formatdate(st.st_mtime, usegmt=True)
+
+
+#: Requests asking for more ranges than this are served the whole file.
+MAX_RANGES = 16
+
+
+def parse_range(range_header, size):
+    """
+    Parses a ``Range: bytes=...`` header against a file size.
+
+    Supports ``a-b``, open-ended ``a-`` and suffix ``-n`` specs, separated
+    by commas.
+
+    :params range_header (str): value of the ``Range`` header.
+    :params size (int): size of the file.
+
+    :rtype list or None: satisfiable ``(start, end)`` pairs (inclusive), an
+                         empty list if none is satisfiable (answer 416), or
+                         None if the header must be ignored (answer 200).
+    """
+    unit, _, specs = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+    specs = specs.split(",")
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        first, dash, last = spec.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if first == "":
+                # Suffix range: the last N bytes.
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(0, size - length), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last != "" else size - 1
+                if last != "" and start > end:
+                    return None
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    return ranges
+
+
+def if_range_matches(headers, etag, last_modified):
+    """
+    Evaluates ``If-Range``: a Range is only honoured while the client's
+    validator still identifies the current file.
+
+    :params headers (dict): request headers, lower-cased keys.
+    :params etag (str): current ETag of the file.
+    :params last_modified (str): current Last-Modified of the file.
+
+    :rtype bool: True if the Range header may be applied.
+    """
+    if_range = headers.get('if-range')
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # Strong comparison, weak tags never match.
+        return if_range == etag
+    return if_range == last_modified
+
+
+def is_not_modified(headers, etag, mtime):
+    """
+    Evaluates the conditional request headers against a file's validators.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``, as
+    required by RFC 9110.
+
+    :params headers (dict): request headers, lower-cased keys.
+    :params etag (str): current ETag of the file.
+    :params mtime (float): current modification time of the file.
+
+    :rtype bool: True if the client copy is still fresh (answer 304).
+    """
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/"x" matches "x".
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return any((t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since is None:
+            return False
+        return int(mtime) <= since.timestamp()
+    return False
+
+
+@functools.lru_cache(maxsize=1024)
+def guess_mime_type(path):
+    """
+    Memoized :func:`mimetypes.guess_type`, the same few paths are asked for
+    on every page load.
+
+    :params path (str): Path to the file.
+
+    :rtype str or None: MIME type string, or None if unknown.
+    """
+    return mimetypes.guess_type(path)[0]
+
+
+class _Asset:
+    """A cached file: its body, its prebuilt entity header lines and the
+    compressed variants of the body computed so far."""
+
+    __slots__ = ("filepath", "body", "header", "mtime_ns", "size", "variants")
+
+    def __init__(self, filepath, body, header, mtime_ns, size):
+        self.filepath = filepath
+        self.body = body
+        self.header = header
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.variants = {}
+
+    def nbytes(self):
+        return len(self.body) + sum(map(len, self.variants.values()))
+
+
+class AssetCache:
+    """
+    Process-wide LRU cache of small static files.
+
+    Entries are keyed by the resolved file path and hold the file body plus
+    its prebuilt ``Content-Type``/``Content-Length`` header lines. Every
+    lookup validates the entry with one ``stat`` call, a changed mtime or
+    size reloads the file and drops its compressed variants. The cache is bounded by a byte budget and evicts
+    the least recently used entries first. Files of at least
+    :data:`SENDFILE_MIN_SIZE` bytes are never cached, they are streamed.
+
+    :attrs max_bytes (int): byte budget of the cached bodies.
+    :attrs hits (int): lookups answered from memory.
+    :attrs misses (int): lookups that had to read the file.
+    :attrs compressions (int): compressed variants computed.
+    :attrs invalidations (int): entries reloaded because the file changed.
+    :attrs evictions (int): entries dropped to stay within the budget.
+    """
+
+    def __init__(self, max_bytes=ASSET_CACHE_SIZE, max_entry_size=SENDFILE_MIN_SIZE):
+        self.max_bytes = max_bytes
+        self.max_entry_size = max_entry_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.compressions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filepath, content_type):
+        """
+        Returns the cached asset for a file, loading it on a miss.
+
+        :params filepath (str): resolved path of the file.
+        :params content_type (str): value of the ``Content-Type`` header.
+
+        :rtype _Asset or None: the asset, or None if the file is missing,
+                               not a regular file or too large to cache.
+        """
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            self._drop(filepath)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry is not None and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+                self._entries.move_to_end(filepath)
+                self.hits += 1
+                return entry
+
+        if st.st_size >= self.max_entry_size or not os.path.isfile(filepath):
+            return None
+        try:
+            with open(filepath, 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        header = "Content-Type: {}\r\nContent-Length: {}\r\n".format(
+            content_type, len(body)).encode('utf-8')
+        asset = _Asset(filepath, body, header, st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            self.misses += 1
+            old = self._entries.pop(filepath, None)
+            if old is not None:
+                self.invalidations += 1
+                self.size -= old.nbytes()
+            self._entries[filepath] = asset
+            self.size += len(body)
+            self._evict()
+        return asset
+
+    def variant(self, asset, encoding):
+        """
+        Returns the body of an asset compressed with ``encoding``, computing
+        it once per file version.
+
+        :params asset (_Asset): asset returned by :meth:`get`.
+        :params encoding (str): ``"gzip"`` or ``"deflate"``.
+
+        :rtype bytes: the encoded body.
+        """
+        data = asset.variants.get(encoding)
+        if data is not None:
+            return data
+        data = compress(asset.body, encoding)
+        with self._lock:
+            self.compressions += 1
+            if encoding not in asset.variants:
+                asset.variants[encoding] = data
+                # Only account for variants of assets still in the cache.
+                if self._entries.get(asset.filepath) is asset:
+                    self.size += len(data)
+                    self._evict()
+        return data
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.nbytes()
+            self.evictions += 1
+
+    def _drop(self, filepath):
+        with self._lock:
+            old = self._entries.pop(filepath, None)
+            if old is not None:
+                self.size -= old.nbytes()
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Empties the cache, keeping the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Returns the cache counters, for sizing the byte budget.
+
+        :rtype dict: entries, bytes, max_bytes, hits, misses, invalidations,
+                     evictions and hit_ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "compressions": self.compressions,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+#: Static asset cache shared by every :class:`Response <Response>` of the process.
+ASSET_CACHE = AssetCache()
+
+
+def resolve_path(path, base_dir):
+    """
+    Resolves a request path inside a base directory.
+
+    :params path (str): request path, e.g. ``/css/styles.css``.
+    :params base_dir (str): base directory where the file is located.
+
+    :rtype str or None: the absolute file path, or None if the path escapes
+                        ``base_dir`` (e.g. through ``..``).
+    """
+    base = os.path.realpath(base_dir)
+    filepath = os.path.realpath(os.path.join(base, path.lstrip('/')))
+    if filepath != base and not filepath.startswith(base + os.sep):
+        return None
+    return filepath
+
+
+class FileBody:
+    """
+    A region of a file sent to the client after the response header.
+
+    On the ``sendfile`` path the bytes never enter the Python heap: the kernel
+    copies them from the page cache to the socket. Where ``sendfile`` is not
+    available (or refuses the descriptors) the file is mmap-ed and written in
+    :data:`MMAP_CHUNK_SIZE` slices of a memoryview, again without copies.
+
+    :attrs filepath (str): path of the file on disk.
+    :attrs offset (int): first byte of the region.
+    :attrs count (int): number of bytes in the region.
+    """
+
+    def __init__(self, filepath, offset=0, count=None):
+        self.filepath = filepath
+        self.offset = offset
+        if count is None:
+            count = os.path.getsize(filepath) - offset
+        self.count = count
+        self._file = None
+        self._map = None
+        self._view = None
+        self._sent = 0
+        self._use_mmap = not hasattr(os, "sendfile")
+
+    def __len__(self):
+        return self.count
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.filepath, 'rb')
+        return self._file
+
+    def _mapped(self):
+        if self._view is None:
+            self._map = mmap.mmap(self._open().fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)[self.offset:self.offset + self.count]
+        return self._view
+
+    def close(self):
+        """
+        Releases the file descriptor and mapping, if any.
+        """
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def send_to(self, conn):
+        """
+        Writes the whole region to a blocking socket.
+
+        :params conn (socket.socket): client socket.
+
+        :raises OSError: If the socket fails or the file shrank meanwhile.
+        """
+        if self.count <= 0:
+            return
+        try:
+            if not self._use_mmap:
+                sent = conn.sendfile(self._open(), self.offset, self.count)
+            else:
+                view = self._mapped()
+                for start in range(0, len(view), MMAP_CHUNK_SIZE):
+                    conn.sendall(view[start:start + MMAP_CHUNK_SIZE])
+                sent = len(view)
+            if sent < self.count:
+                raise OSError("file {} shrank while being sent".format(self.filepath))
+        finally:
+            self.close()
+
+    def send_nonblocking(self, sock):
+        """
+        Writes as much of the remaining region as a non-blocking socket accepts.
+
+        :params sock (socket.socket): non-blocking client socket.
+
+        :rtype bool: True once the whole region has been sent.
+        :raises OSError: If the socket fails or the file shrank meanwhile.
+        """
+        while self._sent < self.count:
+            remaining = self.count - self._sent
+            try:
+                if not self._use_mmap:
+                    try:
+                        sent = os.sendfile(sock.fileno(), self._open().fileno(),
+                                           self.offset + self._sent, remaining)
+                    except (BlockingIOError, InterruptedError):
+                        return False
+                    except OSError as e:
+                        if self._sent or isinstance(e, ConnectionError):
+                            raise
+                        # e.g. EINVAL/ENOTSUP for this descriptor pair.
+                        self._use_mmap = True
+                        continue
+                else:
+                    view = self._mapped()
+                    sent = sock.send(view[self._sent:self._sent + MMAP_CHUNK_SIZE])
+            except (BlockingIOError, InterruptedError):
+                return False
+            if sent == 0:
+                self.close()
+                raise OSError("file {} shrank while being sent".format(self.filepath))
+            self._sent += sent
+        self.close()
+        return True
+
+def reason_phrase(status_code):
+    """
+    Returns the standard reason phrase of a status code.
+
+    :param status_code (int): HTTP status code.
+
+    :rtype str: e.g. ``"See Other"``, ``"Unknown"`` for unregistered codes.
+    """
+    try:
+        return HTTPStatus(status_code).phrase
+    except ValueError:
+        return "Unknown"
+
+
+class AppResponse:
+    """
+    A complete response returned by a route handler.
+
+    Usage::
+
+      >>> @app.route('/peers/{id}', methods=['GET'])
+      >>> def peer(headers, body, id):
+      >>>     return AppResponse({'id': id}, status=200, headers={'X-Peer': id})
+
+    :attrs body (bytes, str, dict or list): the body, a ``dict`` or ``list``
+                                            is sent as JSON.
+    :attrs status (int): HTTP status code.
+    :attrs headers (dict): extra headers, a list value is sent as one
+                           header line per item (e.g. ``Set-Cookie``).
+    :attrs content_type (str): ``Content-Type``, guessed from the body type
+                               when None.
+    """
+
+    __slots__ = ("body", "status", "headers", "content_type")
+
+    def __init__(self, body=b"", status=200, headers=None, content_type=None):
+        self.body = body
+        self.status = status
+        self.headers = dict(headers or {})
+        self.content_type = content_type
+
+    def __repr__(self):
+        return "<AppResponse [{}]>".format(self.status)
+
+
+def redirect(location, status=303, headers=None):
+    """
+    Builds a redirection for a route handler to return.
+
+    :param location (str): target of the ``Location`` header.
+    :param status (int): 303 sends the browser to GET ``location``.
+    :param headers (dict): extra headers, e.g. ``Set-Cookie``.
+
+    :rtype AppResponse: the redirection.
+    """
+    headers = dict(headers or {})
+    headers["Location"] = location
+    return AppResponse(b"", status, headers, "text/plain")
+
+
+def serialize_body(body, content_type=None):
+    """
+    Encodes the body returned by a route handler.
+
+    :param body (bytes, str, dict or list): the body.
+    :param content_type (str): explicit ``Content-Type``, or None.
+
+    :rtype tuple: (bytes, content type).
+    :raises TypeError: If the body has no known encoding.
+    """
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return bytes(body), content_type or "application/octet-stream"
+    if isinstance(body, str):
+        return body.encode("utf-8"), content_type or "text/html; charset=utf-8"
+    if isinstance(body, (dict, list)):
+        return json.dumps(body).encode("utf-8"), content_type or "application/json"
+    raise TypeError("cannot send a {} as a response body".format(type(body).__name__))
+
+
 class Response():   
     """The :class:`Response <Response>` object, which contains a
     server's response to an HTTP request.
@@ -73,6 +708,7 @@ class Response():
         "request",
         "body",
         "reason",
+        "keep_alive",
     ]
 
 
@@ -118,6 +754,28 @@ class Response():
         #: is a response.
         self.request = None
 
+        #: Whether the connection stays open after this response.
+        #: Set by the :class:`HttpAdapter <HttpAdapter>` before building.
+        self.keep_alive = False
+
+        #: Parts (bytes or :class:`FileBody <FileBody>`) to send, in order,
+        #: after the bytes returned by :meth:`build_response`. Empty when the
+        #: returned bytes are the complete response.
+        self.body_parts = []
+
+        #: Cached asset backing :attr:`_content`, if it came from :data:`ASSET_CACHE`.
+        self._asset = None
+
+        #: Headers chosen by the route handler, sent as given.
+        self.extra_headers = {}
+
+    def connection_header(self):
+        """
+        Returns the ``Connection`` header line matching :attr:`keep_alive`.
+
+        :rtype str: formatted header line, including the trailing CRLF.
+        """
+        return "Connection: {}\r\n".format("keep-alive" if self.keep_alive else "close")
 
     def get_mime_type(self, path):
         """
@@ -129,7 +787,7 @@ class Response():
         """
 
         try:
-            mime_type, _ = mimetypes.guess_type(path)
+            mime_type = guess_mime_type(path)
         except Exception:
             return 'application/octet-stream'
         return mime_type or 'application/octet-stream'
@@ -206,7 +864,7 @@ class Response():
 
     def build_content(self, path, base_dir):
         """
-        Loads the objects file from storage space.
+        Loads the objects file from storage space, through :data:`ASSET_CACHE`.
 
         :params path (str): relative path to the file.
         :params base_dir (str): base directory where the file is located.
@@ -214,9 +872,16 @@ class Response():
         :rtype tuple: (int, bytes) representing content length and content data.
         """
 
-        filepath = os.path.join(base_dir, path.lstrip('/'))
+        filepath = resolve_path(path, base_dir)
+        if filepath is None:
+            print("[Response] Path escapes {}: {}".format(base_dir, path))
+            return 0, b"404 Not Found"
 
         print("[Response] serving the object at location {}".format(filepath))
+
+        self._asset = ASSET_CACHE.get(filepath, self.headers.get('Content-Type', 'application/octet-stream'))
+        if self._asset is not None:
+            return len(self._asset.body), self._asset.body
             #
             #  TODO: implement the step of fetch the object file
             #        store in the return value of content
@@ -234,6 +899,28 @@ class Response():
             return 0, b"500 Internal Server Error"
         ###################################3
 
+    def build_file(self, path, base_dir):
+        """
+        Describes a large object file for streaming instead of loading it.
+
+        :params path (str): relative path to the file.
+        :params base_dir (str): base directory where the file is located.
+
+        :rtype FileBody or None: the file region, or None if the file is missing
+                                 or small enough to be sent from memory.
+        """
+        filepath = resolve_path(path, base_dir)
+        if filepath is None:
+            return None
+        try:
+            size = os.stat(filepath).st_size
+        except OSError:
+            return None
+        if size < SENDFILE_MIN_SIZE or not os.path.isfile(filepath):
+            return None
+        print("[Response] streaming the object at location {} ({} bytes)".format(filepath, size))
+        return FileBody(filepath, 0, size)
+
 
 
     def build_response_header(self, request):
@@ -252,14 +939,15 @@ class Response():
 
 
 
-        #Build dynamic headers
+        #Build dynamic headers (entity headers come prebuilt with cached assets)
         headers = {
                 "Accept": "{}".format(reqhdr.get("Accept", "application/json")),
                 "Accept-Language": "{}".format(reqhdr.get("Accept-Language", "en-US,en;q=0.9")),
                 "Authorization": "{}".format(reqhdr.get("Authorization", "Basic <credentials>")),
-                "Cache-Control": "no-cache",
+                "Cache-Control": "{}".format(self.headers.get('Cache-Control', DEFAULT_CACHE_CONTROL)),
                 "Content-Type": "{}".format(self.headers['Content-Type']),
-                "Content-Length": "{}".format(len(self._content)),
+                "Content-Length": "{}".format(sum(map(len, self.body_parts)) if self.body_parts else len(self._content)),
+                "Connection": "keep-alive" if self.keep_alive else "close",
 #                "Cookie": "{}".format(reqhdr.get("Cookie", "sessionid=xyz789")), #dummy cooki
         #
         # TODO prepare the request authentication
@@ -283,24 +971,32 @@ class Response():
         #Tạo fmt_header từ dictionary headers
 
         status_code = getattr(self, 'status_code', 200) or 200
-        reason = self.reason or (
-            "OK" if status_code == 200 else
-            "Unauthorized" if status_code == 401 else
-            "Not Found" if status_code == 404 else
-            "Internal Server Error"
-        )
+        reason = self.reason or reason_phrase(status_code)
         status_line = f"HTTP/1.1 {status_code} {reason}\r\n"
 
         
         # Lặp qua dictionary headers để tạo mỗi dòng dạng Key: Value\r\n.
+        for name in ("Accept-Ranges", "Content-Range", "Content-Encoding", "Vary",
+                     "ETag", "Last-Modified"):
+            if name in self.headers:
+                headers[name] = self.headers[name]
+        if headers["Cache-Control"] != "no-cache":
+            del headers["Pragma"]
+        entity = b""
+        if self._asset is not None and self._content is self._asset.body:
+            del headers["Content-Type"], headers["Content-Length"]
+            entity = self._asset.header
         header_lines = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
-        fmt_header = status_line + header_lines + "\r\n"
+        for name, value in self.extra_headers.items():
+            for item in (value if isinstance(value, (list, tuple)) else (value,)):
+                header_lines += f"{name}: {item}\r\n"
+        fmt_header = status_line + header_lines
         ####################################
         #
         # TODO prepare the request authentication
         #
 	# self.auth = ...
-        return str(fmt_header).encode('utf-8')
+        return str(fmt_header).encode('utf-8') + entity + b"\r\n"
 
 
     def build_notfound(self):
@@ -316,11 +1012,243 @@ class Response():
                 "Content-Type: text/html\r\n"
                 "Content-Length: 13\r\n"
                 "Cache-Control: max-age=86000\r\n"
-                "Connection: close\r\n"
+                + self.connection_header() +
                 "\r\n"
                 "404 Not Found"
             ).encode('utf-8')
 
+    def build_error(self, status_code, reason, retry_after=None, allow=None, headers=None):
+        """
+        Constructs a minimal plain-text error response, e.g. 400 Bad Request.
+
+        :params status_code (int): HTTP status code.
+        :params reason (str): reason phrase, also used as the body.
+        :params retry_after (int): seconds for a ``Retry-After`` header, e.g.
+                                   with 503 Service Unavailable.
+        :params allow (list): methods for an ``Allow`` header, e.g. with
+                              405 Method Not Allowed.
+        :params headers (dict): other headers, e.g. ``Upgrade`` with
+                                426 Upgrade Required.
+
+        :rtype bytes: Encoded error response.
+        """
+        self.status_code = status_code
+        self.reason = reason
+        body = "{} {}".format(status_code, reason).encode('utf-8')
+        extra = f"Retry-After: {retry_after}\r\n" if retry_after is not None else ""
+        if allow is not None:
+            extra += "Allow: {}\r\n".format(", ".join(allow))
+        for name, value in (headers or {}).items():
+            extra += "{}: {}\r\n".format(name, value)
+        hdr = (
+            f"HTTP/1.1 {status_code} {reason}\r\n"
+            "Content-Type: text/plain\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            + extra
+            + self.connection_header() +
+            "\r\n"
+        ).encode('utf-8')
+        return hdr + body
+
+    def select_encoding(self, request, filepath, st):
+        """
+        Chooses the content coding of a static file for this request.
+
+        A sibling ``<file>.gz`` at least as recent as the file is preferred
+        for gzip clients; otherwise files small enough for the
+        :data:`ASSET_CACHE` are compressed on the fly. Large files without a
+        precompressed sibling, and Range requests, are sent as identity.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params filepath (str): resolved path of the file.
+        :params st (os.stat_result): stat of the file.
+
+        :rtype tuple: (encoding or None, path of the precompressed file or None).
+        """
+        content_type = self.headers.get('Content-Type', '')
+        if not is_compressible(content_type):
+            return None, None
+        self.headers['Vary'] = 'Accept-Encoding'
+        if st.st_size < COMPRESS_MIN_SIZE or request.headers.get('range'):
+            return None, None
+        encoding = negotiate_encoding(request.headers.get('accept-encoding', ''))
+        if encoding is None:
+            return None, None
+
+        if encoding == "gzip":
+            try:
+                gz = os.stat(filepath + ".gz")
+                if stat.S_ISREG(gz.st_mode) and gz.st_mtime_ns >= st.st_mtime_ns:
+                    return "gzip", filepath + ".gz"
+            except OSError:
+                pass
+        if st.st_size < ASSET_CACHE.max_entry_size:
+            return encoding, None
+        return None, None
+
+    def build_encoded(self, request, filepath, encoding, precompressed=None):
+        """
+        Builds the response of a static file in a compressed representation.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params filepath (str): resolved path of the file.
+        :params encoding (str): content coding chosen by :meth:`select_encoding`.
+        :params precompressed (str): path of the sibling ``.gz`` file, if any.
+
+        :rtype bytes: the response, or its header when the precompressed file
+                      is large enough to be streamed from :attr:`body_parts`.
+        """
+        content_type = self.headers['Content-Type']
+        self.headers['Content-Encoding'] = encoding
+        if precompressed is not None:
+            asset = ASSET_CACHE.get(precompressed, content_type)
+            if asset is None:
+                self._content = b""
+                self.body_parts = [FileBody(precompressed)]
+                return self.build_response_header(request)
+            self._content = asset.body
+        else:
+            asset = ASSET_CACHE.get(filepath, content_type)
+            if asset is None:
+                # The file grew past the cache limit meanwhile, send identity.
+                del self.headers['Content-Encoding']
+                self.headers['ETag'] = self.headers['ETag'].replace('-{}"'.format(encoding), '"')
+                c_len, self._content = self.build_content(filepath, "/")
+                return self.build_response_header(request) + self._content
+            self._content = ASSET_CACHE.variant(asset, encoding)
+        # The cached entity header describes the identity body.
+        self._asset = None
+        return self.build_response_header(request) + self._content
+
+    def build_dynamic(self, request, body, content_type='text/html'):
+        """
+        Builds a complete response around a body produced by the application,
+        compressing it when the client accepts it and it is large enough.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params body (bytes): response body.
+        :params content_type (str): value of the ``Content-Type`` header.
+
+        :rtype bytes: the complete response.
+        """
+        self.headers['Content-Type'] = content_type
+        self.headers['Cache-Control'] = 'no-cache'
+        if is_compressible(content_type):
+            self.headers['Vary'] = 'Accept-Encoding'
+            encoding = negotiate_encoding(request.headers.get('accept-encoding', ''))
+            if encoding is not None and len(body) >= COMPRESS_MIN_SIZE:
+                body = compress(body, encoding)
+                self.headers['Content-Encoding'] = encoding
+        self._asset = None
+        self._content = body
+        return self.build_response_header(request) + body
+
+    def build_hook_response(self, request, result):
+        """
+        Builds the response of a route hook from the value it returned.
+
+        An ``int`` (or None) keeps the default response of the path, the
+        static file if there is one, with that status. Anything else is the
+        response itself, see :func:`serialize_body`, and never touches the
+        disk.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params result: value returned (or awaited) from the hook.
+
+        :rtype bytes: the complete response.
+        :raises TypeError: If the hook returned an unsupported value.
+        """
+        if result is None or isinstance(result, int):
+            self.status_code = result
+            return self.build_response(request)
+        if not isinstance(result, AppResponse):
+            result = AppResponse(result)
+        content_type = result.content_type
+        headers = {}
+        for name, value in result.headers.items():
+            if name.lower() == 'content-type':
+                content_type = value
+            else:
+                headers[name] = value
+        body, content_type = serialize_body(result.body, content_type)
+        self.status_code = result.status
+        self.extra_headers = headers
+        return self.build_dynamic(request, body, content_type)
+
+    def build_partial(self, request, filepath, size, ranges):
+        """
+        Constructs a 206 Partial Content response streaming only the requested
+        byte ranges of a file, as ``multipart/byteranges`` for several ranges.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params filepath (str): resolved path of the file.
+        :params size (int): size of the file.
+        :params ranges (list): ``(start, end)`` pairs from :func:`parse_range`.
+
+        :rtype bytes: the response header, the parts are in :attr:`body_parts`.
+        """
+        self.status_code = 206
+        self.reason = "Partial Content"
+        self._content = b""
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers['Content-Range'] = "bytes {}-{}/{}".format(start, end, size)
+            self.body_parts = [FileBody(filepath, start, end - start + 1)]
+            return self.build_response_header(request)
+
+        boundary = uuid.uuid4().hex
+        content_type = self.headers['Content-Type']
+        parts = []
+        for start, end in ranges:
+            parts.append((
+                "\r\n--{}\r\n"
+                "Content-Type: {}\r\n"
+                "Content-Range: bytes {}-{}/{}\r\n"
+                "\r\n".format(boundary, content_type, start, end, size)
+            ).encode('utf-8'))
+            parts.append(FileBody(filepath, start, end - start + 1))
+        parts.append("\r\n--{}--\r\n".format(boundary).encode('utf-8'))
+        self.headers['Content-Type'] = "multipart/byteranges; boundary={}".format(boundary)
+        self.body_parts = parts
+        return self.build_response_header(request)
+
+    def build_range_not_satisfiable(self, size):
+        """
+        Constructs a 416 Range Not Satisfiable response.
+
+        :params size (int): size of the file.
+
+        :rtype bytes: Encoded 416 response.
+        """
+        self.status_code = 416
+        self.reason = "Range Not Satisfiable"
+        return (
+            "HTTP/1.1 416 Range Not Satisfiable\r\n"
+            "Content-Range: bytes */{}\r\n"
+            "Content-Length: 0\r\n".format(size)
+            + self.connection_header() +
+            "\r\n"
+        ).encode('utf-8')
+
+    def build_not_modified(self):
+        """
+        Constructs a 304 Not Modified response carrying the current validators.
+
+        :rtype bytes: Encoded 304 response, without a body.
+        """
+        self.status_code = 304
+        self.reason = "Not Modified"
+        lines = "".join("{}: {}\r\n".format(name, self.headers[name])
+                        for name in ("ETag", "Last-Modified", "Cache-Control", "Vary")
+                        if name in self.headers)
+        return (
+            "HTTP/1.1 304 Not Modified\r\n"
+            "Date: {}\r\n".format(email.utils.formatdate(usegmt=True))
+            + lines
+            + self.connection_header() +
+            "\r\n"
+        ).encode('utf-8')
+
     def build_unauthorized(self):
         """
         Constructs a standard 401 Not Authorized HTTP response.
@@ -332,46 +1260,39 @@ class Response():
             "HTTP/1.1 401 Unauthorized\r\n"
             "Content-Type: text/html\r\n"
             f"Content-Length: {len(body)}\r\n"
-            "Connection: close\r\n"
+            + self.connection_header() +
             "\r\n"
         ).encode('utf-8')
         return hdr + body
     
-    def build_set_cookie(self):
-        base_dir = self.prepare_content_type(mime_type = 'text/html')
-        path = "/index.html"
-        c_len, self._content = self.build_content(path, base_dir)
-        hdr = (
-            "HTTP/1.1 200 OK\r\n"
-            "Content-Type: text/html\r\n"
-            f"Content-Length: {len(self._content)}\r\n"
-            "Set-Cookie: auth=true; Path=/; SameSite=Lax\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-        ).encode('utf-8')
-        return hdr + self._content
-    
-    def build_delete_cookie(self):
-        base_dir = self.prepare_content_type(mime_type = 'text/html')
-        path = "/login.html"
-        c_len, self._content = self.build_content(path, base_dir)
-        hdr = (
-            "HTTP/1.1 200 OK\r\n"
-            "Content-Type: text/html\r\n"
-            f"Content-Length: {len(self._content)}\r\n"
-            "Set-Cookie: auth=; Path=/; SameSite=Lax; Max-Age=0; expires=Thu, 01 Jan 1970 00:00:00 GMT\r\n"
-            "Connection: close\r\n"
+    def build_switching_protocols(self, accept):
+        """
+        Constructs the 101 Switching Protocols response of a WebSocket
+        handshake, see :mod:`daemon.websocket`.
+
+        :params accept (str): the ``Sec-WebSocket-Accept`` value.
+
+        :rtype bytes: Encoded 101 response.
+        """
+        self.status_code = 101
+        self.reason = "Switching Protocols"
+        self.keep_alive = False
+        return (
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n"
             "\r\n"
         ).encode('utf-8')
-        return hdr + self._content
-    
+
     def build_response(self, request):
         """
         Builds a full HTTP response including headers and content based on the request.
 
         :params request (class:`Request <Request>`): incoming request object.
 
-        :rtype bytes: complete HTTP response using prepared headers and content.
+        :rtype bytes: complete HTTP response using prepared headers and content,
+                      or only the header when :attr:`body_parts` must be streamed.
         """
 
         path = request.path
@@ -393,33 +1314,62 @@ class Response():
             base_dir = self.prepare_content_type(mime_type='application/javascript')
         elif mime_type.startswith('image/'):
             base_dir = self.prepare_content_type(mime_type=mime_type)
+        elif mime_type.startswith('video/'):
+            base_dir = self.prepare_content_type(mime_type=mime_type)
+            # base_dir already points at static/videos/
+            if path.startswith('/videos/'):
+                path = path[len('/videos'):]
         #
         # TODO: add support objects
         #
-        elif mime_type == "application/octet-stream":
-            if path == "/returnList":
-                base_dir = self.prepare_content_type(mime_type = 'text/html')
-                path = "/index.html"
-                c_len, self._content = self.build_content(path, base_dir)
-                return self._content
-            elif path == "/getChatHist":
-                base_dir = self.prepare_content_type(mime_type = 'text/txt')
-                path = "/msg_hist.txt"
-                c_len, self._content = self.build_content(path, base_dir)
-                return self._content
-            elif path == "/login":
-                if self.status_code == 200:
-                    return self.build_set_cookie()
-                else:
-                    return self.build_unauthorized()
-            elif path == "/logout":
-                return self.build_delete_cookie()
-            else:
-                return self.build_notfound()
-
+        elif self.status_code is not None:
+            # A hook answered a path that is not a file with a bare status.
+            if self.status_code >= 400:
+                return self.build_error(self.status_code, reason_phrase(self.status_code))
+            return self.build_dynamic(request, b"", 'text/plain')
         else:
             return self.build_notfound()
 
+        filepath = resolve_path(path, base_dir)
+        try:
+            st = os.stat(filepath) if filepath else None
+        except OSError:
+            st = None
+        encoding = None
+        if st is not None and stat.S_ISREG(st.st_mode):
+            etag, last_modified = file_validators(st)
+            encoding, precompressed = self.select_encoding(request, filepath, st)
+            if encoding is not None:
+                # Each representation needs its own validator.
+                etag = '{}-{}"'.format(etag[:-1], encoding)
+            self.headers['ETag'] = etag
+            self.headers['Last-Modified'] = last_modified
+            self.headers['Cache-Control'] = cache_control_for(filepath)
+            self.headers['Accept-Ranges'] = 'bytes'
+            # A hook may have chosen another status, only revalidate plain 200s.
+            if (self.status_code or 200) == 200:
+                if is_not_modified(request.headers, etag, st.st_mtime):
+                    return self.build_not_modified()
+                range_header = request.headers.get('range')
+                if range_header and encoding is None and request.method == 'GET' and \
+                        if_range_matches(request.headers, etag, last_modified):
+                    ranges = parse_range(range_header, st.st_size)
+                    if ranges == []:
+                        return self.build_range_not_satisfiable(st.st_size)
+                    if ranges:
+                        return self.build_partial(request, filepath, st.st_size, ranges)
+
+        if encoding is not None:
+            return self.build_encoded(request, filepath, encoding, precompressed)
+
+        file_body = self.build_file(path, base_dir)
+        if file_body is not None:
+            self.body_parts = [file_body]
+            # Only the header is returned, the caller streams the file body.
+            self._content = b""
+            self._header = self.build_response_header(request)
+            return self._header
+
         c_len, self._content = self.build_content(path, base_dir)
         self._header = self.build_response_header(request)
 
@@ -0,0 +1,282 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.router
+~~~~~~~~~~~~~~~~~
+
+This module provides the compiled path router of the WeApRous backends.
+
+The ``(METHOD, path)`` routes registered with :meth:`WeApRous.route
+<daemon.weaprous.WeApRous.route>` are compiled once into a :class:`Router
+<Router>`, a trie with one level per path segment. A path pattern is made
+of segments that are either:
+
+- static, ``/peers``, matched exactly,
+- a parameter, ``{id}``, matching one non-empty segment,
+- a wildcard, ``*`` or ``*name``, last only, matching the rest of the path
+  (possibly empty).
+
+A ``HEAD`` request is served by the ``GET`` route of the path, unless one
+is registered for ``HEAD``.
+
+Static segments win over parameters, which win over wildcards; a request
+that fails deeper in a branch backtracks to the next one. Patterns without
+parameters are also kept in a flat dictionary and answered with a single
+lookup.
+
+:meth:`Router.match` strips the query string before matching and returns
+the captured parameters, percent-decoded. A path that matches only routes
+of other methods yields the methods to send back with
+``405 Method Not Allowed``, instead of falling through to static files.
+
+Usage Example:
+--------------
+>>> router = compile_router({("GET", "/peers/{id}"): get_peer, ("DELETE", "/peers/{id}"): drop_peer})
+>>> router.match("GET", "/peers/42?verbose=1")
+RouteMatch(handler=<function get_peer ...>, params={'id': '42'}, allowed=())
+>>> router.match("POST", "/peers/42").allowed
+('DELETE', 'GET')
+"""
+
+from types import MappingProxyType
+from urllib.parse import unquote
+from collections import namedtuple
+
+#: Parameter names reserved for the keyword arguments every handler gets.
+RESERVED_PARAMS = ("headers", "body", "query")
+
+
+class RouteMatch(namedtuple("RouteMatch", ("handler", "params", "allowed"))):
+    """
+    Outcome of a route lookup.
+
+    :attrs handler (callable): the route handler, None if no route applies.
+    :attrs params (dict): parameter name to decoded value, read-only and
+                          shared when the route has no parameters.
+    :attrs allowed (tuple): sorted methods of the matching path when the
+                            method did not match, empty otherwise.
+    """
+
+    __slots__ = ()
+
+
+#: Parameters of the routes without any, shared and read-only.
+NO_PARAMS = MappingProxyType({})
+#: Lookup result of a path no route matches.
+NO_MATCH = RouteMatch(None, NO_PARAMS, ())
+
+
+class _Node:
+    """
+    One trie level.
+
+    Attributes:
+        static (dict): segment to child node.
+        param (_Node): child matching any non-empty segment.
+        wildcard (dict): method to (handler, names) of a trailing wildcard.
+        methods (dict): method to (handler, names) of routes ending here.
+    """
+
+    __slots__ = ("static", "param", "wildcard", "methods")
+
+    def __init__(self):
+        self.static = {}
+        self.param = None
+        self.wildcard = None
+        self.methods = None
+
+
+def lookup_method(methods, method):
+    """
+    Looks up the route of a method, ``HEAD`` falls back to ``GET``.
+
+    :param methods (dict): method to route entry.
+    :param method (str): request method, upper case.
+
+    :rtype: the entry, or None.
+    """
+    entry = methods.get(method)
+    if entry is None and method == "HEAD":
+        # The adapter sends only the header of the GET response.
+        entry = methods.get("GET")
+    return entry
+
+
+def split_path(path):
+    """
+    Splits a request target into its path and query string.
+
+    :param path (str): request target, e.g. ``/getList?x=1``.
+
+    :rtype tuple: (path (str), query (str)), the query without its ``?``.
+    """
+    path, _, query = path.partition("?")
+    # A fragment is never sent by clients, but a bad one must not route.
+    return path.partition("#")[0], query
+
+
+def parse_pattern(pattern):
+    """
+    Parses a route pattern into its segments.
+
+    :param pattern (str): e.g. ``/peers/{id}/files/*path``.
+
+    :rtype list: (kind, value) pairs, kind is ``"static"``, ``"param"`` or
+                 ``"wildcard"`` and value the segment or parameter name.
+    :raises ValueError: If the pattern is not absolute, a wildcard is not
+                        last, or a parameter name is repeated or reserved.
+    """
+    if not pattern.startswith("/"):
+        raise ValueError("route {!r} must start with '/'".format(pattern))
+    segments = pattern[1:].split("/")
+    parsed, names = [], set()
+    for i, segment in enumerate(segments):
+        if segment.startswith("{") and segment.endswith("}"):
+            kind, name = "param", segment[1:-1]
+        elif segment.startswith("*"):
+            if i != len(segments) - 1:
+                raise ValueError("route {!r}: wildcard must be the last segment".format(pattern))
+            kind, name = "wildcard", segment[1:]
+        else:
+            parsed.append(("static", segment))
+            continue
+        if (kind == "param" or name) and not name.isidentifier():
+            raise ValueError("route {!r}: invalid parameter name {!r}".format(pattern, name))
+        if name in names or name in RESERVED_PARAMS:
+            raise ValueError("route {!r}: parameter name {!r} is repeated or reserved".format(pattern, name))
+        names.add(name)
+        parsed.append((kind, name))
+    return parsed
+
+
+class Router:
+    """
+    Immutable compiled routes of a backend.
+
+    Attributes:
+        routes (dict): the ``(METHOD, pattern)`` to handler mapping it was
+                       compiled from.
+    """
+
+    __slots__ = ("routes", "_root", "_static")
+
+    def __init__(self, routes):
+        self.routes = dict(routes)
+        self._root = _Node()
+        #: Parameter-free pattern to {method: prebuilt RouteMatch}.
+        self._static = {}
+        for (method, pattern), handler in self.routes.items():
+            self._add(method.upper(), pattern, handler)
+
+    def _add(self, method, pattern, handler):
+        segments = parse_pattern(pattern)
+        names = tuple(value for kind, value in segments if kind != "static")
+        if not names:
+            self._static.setdefault(pattern, {})[method] = RouteMatch(handler, NO_PARAMS, ())
+        node = self._root
+        for kind, value in segments:
+            if kind == "static":
+                node = node.static.setdefault(value, _Node())
+            elif kind == "param":
+                if node.param is None:
+                    node.param = _Node()
+                node = node.param
+            else:
+                if node.wildcard is None:
+                    node.wildcard = {}
+                node.wildcard[method] = (handler, names)
+                return
+        if node.methods is None:
+            node.methods = {}
+        node.methods[method] = (handler, names)
+
+    def _find(self, node, segments, i, method, values, allowed):
+        # Depth-first, most specific branch first. Returns the (handler,
+        # names, values) of the first route matching path and method, and
+        # collects the methods of the routes matching the path only.
+        if i == len(segments):
+            if node.methods:
+                entry = lookup_method(node.methods, method)
+                if entry is not None:
+                    return entry + (values,)
+                allowed.update(node.methods)
+        else:
+            segment = segments[i]
+            child = node.static.get(segment)
+            if child is not None:
+                found = self._find(child, segments, i + 1, method, values, allowed)
+                if found is not None:
+                    return found
+            if node.param is not None and segment:
+                found = self._find(node.param, segments, i + 1, method, values + (segment,), allowed)
+                if found is not None:
+                    return found
+        if node.wildcard:
+            entry = lookup_method(node.wildcard, method)
+            if entry is not None:
+                return entry + (values + ("/".join(segments[i:]),),)
+            allowed.update(node.wildcard)
+        return None
+
+    def match(self, method, path):
+        """
+        Finds the handler of a request.
+
+        :param method (str): request method, upper case.
+        :param path (str): request target, the query string is ignored.
+
+        :rtype RouteMatch: the handler and parameters, or the allowed
+                           methods, or :data:`NO_MATCH`.
+        """
+        if "?" in path or "#" in path:
+            path = split_path(path)[0]
+        matches = self._static.get(path)
+        if matches is not None:
+            found = lookup_method(matches, method)
+            if found is not None:
+                return found
+
+        allowed = set()
+        found = self._find(self._root, path[1:].split("/"), 0, method, (), allowed)
+        if found is not None:
+            handler, names, values = found
+            params = {name: unquote(value) for name, value in zip(names, values) if name}
+            return RouteMatch(handler, params, ())
+        if allowed:
+            if "GET" in allowed:
+                allowed.add("HEAD")
+            return RouteMatch(None, {}, tuple(sorted(allowed)))
+        return NO_MATCH
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __iter__(self):
+        return iter(self.routes)
+
+    def __repr__(self):
+        return "<Router {}>".format(sorted("{} {}".format(m, p) for m, p in self.routes))
+
+
+def compile_router(routes):
+    """
+    Compiles a routes dictionary into a :class:`Router`.
+
+    :param routes (dict or Router): ``(METHOD, pattern)`` to handler.
+
+    :rtype Router: the compiled router, ``routes`` itself if already one.
+    :raises ValueError: If a pattern is invalid, see :func:`parse_pattern`.
+    """
+    if isinstance(routes, Router):
+        return routes
+    return Router(routes or {})
@@ -0,0 +1,406 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.routing
+~~~~~~~~~~~~~~~~~
+
+This module provides the compiled virtual-host routing table of the proxy.
+
+The ``host`` blocks of ``config/proxy.conf`` are compiled once into a
+:class:`RoutingTable <RoutingTable>` of immutable :class:`VirtualHost
+<VirtualHost>` entries whose upstreams are pre-parsed :class:`Upstream
+<Upstream>` (ip, int port, weight) tuples, so no string is split on the
+request path. A ``Host`` header is matched in this order:
+
+1. exact name, as sent (``app1.local``, ``192.168.1.6:8080``),
+2. name with the proxy listen port appended,
+3. name without its port,
+4. wildcard names (``*.local``), longest suffix first, one dict lookup
+   per label,
+5. the default server, a block named ``_``.
+
+Without a default server, unknown hosts go to ``127.0.0.1:9000``.
+
+The configuration can be reloaded while the proxy runs: a
+:class:`ConfigWatcher <ConfigWatcher>` rebuilds the table off the request
+path when the file changes or on ``SIGHUP`` and swaps it into the
+:class:`LiveRoutes <LiveRoutes>` read by the proxy threads. A file that
+does not parse is reported and the running table is kept.
+
+Usage Example:
+--------------
+>>> table = compile_routes({"app1.local": ("10.0.0.1:9001", "round-robin")})
+>>> table.match("app1.local:8080", 8080).upstreams
+(Upstream(host='10.0.0.1', port=9001, weight=1),)
+"""
+
+import os
+import re
+import signal
+import threading
+from types import MappingProxyType
+from collections import namedtuple
+
+from .balancer import POLICIES, normalize_policy
+
+#: Name of the block used as the default server.
+DEFAULT_SERVER_NAME = "_"
+#: Upstream of unknown hosts when no default server is configured.
+FALLBACK_UPSTREAM = "127.0.0.1:9000"
+#: Valid ``hash_key`` values: the client IP or a named cookie.
+HASH_KEY = re.compile(r"ip|cookie:[^\s;]+")
+
+
+class Upstream(namedtuple("Upstream", ("host", "port", "weight"))):
+    """
+    One pre-parsed ``proxy_pass`` target.
+
+    A tuple, so the balancer can index it and use it as a dict key.
+
+    :attrs host (str): upstream IP address.
+    :attrs port (int): upstream port.
+    :attrs weight (int): balancing weight, at least 1.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, target, weight=1):
+        """
+        Parses a ``"host:port"`` target.
+
+        :param target (str): ``proxy_pass`` target without the scheme.
+        :param weight (int): balancing weight.
+
+        :rtype Upstream: the upstream.
+        :raises ValueError: If the target has no valid port.
+        """
+        host, sep, port = target.rpartition(":")
+        if not sep or not host:
+            raise ValueError("proxy_pass target {!r} has no port".format(target))
+        return cls(host, int(port), max(1, int(weight)))
+
+    def __str__(self):
+        return "{}:{}".format(self.host, self.port)
+
+
+class VirtualHost(namedtuple("VirtualHost", ("name", "upstreams", "policy", "hash_key"))):
+    """
+    One compiled ``host`` block.
+
+    :attrs name (str): server name as configured (may be ``*.suffix`` or ``_``).
+    :attrs upstreams (tuple): the :class:`Upstream` members.
+    :attrs policy (str): ``dist_policy``, canonical name.
+    :attrs hash_key (str): affinity key of consistent hashing, ``ip`` or ``cookie:<name>``.
+    """
+
+    __slots__ = ()
+
+
+class RoutingTable:
+    """
+    Immutable mapping of ``Host`` headers to virtual hosts.
+
+    Attributes:
+        exact (dict): lowercase name to :class:`VirtualHost`.
+        wildcards (dict): lowercase suffix (``.local``) to :class:`VirtualHost`.
+        default (VirtualHost): the default server.
+    """
+
+    __slots__ = ("exact", "wildcards", "default", "_exact_get", "_wildcard_get")
+
+    def __init__(self, vhosts):
+        exact, wildcards, default = {}, {}, None
+        for vhost in vhosts:
+            name = vhost.name.lower()
+            if name == DEFAULT_SERVER_NAME:
+                default = vhost
+            elif name.startswith("*."):
+                wildcards[name[1:]] = vhost
+            else:
+                exact[name] = vhost
+        if default is None:
+            default = VirtualHost(DEFAULT_SERVER_NAME, (Upstream.parse(FALLBACK_UPSTREAM),),
+                                  "round-robin", "ip")
+        object.__setattr__(self, "exact", MappingProxyType(exact))
+        object.__setattr__(self, "wildcards", MappingProxyType(wildcards))
+        object.__setattr__(self, "default", default)
+        # Bound lookups of the underlying dicts, skipping the proxy layer.
+        object.__setattr__(self, "_exact_get", exact.get)
+        object.__setattr__(self, "_wildcard_get", wildcards.get)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RoutingTable is immutable")
+
+    def __iter__(self):
+        yield from self.exact.values()
+        yield from self.wildcards.values()
+        yield self.default
+
+    def __len__(self):
+        return len(self.exact) + len(self.wildcards) + 1
+
+    def upstreams(self):
+        """
+        Lists every distinct upstream of the table.
+
+        :rtype list: :class:`Upstream` members, sorted.
+        """
+        return sorted({upstream for vhost in self for upstream in vhost.upstreams})
+
+    def match(self, host_header, listen_port):
+        """
+        Finds the virtual host serving a ``Host`` header.
+
+        :param host_header (str): ``Host`` header value, may be None.
+        :param listen_port (int): port the proxy accepted the request on.
+
+        :rtype VirtualHost: the matching entry, the default server otherwise.
+        """
+        if not host_header:
+            return self.default
+        host = host_header.strip().lower()
+        exact_get = self._exact_get
+        vhost = exact_get(host)
+        if vhost is not None:
+            return vhost
+        name, sep, _ = host.partition(":")
+        vhost = exact_get(f"{name}:{listen_port}")
+        if vhost is None and sep:
+            vhost = exact_get(name)
+        if vhost is not None:
+            return vhost
+        if self.wildcards:
+            wildcard_get = self._wildcard_get
+            dot = name.find(".")
+            while dot >= 0:
+                vhost = wildcard_get(name[dot:])
+                if vhost is not None:
+                    return vhost
+                dot = name.find(".", dot + 1)
+        return self.default
+
+
+def compile_routes(routes):
+    """
+    Compiles a routes dictionary into a :class:`RoutingTable`.
+
+    :param routes (dict): hostname to ``(proxy_pass or list of them,
+                          dist_policy[, {"host:port": weight}[, hash_key]])``.
+
+    :rtype RoutingTable: the compiled table.
+    :raises ValueError: If a ``proxy_pass`` target, a ``dist_policy`` or a
+                        ``hash_key`` is invalid.
+    """
+    vhosts = []
+    for name, route in routes.items():
+        targets = route[0] if isinstance(route[0], list) else [route[0]]
+        weights = route[2] if len(route) > 2 else {}
+        hash_key = route[3] if len(route) > 3 else "ip"
+        policy = normalize_policy(route[1])
+        if policy not in POLICIES:
+            raise ValueError("host {!r}: unknown dist_policy {!r}".format(name, route[1]))
+        if HASH_KEY.fullmatch(hash_key) is None:
+            raise ValueError("host {!r}: invalid hash_key {!r}, expected ip or cookie:<name>".format(
+                name, hash_key))
+        upstreams = tuple(Upstream.parse(target, weights.get(target, 1)) for target in targets)
+        vhosts.append(VirtualHost(name, upstreams, policy, hash_key))
+    return RoutingTable(vhosts)
+
+
+def parse_config(config_text):
+    """
+    Parses the ``host`` blocks of a proxy configuration.
+
+    Each block holds one or more ``proxy_pass http://host:port [weight=N];``
+    lines, an optional ``dist_policy`` (round-robin by default) and an
+    optional ``hash_key`` (``ip`` or ``cookie:<name>``).
+
+    :param config_text (str): content of ``config/proxy.conf``.
+
+    :rtype RoutingTable: the compiled virtual hosts.
+    :raises ValueError: If a block is malformed, e.g. a half-written file.
+    """
+    host_blocks = re.findall(r'host\s+"([^"]+)"\s*\{(.*?)\}', config_text, re.DOTALL)
+    declared = len(re.findall(r'(?m)^\s*host\s+"', config_text))
+    if not host_blocks or len(host_blocks) != declared:
+        raise ValueError("found {} complete host blocks out of {} declared".format(
+            len(host_blocks), declared))
+
+    routes = {}
+    for host, block in host_blocks:
+        targets, weights = [], {}
+        for target, weight in re.findall(
+                r'proxy_pass\s+http://([^\s;]+)(?:\s+weight=(\d+))?\s*;', block):
+            targets.append(target)
+            if weight:
+                weights[target] = int(weight)
+
+        policy_match = re.search(r'dist_policy\s+([\w-]+)', block)
+        policy = policy_match.group(1) if policy_match else 'round-robin'
+
+        # Any value is taken, compile_routes rejects the invalid ones.
+        hash_key_match = re.search(r'hash_key(?:\s+([^\s;]*))?', block)
+        hash_key = (hash_key_match.group(1) or '') if hash_key_match else 'ip'
+
+        routes[host] = (targets[0] if len(targets) == 1 else targets, policy, weights, hash_key)
+    return compile_routes(routes)
+
+
+def load_config(config_file):
+    """
+    Reads and compiles a proxy configuration file.
+
+    :param config_file (str): path of the configuration.
+
+    :rtype RoutingTable: the compiled virtual hosts.
+    :raises OSError: If the file cannot be read.
+    :raises ValueError: If the file is malformed.
+    """
+    with open(config_file, 'r') as f:
+        return parse_config(f.read())
+
+
+class LiveRoutes:
+    """
+    The current :class:`RoutingTable` of a running proxy.
+
+    Requests read :attr:`table` once, a reload replaces it with a single
+    attribute assignment, so in-flight requests finish on the table they
+    started with and new ones see the new table, with no lock on the
+    request path.
+
+    Attributes:
+        table (RoutingTable): the table in use.
+        generation (int): number of tables installed so far.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.generation = 1
+
+    def swap(self, table):
+        """
+        Installs a new table.
+
+        :param table (RoutingTable): the replacement.
+
+        :rtype RoutingTable: the table it replaced.
+        """
+        old, self.table = self.table, table
+        self.generation += 1
+        return old
+
+    def match(self, host_header, listen_port):
+        """See :meth:`RoutingTable.match`."""
+        return self.table.match(host_header, listen_port)
+
+    def upstreams(self):
+        """See :meth:`RoutingTable.upstreams`."""
+        return self.table.upstreams()
+
+    def __iter__(self):
+        return iter(self.table)
+
+
+class ConfigWatcher(threading.Thread):
+    """
+    Background thread reloading a configuration file into :class:`LiveRoutes`.
+
+    The file is polled for a new modification time or size every
+    ``interval`` seconds; :meth:`install_sighup` also makes ``SIGHUP``
+    trigger an immediate reload. The new table is compiled on this thread
+    and only swapped in if the whole file parsed.
+
+    Attributes:
+        config_file (str): path of the configuration.
+        routes (LiveRoutes): the routes to update.
+        interval (float): seconds between two polls of the file.
+        on_reload (callable): called as ``on_reload(old, new)`` after a swap.
+    """
+
+    def __init__(self, config_file, routes, interval=1.0, on_reload=None):
+        super().__init__(name="config-watcher", daemon=True)
+        self.config_file = config_file
+        self.routes = routes
+        self.interval = interval
+        self.on_reload = on_reload
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.config_file)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def install_sighup(self):
+        """
+        Reloads on ``SIGHUP``. Must be called from the main thread.
+
+        :rtype bool: False if the platform has no ``SIGHUP``.
+        """
+        if not hasattr(signal, "SIGHUP"):
+            return False
+        # Signal handlers run between bytecodes of the main thread, only
+        # wake the watcher up and let it do the work.
+        signal.signal(signal.SIGHUP, lambda signum, frame: self.request_reload())
+        return True
+
+    def request_reload(self):
+        """
+        Asks for a reload, even if the file looks unchanged.
+        """
+        self._signature = None
+        self._wakeup.set()
+
+    def reload(self):
+        """
+        Reads, compiles and installs the configuration.
+
+        :rtype bool: True if the new table was installed.
+        """
+        signature = self._stat()
+        try:
+            table = load_config(self.config_file)
+        except (OSError, ValueError) as e:
+            print("[Proxy] Reload of {} failed, keeping the running config: {}".format(
+                self.config_file, e))
+            # Do not retry until the file changes again.
+            self._signature = signature
+            return False
+        self._signature = signature
+        old = self.routes.swap(table)
+        print("[Proxy] Reloaded {}: {} virtual hosts (generation {})".format(
+            self.config_file, len(table), self.routes.generation))
+        if self.on_reload is not None:
+            self.on_reload(old, table)
+        return True
+
+    def run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopped:
+                break
+            if self._stat() != self._signature:
+                self.reload()
+
+    def stop(self):
+        """
+        Stops watching after the current poll.
+        """
+        self._stopped = True
+        self._wakeup.set()
@@ -0,0 +1,169 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.shared
+~~~~~~~~~~~~~~~~~
+
+This module provides state shared by the worker processes of one daemon.
+
+Pre-forked workers (see :mod:`daemon.prefork`) do not share memory, a
+module global set while serving one request is invisible to the request
+that lands on another worker. State that must be seen by every worker is
+kept in files:
+
+- :func:`locked` serializes the read-modify-write of a data file (e.g.
+  the tracker peer list) across processes with an advisory ``flock`` on a
+  sibling ``.lock`` file, and across threads with a process-wide lock.
+- :class:`SharedState <SharedState>` is a small JSON document (e.g. the
+  room a peer is connected to), replaced atomically on every update and
+  re-read only when the file changed.
+
+Sessions need no shared store, the login cookie (``auth=true``) carries
+the whole session and any worker can check it.
+
+Usage Example:
+--------------
+>>> with locked("db/peer_list.txt"):
+...     peers = open("db/peer_list.txt").read().split()
+>>> SESSION = SharedState("db/session.json")
+>>> SESSION.update(connect_ip="10.0.0.2", connect_port=8000)
+>>> SESSION.get("connect_port")
+8000
+"""
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process, the thread lock is enough.
+    fcntl = None
+
+_THREAD_LOCKS = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def _thread_lock(path):
+    # flock is per open file description, threads of one process opening
+    # the lock file separately would still exclude each other, but one
+    # shared lock avoids a file descriptor per waiting thread.
+    with _THREAD_LOCKS_GUARD:
+        lock = _THREAD_LOCKS.get(path)
+        if lock is None:
+            lock = _THREAD_LOCKS[path] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def locked(path):
+    """
+    Holds the exclusive lock of a data file, for every thread and worker
+    process of the daemons using it.
+
+    :param path (str): the data file, the lock is taken on ``path + ".lock"``.
+    """
+    path = os.path.abspath(path)
+    with _thread_lock(path):
+        if fcntl is None:
+            yield
+            return
+        with open(path + ".lock", "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class SharedState:
+    """
+    A JSON object stored in a file and shared by worker processes.
+
+    Attributes:
+        path (str): the JSON file.
+        defaults (dict): values of the keys missing from the file.
+    """
+
+    def __init__(self, path, defaults=None):
+        self.path = path
+        self.defaults = dict(defaults or {})
+        self._signature = None
+        self._values = dict(self.defaults)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _load(self):
+        # Re-read only when another process replaced the file.
+        signature = self._stat()
+        if signature != self._signature:
+            values = dict(self.defaults)
+            try:
+                with open(self.path, "r") as f:
+                    values.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+            self._values, self._signature = values, signature
+        return self._values
+
+    def get(self, key, default=None):
+        """
+        Returns the current value of a key.
+
+        :param key (str): the key.
+        :param default: returned if the key is unset.
+        """
+        return self._load().get(key, default)
+
+    def snapshot(self):
+        """
+        Returns every value at once, consistent with each other.
+
+        :rtype dict: a copy of the state.
+        """
+        return dict(self._load())
+
+    def update(self, **values):
+        """
+        Sets some keys, visible to every worker once this returns.
+        """
+        with locked(self.path):
+            self._signature = None
+            state = dict(self._load())
+            state.update(values)
+            self._write(state)
+
+    def reset(self, values=None):
+        """
+        Replaces the whole state, the defaults if no values are given.
+
+        :param values (dict): the new state.
+        """
+        state = dict(self.defaults)
+        state.update(values or {})
+        with locked(self.path):
+            self._write(state)
+
+    def _write(self, state):
+        tmp = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        # Readers see the old file or the new one, never a partial write.
+        os.replace(tmp, self.path)
+        self._values, self._signature = state, self._stat()
@@ -0,0 +1,276 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.template
+~~~~~~~~~~~~~~~~~
+
+This module provides the HTML templates of the WeApRous apps.
+
+A template file is parsed once into a Python function that appends each
+literal chunk and value to a list and joins it at the end, so rendering
+is linear in the output size. Compiled templates are cached by path and
+recompiled only when the file changes (mtime and size).
+
+Syntax:
+
+- ``{{ name }}``, ``{{ msg.sender }}``: a value, HTML-escaped. A dotted
+  name reads a dict key, or else an attribute. Unknown names render empty.
+- ``{{ html|safe }}``: a value inserted as is.
+- ``{% for msg in messages %}`` ... ``{% endfor %}``: a loop.
+- ``{% if name %}`` ... ``{% else %}`` ... ``{% endif %}``, also
+  ``{% if not name %}``: a condition on the truth of a value.
+- ``{# ... #}``: a comment.
+
+Usage Example:
+--------------
+>>> render_template("www/index_form.html", peers=["10.0.0.2:8000"])
+'<!doctype html>...<option value="10.0.0.2:8000">10.0.0.2:8000</option>...'
+"""
+
+import os
+import re
+import html
+import threading
+
+#: Splits a template into literal text and ``{{ }}``, ``{% %}``, ``{# #}`` tags.
+TAG_RE = re.compile(r"({{.*?}}|{%.*?%}|{#.*?#})", re.S)
+#: A dotted name, e.g. ``msg.sender``.
+NAME_RE = re.compile(r"^[A-Za-z_]\w*(\.\w+)*$")
+#: Characters replaced by :func:`escape`.
+ESCAPED_RE = re.compile(r"[&<>\"']")
+#: Filters of ``{{ }}`` values.
+FILTERS = ("safe",)
+
+
+class TemplateSyntaxError(ValueError):
+    """
+    Raised when a template cannot be compiled.
+
+    :attrs name (str): the template file.
+    :attrs lineno (int): line of the faulty tag.
+    """
+
+    def __init__(self, message, name="<template>", lineno=0):
+        super().__init__("{}:{}: {}".format(name, lineno, message))
+        self.name = name
+        self.lineno = lineno
+
+
+def escape(value):
+    """
+    Converts a value to HTML-escaped text.
+
+    :param value: any value, None renders empty.
+
+    :rtype str: the text, with ``& < > " '`` escaped.
+    """
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = str(value)
+    # Most values hold nothing to escape, skip the five replacements.
+    if ESCAPED_RE.search(value) is None:
+        return value
+    return html.escape(value, quote=True)
+
+
+def to_text(value):
+    """
+    Converts a value to text without escaping, for ``|safe``.
+
+    :rtype str: the text, None renders empty.
+    """
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+
+def lookup(value, attrs):
+    """
+    Resolves the attributes of a dotted name.
+
+    :param value: value of the first part of the name.
+    :param attrs (tuple): the following parts.
+
+    :rtype: the value, None if a part is missing.
+    """
+    for attr in attrs:
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            value = value.get(attr)
+        else:
+            value = getattr(value, attr, None)
+    return value
+
+
+class Template:
+    """
+    A compiled template.
+
+    Attributes:
+        name (str): where the source came from, used in error messages.
+        source (str): the template text.
+    """
+
+    def __init__(self, source, name="<template>"):
+        self.name = name
+        self.source = source
+        self._render = self._compile(source)
+
+    def _compile(self, source):
+        lines = ["def render(_ctx):", "    _out = []", "    _w = _out.append"]
+        #: (tag, lineno) of the open blocks.
+        blocks = []
+        #: Python local of each loop variable in scope.
+        scopes = [{}]
+        counter = 0
+        lineno = 1
+
+        def expr(text):
+            # Compiles a dotted name into a Python expression.
+            text = text.strip()
+            if not NAME_RE.match(text):
+                raise TemplateSyntaxError("invalid expression {!r}".format(text), self.name, lineno)
+            head, *attrs = text.split(".")
+            local = scopes[-1].get(head)
+            base = local if local is not None else "_ctx.get({!r})".format(head)
+            if not attrs:
+                return base
+            if len(attrs) == 1 and local is not None:
+                # The common ``{{ msg.sender }}`` of a loop, without a call.
+                return "({0}.get({1!r}) if type({0}) is dict else _lookup({0}, {2!r}))".format(
+                    local, attrs[0], tuple(attrs))
+            return "_lookup({}, {!r})".format(base, tuple(attrs))
+
+        def emit(code):
+            lines.append("    " * (len(blocks) + 1) + code)
+
+        for token in TAG_RE.split(source):
+            if not token:
+                continue
+            if token.startswith("{{"):
+                value, *filters = token[2:-2].split("|")
+                for name in filters:
+                    if name.strip() not in FILTERS:
+                        raise TemplateSyntaxError("unknown filter {!r}".format(name.strip()), self.name, lineno)
+                convert = "_text" if filters else "_escape"
+                emit("_w({}({}))".format(convert, expr(value)))
+            elif token.startswith("{%"):
+                words = token[2:-2].split()
+                tag = words[0] if words else ""
+                if tag == "for" and len(words) == 4 and words[2] == "in" and words[1].isidentifier():
+                    counter += 1
+                    local = "_v{}".format(counter)
+                    emit("for {} in {} or ():".format(local, expr(words[3])))
+                    scopes.append(dict(scopes[-1], **{words[1]: local}))
+                    blocks.append(("for", lineno))
+                elif tag == "endfor" and len(words) == 1:
+                    if not blocks or blocks[-1][0] != "for":
+                        raise TemplateSyntaxError("unexpected endfor", self.name, lineno)
+                    emit("pass")
+                    blocks.pop()
+                    scopes.pop()
+                elif tag == "if" and len(words) in (2, 3) and (len(words) == 2 or words[1] == "not"):
+                    emit("if {}{}:".format("not " if len(words) == 3 else "", expr(words[-1])))
+                    blocks.append(("if", lineno))
+                elif tag == "else" and len(words) == 1:
+                    if not blocks or blocks[-1][0] != "if":
+                        raise TemplateSyntaxError("unexpected else", self.name, lineno)
+                    emit("pass")
+                    blocks[-1] = ("else", lineno)
+                    lines.append("    " * len(blocks) + "else:")
+                elif tag == "endif" and len(words) == 1:
+                    if not blocks or blocks[-1][0] not in ("if", "else"):
+                        raise TemplateSyntaxError("unexpected endif", self.name, lineno)
+                    emit("pass")
+                    blocks.pop()
+                else:
+                    raise TemplateSyntaxError("invalid tag {!r}".format(token), self.name, lineno)
+            elif not token.startswith("{#"):
+                emit("_w({!r})".format(token))
+            lineno += token.count("\n")
+
+        if blocks:
+            tag, line = blocks[-1]
+            raise TemplateSyntaxError("{} block is not closed".format(tag), self.name, line)
+        lines.append("    return ''.join(_out)")
+        namespace = {"_escape": escape, "_text": to_text, "_lookup": lookup}
+        exec(compile("\n".join(lines), self.name, "exec"), namespace)
+        return namespace["render"]
+
+    def render(self, context=None, **values):
+        """
+        Renders the template.
+
+        :param context (dict): the values, merged with the keyword arguments.
+
+        :rtype str: the output.
+        """
+        if values:
+            context = dict(context or {}, **values)
+        return self._render(context or {})
+
+
+class TemplateCache:
+    """
+    Compiled templates by file path, recompiled when the file changes.
+    """
+
+    def __init__(self):
+        #: path to (mtime_ns, size, Template).
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Returns the compiled template of a file.
+
+        :param path (str): the template file.
+
+        :rtype Template: the template.
+        :raises OSError: If the file cannot be read.
+        :raises TemplateSyntaxError: If the template does not compile.
+        """
+        st = os.stat(path)
+        entry = self._templates.get(path)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2]
+        with self._lock:
+            with open(path, "r", encoding="utf-8") as f:
+                template = Template(f.read(), path)
+            self._templates[path] = (st.st_mtime_ns, st.st_size, template)
+        return template
+
+    def clear(self):
+        """
+        Drops every compiled template.
+        """
+        with self._lock:
+            self._templates.clear()
+
+
+#: Templates shared by the handlers of this process.
+TEMPLATES = TemplateCache()
+
+
+def render_template(path, context=None, **values):
+    """
+    Renders a template file through :data:`TEMPLATES`.
+
+    :param path (str): the template file.
+    :param context (dict): the values, merged with the keyword arguments.
+
+    :rtype str: the output.
+    """
+    return TEMPLATES.get(path).render(context, **values)
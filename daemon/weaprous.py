@@ -17,8 +17,24 @@ deamon.weaproute
 This module provides a WeApRous object to deploy RESTful url web app with routing
 """
 
+import inspect
+
 from .backend import create_backend
 
+def wants_query(func):
+    """
+    Tells whether a route handler takes the ``query`` keyword argument.
+
+    :param func (callable): the handler.
+
+    :rtype bool: True if it has a ``query`` or ``**kwargs`` parameter.
+    """
+    try:
+        params = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == "query" or p.kind == p.VAR_KEYWORD for p in params)
+
 class WeApRous:
     """The fully mutable :class:`WeApRous <WeApRous>` object, which is a lightweight,
     mutable web application router for deploying RESTful URL endpoints.
@@ -40,6 +56,20 @@ class WeApRous:
       >>> def hello(headers, body):
       >>>     return {'message': 'Hello, world!'}
 
+      >>> @app.route('/peers/{id}', methods=['GET', 'DELETE'])
+      >>> def peer(headers, body, id):
+      >>>     return {'peer': id}
+
+      >>> @app.route('/peers', methods=['GET'])
+      >>> async def peers(headers, body):
+      >>>     status, _, content = await http_request_async(TRACKER, 8000, 'GET', '/returnList')
+      >>>     return status
+
+      >>> @app.websocket('/echo')
+      >>> async def echo(ws, headers):
+      >>>     async for message in ws:
+      >>>         await ws.send(message)
+
       >>> app.run()
     """
 
@@ -68,7 +98,24 @@ class WeApRous:
         """
         Decorator to register a route handler for a specific path and HTTP methods.
 
-        :param path (str): The URL path to route.
+        The handler may be an ``async def`` function, it then runs on the
+        shared handler loop (see :mod:`daemon.aio`) and should do its
+        outbound calls with :func:`http_request_async <daemon.client.http_request_async>`.
+
+        The path may hold parameters, ``/peers/{id}``, passed to the handler
+        as keyword arguments, and end with a wildcard, ``/files/*path``
+        (see :mod:`daemon.router`). A request for a routed path with another
+        method is answered ``405 Method Not Allowed``.
+
+        The handler returns the response: ``str`` (HTML), ``bytes``, a
+        ``dict`` or ``list`` (JSON), an :class:`AppResponse
+        <daemon.response.AppResponse>` for the status and headers, or a bare
+        status ``int`` to serve the file of the path with that status.
+
+        A handler with a ``query`` parameter also receives the query string
+        of the request, as a dict of its (last) values.
+
+        :param path (str): The URL path pattern to route.
         :param methods (list): A list of HTTP methods (e.g., ['GET', 'POST']) to bind.
 
         :rtype: function - A decorator that registers the handler function.
@@ -80,22 +127,59 @@ class WeApRous:
             # Optional attach route metadata to the function
             func._route_path = path
             func._route_methods = methods
+            func._route_query = wants_query(func)
 
             return func
         return decorator
 
-    def run(self):
+    def websocket(self, path):
+        """
+        Decorator to register a WebSocket handler for a path.
+
+        A ``GET`` request for the path upgrades the connection (see
+        :mod:`daemon.websocket`), then the handler is called on the shared
+        handler loop with the :class:`WebSocket <daemon.websocket.WebSocket>`,
+        the request headers and the path parameters (and ``query``, as for
+        :meth:`route`). The connection is closed when it returns.
+
+        :param path (str): The URL path pattern to route.
+
+        :rtype: function - A decorator that registers the handler function.
+        :raises TypeError: If the handler is not an ``async def`` function.
+        """
+        def decorator(func):
+            if not inspect.iscoroutinefunction(func):
+                raise TypeError("websocket handler {} must be async def".format(func.__name__))
+            self.routes[("GET", path)] = func
+
+            func._route_path = path
+            func._route_methods = ["GET"]
+            func._route_query = wants_query(func)
+            func._route_websocket = True
+
+            return func
+        return decorator
+
+    def run(self, mode="thread", backlog=50, workers=1, **pool_options):
         """
         Start the backend server and begin handling requests.
 
         This method launches the TCP server using the configured IP and port,
         and dispatches incoming requests to the registered route handlers.
 
+        :param mode (str): Serving mode, ``"thread"`` (one thread per connection),
+                           ``"eventloop"`` (single-threaded selectors loop) or
+                           ``"pool"`` (bounded worker pool with load shedding).
+        :param backlog (int): Listen backlog of the server socket.
+        :param workers (int): Pre-forked worker processes sharing the port.
+        :param pool_options: ``pool_size``, ``queue_size`` and ``max_wait`` of the
+                             ``"pool"`` mode, see :func:`create_backend <daemon.backend.create_backend>`.
+
         :raise: Error if IP or port has not been configured.
         """
         if not self.ip or not self.port:
             print("Rous app need to preapre address"
                   "by calling app.prepare_address(ip,port)")
 
-        create_backend(self.ip, self.port, self.routes)
-        
+        create_backend(self.ip, self.port, self.routes, mode=mode, backlog=backlog,
+                       workers=workers, **pool_options)
@@ -0,0 +1,613 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.websocket
+~~~~~~~~~~~~~~~~~
+
+This module provides the WebSocket (RFC 6455) channels of the WeApRous apps.
+
+A route registered with :meth:`WeApRous.websocket
+<daemon.weaprous.WeApRous.websocket>` answers the ``GET`` upgrade request
+of a client with ``101 Switching Protocols`` (see
+:meth:`HttpAdapter.begin_websocket
+<daemon.httpadapter.HttpAdapter.begin_websocket>`). The socket then leaves
+the serving mode it came from, thread, pool or event loop, and is handed
+over to the shared handler loop (see :mod:`daemon.aio`), where the
+``async def`` handler talks to the client through a :class:`WebSocket
+<WebSocket>` until either side closes.
+
+- Text and binary messages, fragmented or not, are reassembled up to
+  :data:`MAX_MESSAGE` bytes; client frames must be masked.
+- Pings are answered with pongs, and a close frame with a close frame.
+- Messages sent are queued per connection, at most :data:`SEND_QUEUE`:
+  :meth:`WebSocket.send` waits when the client reads slower than the
+  handler writes, :meth:`WebSocket.try_send` gives up instead.
+
+:func:`connect` opens a channel to another daemon, its frames are masked.
+
+Usage Example:
+--------------
+>>> @app.websocket("/echo")
+... async def echo(ws, headers):
+...     async for message in ws:
+...         await ws.send(message)
+"""
+
+import os
+import base64
+import struct
+import asyncio
+import hashlib
+from collections import namedtuple
+
+from .aio import HANDLER_LOOP
+from .reader import RECV_SIZE
+
+#: Appended to the client key to compute ``Sec-WebSocket-Accept``.
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+#: The only protocol version, sent back with 426 to other versions.
+VERSION = "13"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+#: Opcodes of the frames that may not be fragmented.
+CONTROL_OPCODES = (OP_CLOSE, OP_PING, OP_PONG)
+
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_NO_STATUS = 1005
+CLOSE_INVALID_DATA = 1007
+CLOSE_POLICY = 1008
+CLOSE_TOO_BIG = 1009
+CLOSE_INTERNAL_ERROR = 1011
+
+#: Largest message accepted, reassembled fragments included.
+MAX_MESSAGE = 1 << 20
+#: Messages queued on a connection before :meth:`WebSocket.send` waits.
+SEND_QUEUE = 64
+#: Seconds to wait for the close frame of the peer, or a handshake.
+CLOSE_TIMEOUT = 5.0
+
+_SHORT = struct.Struct(">H")
+_LONG = struct.Struct(">Q")
+
+
+class WebSocketError(Exception):
+    """
+    Raised on a protocol violation, the connection is closed with its code.
+
+    :attrs code (int): close code, e.g. :data:`CLOSE_PROTOCOL_ERROR`.
+    """
+
+    def __init__(self, code, reason):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+class Frame(namedtuple("Frame", ("fin", "opcode", "payload"))):
+    """
+    One decoded frame.
+
+    :attrs fin (bool): last frame of its message.
+    :attrs opcode (int): one of the ``OP_*`` constants.
+    :attrs payload (bytes): the unmasked payload.
+    """
+
+    __slots__ = ()
+
+
+def accept_key(key):
+    """
+    Computes the ``Sec-WebSocket-Accept`` of a handshake.
+
+    :param key (str): the ``Sec-WebSocket-Key`` of the client.
+
+    :rtype str: the value to send back.
+    """
+    digest = hashlib.sha1((key + GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def valid_key(key):
+    """
+    Tells whether a ``Sec-WebSocket-Key`` is 16 base64-encoded bytes.
+
+    :rtype bool: True if valid.
+    """
+    try:
+        return len(base64.b64decode(key, validate=True)) == 16
+    except (ValueError, TypeError):
+        return False
+
+
+def mask(payload, key):
+    """
+    Masks (or unmasks) a payload.
+
+    :param payload (bytes): the data.
+    :param key (bytes): the 4-byte masking key.
+
+    :rtype bytes: the payload XORed with the repeated key.
+    """
+    length = len(payload)
+    if not length:
+        return b""
+    # One big-integer XOR instead of a Python loop over the bytes.
+    repeated = (key * (length // 4 + 1))[:length]
+    return (int.from_bytes(payload, "little") ^ int.from_bytes(repeated, "little")).to_bytes(length, "little")
+
+
+def encode_frame(opcode, payload=b"", fin=True, masked=False):
+    """
+    Encodes one frame.
+
+    :param opcode (int): one of the ``OP_*`` constants.
+    :param payload (bytes): the data.
+    :param fin (bool): last frame of its message.
+    :param masked (bool): mask the payload, as clients must.
+
+    :rtype bytes: the frame.
+    """
+    length = len(payload)
+    head = bytearray([(0x80 if fin else 0) | opcode])
+    flag = 0x80 if masked else 0
+    if length < 126:
+        head.append(flag | length)
+    elif length < 1 << 16:
+        head.append(flag | 126)
+        head += _SHORT.pack(length)
+    else:
+        head.append(flag | 127)
+        head += _LONG.pack(length)
+    if masked:
+        key = os.urandom(4)
+        return bytes(head) + key + mask(payload, key)
+    return bytes(head) + payload
+
+
+def encode_close(code=CLOSE_NORMAL, reason=""):
+    """
+    Encodes the payload of a close frame.
+
+    :rtype bytes: the code and the UTF-8 reason, truncated to fit.
+    """
+    if code == CLOSE_NO_STATUS:
+        return b""
+    return _SHORT.pack(code) + reason.encode("utf-8")[:123]
+
+
+class FrameParser:
+    """
+    Incremental WebSocket frame decoder.
+
+    :meth:`feed` appends received bytes, :meth:`next_frame` returns the next
+    complete :class:`Frame <Frame>` or None when more bytes are needed.
+
+    Attributes:
+        masked (bool): whether frames must be masked (server side) or not.
+        max_size (int): largest payload, larger ones raise
+                        :data:`CLOSE_TOO_BIG`.
+    """
+
+    def __init__(self, masked=True, max_size=MAX_MESSAGE):
+        self.masked = masked
+        self.max_size = max_size
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Appends received bytes to the parser buffer.
+
+        :param data (bytes): bytes returned by ``recv``.
+        """
+        self.buffer += data
+
+    def next_frame(self):
+        """
+        Decodes the next buffered frame.
+
+        :rtype Frame: the frame, None if it is not complete yet.
+        :raises WebSocketError: If the frame breaks the protocol.
+        """
+        buf = self.buffer
+        if len(buf) < 2:
+            return None
+        b0, b1 = buf[0], buf[1]
+        fin, opcode, length = bool(b0 & 0x80), b0 & 0x0F, b1 & 0x7F
+        if b0 & 0x70:
+            raise WebSocketError(CLOSE_PROTOCOL_ERROR, "reserved bits set")
+        if opcode not in (OP_CONTINUATION, OP_TEXT, OP_BINARY) + CONTROL_OPCODES:
+            raise WebSocketError(CLOSE_PROTOCOL_ERROR, "unknown opcode {:#x}".format(opcode))
+        if opcode in CONTROL_OPCODES and (not fin or length > 125):
+            raise WebSocketError(CLOSE_PROTOCOL_ERROR, "bad control frame")
+        if bool(b1 & 0x80) != self.masked:
+            raise WebSocketError(CLOSE_PROTOCOL_ERROR,
+                                 "frame must {}be masked".format("" if self.masked else "not "))
+
+        pos = 2
+        if length == 126:
+            if len(buf) < 4:
+                return None
+            length, pos = _SHORT.unpack_from(buf, 2)[0], 4
+        elif length == 127:
+            if len(buf) < 10:
+                return None
+            length, pos = _LONG.unpack_from(buf, 2)[0], 10
+        if length > self.max_size:
+            raise WebSocketError(CLOSE_TOO_BIG, "frame of {} bytes".format(length))
+        key = None
+        if self.masked:
+            if len(buf) < pos + 4:
+                return None
+            key, pos = bytes(buf[pos:pos + 4]), pos + 4
+        if len(buf) < pos + length:
+            return None
+        payload = bytes(buf[pos:pos + length])
+        del buf[:pos + length]
+        if key is not None:
+            payload = mask(payload, key)
+        return Frame(fin, opcode, payload)
+
+
+class WebSocket:
+    """
+    One open WebSocket connection, used on the handler loop only.
+
+    Attributes:
+        headers (dict): headers of the upgrade request (server side).
+        client (bool): this end opened the connection, its frames are masked.
+        closed (bool): the connection is closed, or closing.
+        close_code (int): close code received from the peer, or sent.
+        close_reason (str): reason received with it.
+    """
+
+    def __init__(self, reader, writer, headers=None, client=False, data=b"",
+                 max_size=MAX_MESSAGE, queue_size=SEND_QUEUE):
+        self.headers = headers or {}
+        self.client = client
+        self.closed = False
+        self.close_code = None
+        self.close_reason = ""
+        self._reader = reader
+        self._writer = writer
+        self._parser = FrameParser(masked=not client, max_size=max_size)
+        self._parser.feed(data)
+        self._max_size = max_size
+        #: Encoded frames waiting for the writer task, None stops it.
+        self._queue = asyncio.Queue(queue_size)
+        self._close_sent = False
+        self._close_received = asyncio.Event()
+        #: A receive() is waiting on the reader, the only one allowed to.
+        self._reading = False
+        self._sender = asyncio.ensure_future(self._send_frames())
+
+    async def _send_frames(self):
+        try:
+            while True:
+                frame = await self._queue.get()
+                if frame is None:
+                    return
+                self._writer.write(frame)
+                await self._writer.drain()
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            self.closed = True
+            # Nothing will be written any more, drop the queued frames.
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+    async def _put(self, frame):
+        # Waits for room in the send queue, unless the writer task ends
+        # first: the frame would never go out, and nobody would make room.
+        if self._sender.done():
+            return False
+        try:
+            self._queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+        put = asyncio.ensure_future(self._queue.put(frame))
+        try:
+            await asyncio.wait((put, self._sender), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not put.done():
+                put.cancel()
+        return not self._sender.done()
+
+    def _frame(self, opcode, payload):
+        return encode_frame(opcode, payload, masked=self.client)
+
+    def _write_now(self, opcode, payload):
+        # Control frames skip the queue, they must not wait behind data.
+        # A frame is written whole, so they never split one in the queue.
+        if not self._writer.is_closing():
+            self._writer.write(self._frame(opcode, payload))
+
+    async def send(self, message):
+        """
+        Queues a message, waiting while the send queue is full.
+
+        :param message (str or bytes): a text or binary message.
+
+        :raises ConnectionError: If the connection is closed, also while
+                                 waiting for room in the queue.
+        """
+        if self.closed:
+            raise ConnectionError("WebSocket is closed")
+        opcode = OP_TEXT if isinstance(message, str) else OP_BINARY
+        payload = message.encode("utf-8") if opcode == OP_TEXT else bytes(message)
+        if not await self._put(self._frame(opcode, payload)):
+            raise ConnectionError("WebSocket is closed")
+
+    def try_send(self, message):
+        """
+        Queues a message if the send queue has room, e.g. to broadcast
+        without waiting for the slowest client.
+
+        :param message (str or bytes): a text or binary message.
+
+        :rtype bool: False if the queue is full or the connection closed.
+        """
+        if self.closed or self._sender.done():
+            return False
+        opcode = OP_TEXT if isinstance(message, str) else OP_BINARY
+        payload = message.encode("utf-8") if opcode == OP_TEXT else bytes(message)
+        try:
+            self._queue.put_nowait(self._frame(opcode, payload))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def ping(self, data=b""):
+        """
+        Sends a ping, the peer answers with a pong.
+
+        :param data (bytes): at most 125 bytes echoed back.
+        """
+        self._write_now(OP_PING, bytes(data)[:125])
+
+    async def _read_frame(self):
+        while True:
+            frame = self._parser.next_frame()
+            if frame is not None:
+                return frame
+            data = await self._reader.read(RECV_SIZE)
+            if not data:
+                return None
+            self._parser.feed(data)
+
+    async def receive(self):
+        """
+        Waits for the next message, answering pings and close frames.
+
+        :rtype str or bytes: a text or binary message, None once the
+                             connection is closed.
+        """
+        fragments, opcode, size = [], None, 0
+        while not self._close_received.is_set():
+            self._reading = True
+            try:
+                frame = await self._read_frame()
+            except WebSocketError as e:
+                self._reading = False
+                await self._fail(e.code, e.reason)
+                return None
+            except OSError:
+                frame = None
+            finally:
+                self._reading = False
+            if frame is None:
+                # The peer went away without a close frame.
+                self._abort()
+                return None
+
+            if frame.opcode == OP_PING:
+                self._write_now(OP_PONG, frame.payload)
+                continue
+            if frame.opcode == OP_PONG:
+                continue
+            if frame.opcode == OP_CLOSE:
+                self._on_close_frame(frame.payload)
+                return None
+
+            if (frame.opcode == OP_CONTINUATION) != (opcode is not None):
+                await self._fail(CLOSE_PROTOCOL_ERROR, "unexpected continuation")
+                return None
+            if opcode is None:
+                opcode = frame.opcode
+            size += len(frame.payload)
+            if size > self._max_size:
+                await self._fail(CLOSE_TOO_BIG, "message of more than {} bytes".format(self._max_size))
+                return None
+            fragments.append(frame.payload)
+            if not frame.fin:
+                continue
+
+            payload = fragments[0] if len(fragments) == 1 else b"".join(fragments)
+            if opcode == OP_BINARY:
+                return payload
+            try:
+                return payload.decode("utf-8")
+            except UnicodeDecodeError:
+                await self._fail(CLOSE_INVALID_DATA, "text message is not UTF-8")
+                return None
+        return None
+
+    def _on_close_frame(self, payload):
+        code, reason = CLOSE_NO_STATUS, ""
+        if len(payload) >= 2:
+            code = _SHORT.unpack_from(payload)[0]
+            reason = payload[2:].decode("utf-8", "replace")
+        elif payload:
+            code = CLOSE_PROTOCOL_ERROR
+        if self.close_code is None:
+            self.close_code, self.close_reason = code, reason
+        self._close_received.set()
+        if not self._close_sent:
+            # Echo the close once the queued messages are out.
+            self._close_sent = True
+            self._enqueue_close(encode_close(code))
+        self.closed = True
+
+    def _enqueue_close(self, payload):
+        frame = self._frame(OP_CLOSE, payload)
+
+        async def flush():
+            if await self._put(frame):
+                await self._put(None)
+
+        asyncio.ensure_future(flush())
+
+    async def close(self, code=CLOSE_NORMAL, reason=""):
+        """
+        Closes the connection: flushes the queued messages, sends a close
+        frame and waits up to :data:`CLOSE_TIMEOUT` seconds for the peer's.
+
+        :param code (int): close code, :data:`CLOSE_NORMAL` by default.
+        :param reason (str): short explanation sent with it.
+        """
+        await self._fail(code, reason, wait_peer=True)
+
+    async def _fail(self, code, reason, wait_peer=False):
+        # After a protocol error the peer's close frame is not awaited.
+        self.closed = True
+        if not self._close_sent:
+            self._close_sent = True
+            if self.close_code is None:
+                self.close_code, self.close_reason = code, reason
+            self._enqueue_close(encode_close(code, reason))
+        try:
+            await asyncio.wait_for(asyncio.shield(self._sender), CLOSE_TIMEOUT)
+            if not wait_peer:
+                self._close_received.set()
+            deadline = asyncio.get_running_loop().time() + CLOSE_TIMEOUT
+            if self._reading:
+                # Another task is in receive(), it owns the reader and
+                # sets the event when the peer's close frame arrives.
+                await asyncio.wait_for(self._close_received.wait(), CLOSE_TIMEOUT)
+            # Read, and drop, what the peer sent before its close frame.
+            while not self._close_received.is_set():
+                frame = await asyncio.wait_for(self._read_frame(),
+                                               deadline - asyncio.get_running_loop().time())
+                if frame is None:
+                    break
+                if frame.opcode == OP_CLOSE:
+                    self._close_received.set()
+        except (asyncio.TimeoutError, WebSocketError, OSError):
+            pass
+        finally:
+            self._abort()
+
+    def _abort(self):
+        self.closed = True
+        self._sender.cancel()
+        self._writer.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.receive()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+
+async def serve(sock, handler, headers, kwargs, data=b""):
+    """
+    Runs a websocket route handler on an upgraded socket.
+
+    :param sock (socket): the client socket, after the 101 response.
+    :param handler (callable): the ``async def`` route handler.
+    :param headers (dict): headers of the upgrade request.
+    :param kwargs (dict): keyword arguments of the handler.
+    :param data (bytes): bytes received after the upgrade request.
+    """
+    reader, writer = await asyncio.open_connection(sock=sock)
+    ws = WebSocket(reader, writer, headers=headers, data=data)
+    try:
+        await handler(ws, headers=headers, **kwargs)
+        await ws.close()
+    except Exception as e:
+        print("[WebSocket] handler error: {}".format(e))
+        await ws.close(CLOSE_INTERNAL_ERROR, "internal error")
+
+
+def hand_over(sock, handler, headers, kwargs, data=b""):
+    """
+    Moves an upgraded socket to the handler loop, see :func:`serve`.
+
+    Called by the serving modes once the 101 response is sent. The caller
+    must neither read from, write to nor close the socket afterwards.
+    """
+    asyncio.run_coroutine_threadsafe(serve(sock, handler, headers, kwargs, data),
+                                     HANDLER_LOOP.loop())
+
+
+async def connect(host, port, path, headers=None, timeout=CLOSE_TIMEOUT):
+    """
+    Opens a WebSocket to another daemon.
+
+    :param host (str): address of the daemon.
+    :param port (int): its port.
+    :param path (str): the websocket route, with its query string.
+    :param headers (dict): extra request headers.
+    :param timeout (float): seconds for the handshake.
+
+    :rtype WebSocket: the open connection, its frames are masked.
+    :raises ConnectionError: If the server refuses the upgrade.
+    :raises OSError: If the connection fails or times out.
+    """
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    fields = {
+        "Host": "{}:{}".format(host, port),
+        "Upgrade": "websocket",
+        "Connection": "Upgrade",
+        "Sec-WebSocket-Key": key,
+        "Sec-WebSocket-Version": VERSION,
+    }
+    fields.update(headers or {})
+    request = "GET {} HTTP/1.1\r\n{}\r\n".format(
+        path, "".join("{}: {}\r\n".format(k, v) for k, v in fields.items()))
+
+    async def handshake():
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(request.encode("utf-8"))
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            writer.close()
+            raise ConnectionError("{}:{} bad handshake response".format(host, port)) from e
+        lines = head.decode("latin-1").split("\r\n")
+        status = lines[0].split(" ", 2)
+        answer = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                answer[name.strip().lower()] = value.strip()
+        if len(status) < 2 or status[1] != "101" or answer.get("sec-websocket-accept") != accept_key(key):
+            writer.close()
+            raise ConnectionError("{}:{} refused the upgrade: {}".format(host, port, lines[0]))
+        return WebSocket(reader, writer, headers=answer, client=True)
+
+    try:
+        return await asyncio.wait_for(handshake(), timeout)
+    except asyncio.TimeoutError:
+        raise OSError("{}:{} handshake timed out".format(host, port))
@@ -0,0 +1,226 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.workerpool
+~~~~~~~~~~~~~~~~~
+
+This module provides the bounded worker pool of the ``"pool"`` serving mode.
+
+The thread-per-connection mode starts a thread for every accepted
+connection, a burst of connections means as many threads, stacks and
+buffers, and every request slows down together. A :class:`WorkerPool
+<WorkerPool>` serves connections with a fixed number of threads fed by a
+bounded queue instead:
+
+- the accept loop hands each connection to :meth:`WorkerPool.submit`,
+- when the queue is full the connection is answered at once with
+  ``503 Service Unavailable`` and ``Retry-After``, costing one small write,
+- a connection that waited longer than ``max_wait`` in the queue is shed
+  the same way when a worker picks it up, its client has most likely
+  given up already,
+- while connections are waiting, workers close keep-alive connections
+  after the current response instead of idling on them.
+
+Memory is bounded by ``size + queue_size`` connections and the latency of
+an admitted request by ``max_wait`` plus its service time.
+:meth:`WorkerPool.stats` exposes the queue depth and the queue wait time.
+
+Usage Example:
+--------------
+>>> pool = WorkerPool(lambda conn, addr: serve(conn), size=32, queue_size=128)
+>>> pool.start()
+>>> pool.submit(conn, addr)
+True
+>>> pool.stats()["queued"]
+0
+"""
+
+import time
+import queue
+import socket
+import threading
+
+from .response import Response
+
+#: Worker threads of a pool.
+WORKER_POOL_SIZE = 32
+#: Accepted connections waiting for a worker, beyond that they are shed.
+ACCEPT_QUEUE_SIZE = 128
+#: Seconds a queued connection may wait before it is shed.
+QUEUE_MAX_WAIT = 5.0
+#: Retry-After value, in seconds, of the shedding responses.
+SHED_RETRY_AFTER = 1
+#: Weight of the newest sample in the queue wait EWMA.
+WAIT_EWMA_ALPHA = 0.1
+
+
+def shed(conn, reason="Service Unavailable"):
+    """
+    Answers a connection with ``503`` without reading its request, then
+    closes it.
+
+    :param conn (socket.socket): accepted client connection.
+    :param reason (str): reason phrase of the response.
+    """
+    try:
+        conn.setblocking(False)
+        # A fresh socket has an empty send buffer, this never blocks.
+        conn.send(Response().build_error(503, reason, retry_after=SHED_RETRY_AFTER))
+        conn.shutdown(socket.SHUT_WR)
+        # Unread request bytes would turn the close into a reset that may
+        # destroy the response before the client reads it.
+        while conn.recv(65536):
+            pass
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+
+class WorkerPool:
+    """
+    Fixed-size thread pool serving accepted connections.
+
+    Attributes:
+        handler (callable): called as ``handler(conn, addr)`` on a worker.
+        size (int): worker threads.
+        queue_size (int): connections that may wait for a worker.
+        max_wait (float): seconds a connection may wait before it is shed.
+    """
+
+    def __init__(self, handler, size=WORKER_POOL_SIZE, queue_size=ACCEPT_QUEUE_SIZE,
+                 max_wait=QUEUE_MAX_WAIT):
+        self.handler = handler
+        self.size = size
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue(queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.busy = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.wait_avg = 0.0
+        self.wait_max = 0.0
+        self._last_warning = 0.0
+
+    def start(self):
+        """
+        Starts the worker threads.
+        """
+        for index in range(self.size):
+            thread = threading.Thread(target=self._run, name="worker-{}".format(index), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def has_capacity(self):
+        """
+        Tells whether no connection is waiting for a worker. Workers only
+        keep connections alive while this holds.
+
+        :rtype bool: True if the queue is empty.
+        """
+        return self._queue.empty()
+
+    def submit(self, conn, addr):
+        """
+        Queues an accepted connection, or sheds it if the queue is full.
+
+        :param conn (socket.socket): accepted client connection.
+        :param addr (tuple): client address (IP, port).
+
+        :rtype bool: True if the connection was queued.
+        """
+        try:
+            self._queue.put_nowait((conn, addr, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            self._warn_saturated()
+            shed(conn)
+            return False
+        with self._lock:
+            self.accepted += 1
+        return True
+
+    def _warn_saturated(self):
+        now = time.monotonic()
+        if now - self._last_warning >= 1.0:
+            self._last_warning = now
+            print("[WorkerPool] saturated, shedding connections: {}".format(self.stats()))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            conn, addr, queued_at = item
+            wait = time.monotonic() - queued_at
+            with self._lock:
+                self.wait_avg += WAIT_EWMA_ALPHA * (wait - self.wait_avg)
+                self.wait_max = max(self.wait_max, wait)
+                if wait > self.max_wait:
+                    self.expired += 1
+                else:
+                    self.busy += 1
+            if wait > self.max_wait:
+                shed(conn)
+                continue
+            try:
+                self.handler(conn, addr)
+            except Exception as e:
+                print("[WorkerPool] connection {} error: {}".format(addr, e))
+                conn.close()
+            finally:
+                with self._lock:
+                    self.busy -= 1
+
+    def shutdown(self, timeout):
+        """
+        Serves the queued connections, then stops the workers.
+
+        :param timeout (float): seconds to wait for the workers at most.
+
+        :rtype bool: True if every worker stopped in time.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            for _ in self._threads:
+                # Sentinels queue up behind the waiting connections.
+                self._queue.put(None, timeout=max(0.001, deadline - time.monotonic()))
+        except queue.Full:
+            pass
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in self._threads)
+
+    def stats(self):
+        """
+        Returns the pool counters.
+
+        :rtype dict: busy workers, queue depth, admission counts and queue
+                     wait (EWMA and max, in ms).
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "busy": self.busy,
+                "queued": self._queue.qsize(),
+                "queue_size": self.queue_size,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "wait_avg_ms": round(self.wait_avg * 1000.0, 3),
+                "wait_max_ms": round(self.wait_max * 1000.0, 3),
+            }
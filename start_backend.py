@@ -26,6 +26,7 @@ import socket
 import argparse
 
 from daemon import create_backend
+from daemon.workerpool import WORKER_POOL_SIZE, ACCEPT_QUEUE_SIZE
 
 # Default port number used if none is specified via command-line arguments.
 PORT = 9000 
@@ -40,6 +41,11 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --mode (str): Serving mode, thread, eventloop or pool (default: thread).
+    :arg --backlog (int): Listen backlog of the server socket (default: 50).
+    :arg --workers (int): Pre-forked worker processes sharing the port (default: 1).
+    :arg --pool-size (int): Worker threads of the pool mode (default: 32).
+    :arg --queue-size (int): Accept queue of the pool mode (default: 128).
     """
 
     parser = argparse.ArgumentParser(
@@ -58,9 +64,41 @@ if __name__ == "__main__":
         default=PORT,
         help='Port number to bind the server. Default is {}.'.format(PORT)
     )
+    parser.add_argument(
+        '--mode',
+        choices=['thread', 'eventloop', 'pool'],
+        default='thread',
+        help='Serving mode: one thread per connection, a single event loop or a bounded '
+             'worker pool. Default is thread.'
+    )
+    parser.add_argument(
+        '--backlog',
+        type=int,
+        default=50,
+        help='Listen backlog of the server socket. Default is 50.'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Worker processes sharing the port, restarted if they crash. Default is 1.'
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=WORKER_POOL_SIZE,
+        help='Worker threads of the pool mode. Default is {}.'.format(WORKER_POOL_SIZE)
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=ACCEPT_QUEUE_SIZE,
+        help='Connections waiting for a pool worker, the excess gets 503. Default is {}.'.format(ACCEPT_QUEUE_SIZE)
+    )
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
-    create_backend(ip, port)
+    create_backend(ip, port, mode=args.mode, backlog=args.backlog, workers=args.workers,
+                   pool_size=args.pool_size, queue_size=args.queue_size)
@@ -42,62 +42,33 @@ import re
 from collections import defaultdict
 
 from daemon import create_proxy
+from daemon.routing import load_config
 
 PROXY_PORT = 8080
+CONFIG_FILE = "config/proxy.conf"
 
 
 def parse_virtual_hosts(config_file):
     """
     Parses virtual host blocks from a config file.
 
+    A ``proxy_pass`` line may carry a weight for the weighted policies,
+    e.g. ``proxy_pass http://10.0.0.2:9002 weight=3;``, and ``hash_key``
+    selects the affinity key of ``dist_policy consistent-hash``: ``ip``
+    (default) or ``cookie:<name>``.
+
+    The blocks are compiled into an immutable routing table: exact names,
+    ``*.suffix`` wildcards and a default server named ``_``.
+
     :config_file (str): Path to the NGINX config file.
-    :rtype list of dict: Each dict contains 'listen'and 'server_name'.
+    :rtype RoutingTable: the compiled virtual hosts.
+    :raises ValueError: If the file is malformed, see :func:`daemon.routing.parse_config`.
     """
 
-    with open(config_file, 'r') as f:
-        config_text = f.read()
-
-    # Match each host block
-    host_blocks = re.findall(r'host\s+"([^"]+)"\s*\{(.*?)\}', config_text, re.DOTALL)
-
-    dist_policy_map = ""
-
-    routes = {}
-    for host, block in host_blocks:
-        proxy_map = {}
-
-        # Find all proxy_pass entries
-        proxy_passes = re.findall(r'proxy_pass\s+http://([^\s;]+);', block)
-        map = proxy_map.get(host,[])
-        map = map + proxy_passes
-        proxy_map[host] = map
-
-        # Find dist_policy if present
-        policy_match = re.search(r'dist_policy\s+(\w+)', block)
-        if policy_match:
-            dist_policy_map = policy_match.group(1)
-        else: #default policy is round_robin
-            dist_policy_map = 'round-robin'
-            
-        #
-        # @bksysnet: Build the mapping and policy
-        # TODO: this policy varies among scenarios 
-        #       the default policy is provided with one proxy_pass
-        #       In the multi alternatives of proxy_pass then
-        #       the policy is applied to identify the highes matching
-        #       proxy_pass
-        #
-        if len(proxy_map.get(host,[])) == 1:
-            routes[host] = (proxy_map.get(host,[])[0], dist_policy_map)
-        # esle if:
-        #         TODO:  apply further policy matching here
-        #
-        else:
-            routes[host] = (proxy_map.get(host,[]), dist_policy_map)
-
-    for key, value in routes.items():
-        print(key, value)
-    return routes
+    table = load_config(config_file)
+    for vhost in table:
+        print(vhost.name, [str(m) for m in vhost.upstreams], vhost.policy)
+    return table
 
 
 if __name__ == "__main__":
@@ -110,16 +81,28 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --health-interval (float): Seconds between active upstream probes (default: 0, off).
+    :arg --health-path (str): Path requested by the probes (default: /).
+    :arg --workers (int): Pre-forked worker processes sharing the port (default: 1).
     """
 
     parser = argparse.ArgumentParser(prog='Proxy', description='', epilog='Proxy daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PROXY_PORT)
+    parser.add_argument('--health-interval', type=float, default=0,
+                        help='seconds between active upstream probes, 0 disables them')
+    parser.add_argument('--health-path', default='/')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='pre-forked worker processes sharing the port')
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
-    routes = parse_virtual_hosts("config/proxy.conf")
+    routes = parse_virtual_hosts(CONFIG_FILE)
 
-    create_proxy(ip, port, routes)
+    # The file is watched and reloaded in place, also on SIGHUP. With
+    # several workers, SIGHUP to the supervisor restarts them one by one.
+    create_proxy(ip, port, routes, health_interval=args.health_interval,
+                 health_path=args.health_path, config_file=CONFIG_FILE,
+                 workers=args.workers)
@@ -22,25 +22,178 @@ This module provides a sample RESTful web application using the WeApRous framewo
 It defines basic route handlers and launches a TCP-based backend server to serve
 HTTP requests. The application includes a login endpoint and a greeting endpoint,
 and can be configured via command-line arguments.
+
+With ``--workers N`` the requests are served by N processes, so nothing a
+handler must remember lives in a module global: the chat room this peer is
+connected to is kept in ``db/session.json``, the ``db/`` files are only
+read-modified-written under :func:`daemon.shared.locked` and the messages
+of the hosted room are appended to the log ``db/msg_log`` (see
+:mod:`daemon.msgstore`).
+
+Handlers calling another peer or the tracker are ``async def`` and use
+:func:`http_request_async <daemon.client.http_request_async>`, so waiting
+on a slow peer holds no serving thread.
+
+Pages are rendered per request from the templates ``www/index_form.html``
+and ``www/chat_form.html`` (see :mod:`daemon.template`) and returned by
+the handlers, nothing is written under ``www/``: ``/index.html`` shows
+the peer list fetched from the tracker and ``/chat.html`` the history of
+the connected room.
+
+The chat page then opens the WebSocket ``/chatSocket`` (see
+:mod:`daemon.websocket`) to send and receive the messages; a guest peer
+relays it over one channel to the host, instead of one ``/sendMsg`` and
+``/receiveMsg`` request per message. Without WebSocket, the page
+long-polls ``/chatUpdates`` for the messages that follow (see
+:mod:`daemon.notify`): a guest peer forwards the wait to the host with
+``/getChatHist?since=..&wait=..``, and only keeps a per-process cache of
+the room, so any worker can answer. Serve with ``--mode eventloop`` to
+hold many waiting pages cheaply.
 """
 
+import os
 import json
+import time
 import socket
+import asyncio
 import argparse
+import threading
+from collections import deque
 from urllib.parse import parse_qs, unquote_plus 
 
 from daemon.weaprous import WeApRous
+from daemon.backend import serving_stats
+from daemon.response import AppResponse, redirect
+from daemon.client import http_request_async
+from daemon.shared import SharedState, locked
+from daemon.template import render_template
+from daemon.msgstore import MessageLog
+from daemon.workerpool import WORKER_POOL_SIZE, ACCEPT_QUEUE_SIZE
+from daemon.notify import Notifier, POLL_TIMEOUT
+from daemon.websocket import connect as ws_connect, CLOSE_GOING_AWAY, CLOSE_POLICY
 
 PORT = 8000  # Default port
 SERVER_IP = None
 SERVER_PORT = None
 PEER_IP = None
 PEER_PORT = None
-CONNECT_IP = None
-CONNECT_PORT = None
 
 PEER_LIST = "db/peer_list.txt"
-MSG_HIST = "db/msg_hist.txt"
+#: Most recent messages shown on the chat page.
+CHAT_PAGE_MESSAGES = 500
+INDEX_TEMPLATE = "www/index_form.html"
+CHAT_TEMPLATE = "www/chat_form.html"
+#: Close code of the chat sockets when the room is reset, the page reloads.
+ROOM_RESET = 4000
+
+#: Chat room this peer is connected to, seen by every worker process.
+SESSION = SharedState("db/session.json", {"connect_ip": None, "connect_port": None})
+#: Messages of the room this peer hosts.
+HISTORY = MessageLog("db/msg_log")
+#: Wakes the long-poll requests waiting for new messages in HISTORY.
+HISTORY_CHANGED = Notifier(lambda: HISTORY.last_seq)
+
+
+class RoomCache:
+    """
+    Messages of the connected room already fetched from its host.
+
+    A guest peer only asks the host for the messages after the last one it
+    has (``/getChatHist?since=<seq>``) and keeps the newest
+    :data:`CHAT_PAGE_MESSAGES` of them.
+
+    Attributes:
+        room (tuple): (ip, port) of the host the messages came from.
+        first_seq (int): oldest sequence number the host still has.
+        last_seq (int): sequence number the cache is up to date with.
+    """
+
+    def __init__(self, size):
+        self.room = None
+        self.first_seq = 0
+        self.last_seq = 0
+        self._messages = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def cursor(self, room):
+        """
+        Returns the sequence number to fetch from, forgetting another room.
+
+        :param room (tuple): (ip, port) of the connected host.
+
+        :rtype int: the last cached sequence number, 0 if nothing is cached.
+        """
+        with self._lock:
+            if room != self.room:
+                self.room, self.first_seq, self.last_seq = room, 0, 0
+                self._messages.clear()
+            return self.last_seq
+
+    def merge(self, room, data, replace=False):
+        """
+        Adds the messages of a ``/getChatHist`` answer.
+
+        :param room (tuple): (ip, port) of the host that answered.
+        :param data (dict): the JSON answer.
+        :param replace (bool): drop the cached messages first.
+        """
+        with self._lock:
+            if room != self.room:
+                return
+            # A first_seq past everything cached means the host started a
+            # new room (or dropped what we have): start over.
+            if replace or data["first_seq"] > self.last_seq:
+                self._messages.clear()
+                self.last_seq = 0
+            for seq, sender, text in data["messages"]:
+                if seq > self.last_seq:
+                    self._messages.append((seq, sender, text))
+                    self.last_seq = seq
+            self.first_seq = data["first_seq"]
+            # The host read last_seq before the messages, when no page
+            # follows everything up to it is here, even in an empty room.
+            if not data["more"]:
+                self.last_seq = max(self.last_seq, data["last_seq"])
+
+    def clear(self):
+        """
+        Forgets the cached messages.
+        """
+        with self._lock:
+            self.room, self.first_seq, self.last_seq = None, 0, 0
+            self._messages.clear()
+
+    def messages(self, since=0):
+        """
+        :param since (int): last sequence number already seen.
+
+        :rtype list: (seq, sender, text) of the cached messages after
+                     ``since``, oldest first.
+        """
+        with self._lock:
+            return [m for m in self._messages if m[0] > since]
+
+
+#: Messages of the room this peer is a guest of, per worker process.
+ROOM_CACHE = RoomCache(CHAT_PAGE_MESSAGES)
+
+
+def hosting():
+    """
+    Tells whether this peer hosts the room it is connected to.
+
+    :rtype bool: True for the host peer.
+    """
+    return connected_room() == (PEER_IP, PEER_PORT)
+
+def connected_room():
+    """
+    Returns the address of the chat room this peer is connected to.
+
+    :rtype tuple: (ip, port), (None, None) when not connected.
+    """
+    state = SESSION.snapshot()
+    return state["connect_ip"], state["connect_port"]
 
 app = WeApRous()
 '''
@@ -74,7 +227,7 @@ def hello(headers, body):
 # ===== TASK 1A: LOGIN AUTHENTICATION =====
 @app.route("/login", methods=["POST"])
 def login(headers, body):
-    print("[SampleApp] login. request headers: {}, request body: {}".format(headers, body))
+    print("[SampleApp] login")
     data = {}
     if body:
         try:
@@ -84,114 +237,341 @@ def login(headers, body):
     username = data.get('username', '')
     password = data.get('password', '')
     if username == "admin" and password == "password":#hardcoded for task1
-        return 200
+        return redirect("/index.html", headers={"Set-Cookie": "auth=true; Path=/; SameSite=Lax"})
     else:
         return 401
 
 @app.route("/logout", methods=["POST"])
 def logout(headers, body):
-    print("[SampleApp] logout. request headers: {}, request body: {}".format(headers, body))
-    return 200
+    print("[SampleApp] logout")
+    return redirect("/login.html", headers={
+        "Set-Cookie": "auth=; Path=/; SameSite=Lax; Max-Age=0; expires=Thu, 01 Jan 1970 00:00:00 GMT"})
+
+def render_index(peers):
+    """
+    Renders the home page with the given peer list.
+
+    :param peers (list): "ip:port" of the active peers.
+
+    :rtype str: the page.
+    """
+    return render_template(INDEX_TEMPLATE, peers=peers)
+
+@app.route("/index.html", methods=["GET"])
+async def index_page(headers, body):
+    # Peer function
+    # The home page shows the peer list of the tracker, rendered by it
+    try:
+        status, _, content = await http_request_async(SERVER_IP, SERVER_PORT, "GET", "/returnList")
+    except OSError as e:
+        print("[SampleApp] tracker unreachable: {}".format(e))
+        status = None
+    if status != 200:
+        return render_index([])
+    return content.decode("utf-8")
 
 @app.route("/chat.html", methods=["GET"])
-def chatPage(headers, body):
-    print("[SampleApp] chat page. request headers: {}, request body: {}".format(headers, body))
+async def chatPage(headers, body):
+    print("[SampleApp] chat page")
+    CONNECT_IP, CONNECT_PORT = connected_room()
     if (CONNECT_IP is None or CONNECT_PORT is None):
         return 404
+    if (PEER_IP == CONNECT_IP and PEER_PORT == CONNECT_PORT):
+        # If host peer, read the newest messages direct from the log
+        first_seq = HISTORY.first_seq
+        msg_list = [(m.seq, m.sender, m.text) for m in HISTORY.tail(CHAT_PAGE_MESSAGES)]
+        last_seq = msg_list[-1][0] if msg_list else first_seq - 1
+    else:
+        # If peer, fetch only the messages newer than the cached ones
+        if not await sync_room((CONNECT_IP, CONNECT_PORT)):
+            ROOM_CACHE.clear()
+            return render_template(CHAT_TEMPLATE, connected=False)
+        msg_list = ROOM_CACHE.messages()
+        last_seq = max(ROOM_CACHE.last_seq, msg_list[-1][0] if msg_list else 0)
+
+    # The page then long-polls /chatUpdates for what follows last_seq
+    return render_template(CHAT_TEMPLATE, connected=True, addr=f"{CONNECT_IP}:{CONNECT_PORT}",
+                           messages=chat_messages(msg_list, (CONNECT_IP, CONNECT_PORT)),
+                           last_seq=last_seq)
+
+def chat_messages(msg_list, room):
+    """
+    Prepares messages for the chat page.
+
+    :param msg_list (list): (seq, sender, text) of the messages.
+    :param room (tuple): (ip, port) of the host, whose messages show apart.
+
+    :rtype list: dict of seq, sender, content and role (host or user).
+    """
+    messages = []
+    for seq, sender, content in msg_list:
+        ip, _, port = (sender or "").partition(":")
+        host = ip == room[0] and port == str(room[1])
+        messages.append({"seq": seq, "sender": sender, "content": content,
+                         "role": "host" if host else "user"})
+    return messages
+
+@app.route("/chatUpdates", methods=["GET"])
+async def chat_updates(headers, body, query):
+    """
+    Long-poll of the chat page.
+
+    ``?since=<seq>&wait=<seconds>`` answers as soon as the room has
+    messages after ``seq``, or after ``wait`` seconds with none::
+
+        {"connected": true, "first_seq": 1, "last_seq": 43, "more": false,
+         "messages": [{"seq": 43, "sender": "10.0.0.2:8001", "content": "hi",
+                       "role": "user"}]}
+
+    ``more`` tells that too many messages followed ``seq`` and the page
+    should be loaded again, as when ``first_seq`` moved past the messages
+    it shows (the room was reset).
+    """
     try:
-        msg_list = []
-        with open("www/chat_form.html", "r") as f:
-            html = f.read()
-        if (PEER_IP == CONNECT_IP and PEER_PORT == CONNECT_PORT):
-            # If host peer, read direct from msg_hist.txt
-            with open(MSG_HIST, "r") as f:
-                msg_list = [line.strip() for line in f if line.strip()]
-        else:
-            # If peer, request chat history from host peer
-            request = (
-                f"GET /getChatHist HTTP/1.1\r\n"
-            )
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.connect((CONNECT_IP, CONNECT_PORT))
-            s.sendall(request.encode())
-            response = s.recv(4096).decode("utf-8")
-            s.close()
-            if response == "Disconnected":
-                html = html.replace("{{addr}}", "Host has disconnected")
-                html = html.replace("{{msgs}}", "")
-                with open("www/chat.html", "w") as f:
-                    f.write(html)
-                return
-            msg_list = [line.strip() for line in response.split('\n') if line.strip()]
-        
-        html = html.replace("{{addr}}", f"Chatroom: {CONNECT_IP}:{CONNECT_PORT}")
-        msgs = ""
-        for msg in msg_list:
-            sender, content = msg.split(" - ")
-            ip, port = sender.split(":")
-            port = int(port)
-            if (ip == CONNECT_IP and port == CONNECT_PORT):
-                msgs += "<div class=\"message-wrapper host\">"
-                msgs += f"<div class=\"name\">{sender}</div>"
-                msgs += f"<div class=\"message host\">{content}</div>"
-                msgs += "</div>"
-            else:
-                msgs += "<div class=\"message-wrapper user\">"
-                msgs += f"<div class=\"name\">{sender}</div>"
-                msgs += f"<div class=\"message user\">{content}</div>"
-                msgs += "</div>"           
-        html = html.replace("{{msgs}}", msgs)
-        with open("www/chat.html", "w") as f:
-            f.write(html)
-        return 200
-    except FileNotFoundError:
-        raise FileNotFoundError
-    
+        since = int(query.get("since", 0))
+        wait = min(float(query.get("wait", POLL_TIMEOUT)), POLL_TIMEOUT)
+    except ValueError:
+        return AppResponse({"error": "since and wait must be numbers"}, status=400)
+    room = connected_room()
+    if room[0] is None:
+        return {"connected": False}
+    if hosting():
+        await HISTORY_CHANGED.wait(since, wait)
+        if not hosting():
+            return {"connected": False}
+        first_seq, last_seq = HISTORY.first_seq, HISTORY.last_seq
+        msg_list = [(m.seq, m.sender, m.text) for m in HISTORY.since(since, CHAT_PAGE_MESSAGES + 1)]
+    else:
+        deadline = time.monotonic() + wait
+        while True:
+            # Another page of this peer may have fetched past since already.
+            remaining = deadline - time.monotonic()
+            if not await sync_room(room, remaining if ROOM_CACHE.cursor(room) <= since else 0):
+                ROOM_CACHE.clear()
+                return {"connected": False}
+            first_seq, last_seq = ROOM_CACHE.first_seq, ROOM_CACHE.last_seq
+            msg_list = ROOM_CACHE.messages(since)
+            if msg_list or last_seq > since or remaining <= 0:
+                break
+    more = len(msg_list) > CHAT_PAGE_MESSAGES
+    return {
+        "connected": True,
+        "first_seq": first_seq,
+        "last_seq": max(last_seq, msg_list[-1][0] if msg_list else 0),
+        "more": more,
+        "messages": [] if more else chat_messages(msg_list, room),
+    }
+
+@app.websocket("/chatSocket")
+async def chat_socket(ws, headers, query):
+    """
+    Full-duplex channel of the chat page, and of guest peers to the host.
+
+    The client sends ``{"message": "..."}`` text messages and receives
+    each message of the room after ``?since=<seq>`` as the JSON object
+    of ``/chatUpdates``. A guest peer relays its pages over one channel to
+    the host, passing its address as ``?sender=<ip:port>``.
+
+    The channel is closed with 1001 when the room closes and with
+    :data:`ROOM_RESET` when it is reset.
+    """
+    try:
+        since = int(query.get("since", 0))
+    except ValueError:
+        await ws.close(CLOSE_POLICY, "since must be an integer")
+        return
+    room = connected_room()
+    if room[0] is None:
+        await ws.close(CLOSE_GOING_AWAY, "not connected")
+    elif hosting():
+        sender = query.get("sender") or "{}:{}".format(PEER_IP, PEER_PORT)
+        pusher = asyncio.ensure_future(push_messages(ws, since, room))
+        try:
+            async for text in ws:
+                try:
+                    msg = json.loads(text).get("message")
+                except (ValueError, AttributeError):
+                    continue
+                if msg:
+                    await append_message(sender, msg)
+        finally:
+            pusher.cancel()
+    else:
+        await relay_to_host(ws, since, room)
+
+async def append_message(sender, text):
+    """
+    Appends a message to the hosted room from an ``async def`` handler.
+
+    The append takes the log lock, writes and may ``fsync``: it runs on a
+    worker thread, not on the handler loop shared by the waiting pages.
+    """
+    await asyncio.get_running_loop().run_in_executor(None, HISTORY.append, sender, text)
+    HISTORY_CHANGED.notify()
+
+async def push_messages(ws, since, room):
+    """
+    Sends the messages of the hosted room after ``since`` as they arrive.
+    """
+    first_seq = HISTORY.first_seq
+    while True:
+        await HISTORY_CHANGED.wait(since, POLL_TIMEOUT)
+        if not hosting():
+            await ws.close(CLOSE_GOING_AWAY, "host has disconnected")
+            return
+        if HISTORY.first_seq != first_seq:
+            await ws.close(ROOM_RESET, "room was reset")
+            return
+        msg_list = [(m.seq, m.sender, m.text) for m in HISTORY.since(since, CHAT_PAGE_MESSAGES)]
+        for message in chat_messages(msg_list, room):
+            # Waits while the client reads slower than the room writes.
+            await ws.send(json.dumps(message))
+            since = message["seq"]
+
+async def relay_to_host(ws, since, room):
+    """
+    Relays a page of a guest peer over a channel to the host.
+    """
+    path = "/chatSocket?since={}&sender={}:{}".format(since, PEER_IP, PEER_PORT)
+    try:
+        upstream = await ws_connect(room[0], room[1], path)
+    except (OSError, ConnectionError) as e:
+        print("[SampleApp] chat socket to {}:{} failed: {}".format(room[0], room[1], e))
+        await ws.close(CLOSE_GOING_AWAY, "host has disconnected")
+        return
+
+    async def downstream():
+        async for message in upstream:
+            await ws.send(message)
+        await ws.close(upstream.close_code or CLOSE_GOING_AWAY, upstream.close_reason)
+
+    task = asyncio.ensure_future(downstream())
+    try:
+        async for message in ws:
+            await upstream.send(message)
+    finally:
+        task.cancel()
+        await upstream.close()
+
+async def sync_room(room, wait=0):
+    """
+    Brings :data:`ROOM_CACHE` up to date with the host of a room.
+
+    :param room (tuple): (ip, port) of the host.
+    :param wait (float): seconds the host may hold the request until a
+                         message newer than the cached ones arrives.
+
+    :rtype bool: False if the host is unreachable or no longer hosts.
+    """
+    since = ROOM_CACHE.cursor(room)
+    if since:
+        path = "/getChatHist?since={}&limit={}".format(since, CHAT_PAGE_MESSAGES)
+        if wait > 0:
+            path += "&wait={}".format(wait)
+    else:
+        path = "/getChatHist?limit={}".format(CHAT_PAGE_MESSAGES)
+    for _ in range(2):
+        try:
+            status, _, content = await http_request_async(room[0], room[1], "GET", path,
+                                                          timeout=wait + 5.0)
+            data = json.loads(content)
+        except (OSError, ValueError) as e:
+            print("[SampleApp] chat history of {}:{} failed: {}".format(room[0], room[1], e))
+            return False
+        if status != 200 or not data.get("connected"):
+            return False
+        if not data["more"]:
+            ROOM_CACHE.merge(room, data, replace=not since)
+            return True
+        # Too far behind for one page, the newest page replaces the cache.
+        path, since = "/getChatHist?limit={}".format(CHAT_PAGE_MESSAGES), 0
+    return False
+
 @app.route("/getChatHist", methods=["GET"])
-def get_chat_hist(headers, body):
-    print("[SampleApp] get chat hist for peer. request headers: {}, request body: {}".format(headers, body))
-    return 200
+async def get_chat_hist(headers, body, query):
+    """
+    Chat history of the hosted room.
+
+    ``?since=<seq>&limit=<n>`` answers JSON with the (at most ``n``)
+    messages after ``seq``, oldest first, and ``?limit=<n>`` alone the
+    newest ``n``::
+
+        {"connected": true, "first_seq": 1, "last_seq": 42, "more": false,
+         "messages": [[41, "10.0.0.2:8001", "hi"], [42, ...]]}
+
+    ``more`` tells that messages after the last one returned remain. With
+    ``&wait=<seconds>`` too, the answer is held until a message after
+    ``seq`` arrives (long-poll). Without a query string, the history is
+    sent as ``sender - text`` lines.
+    """
+    print("[SampleApp] get chat hist for peer. query: {}".format(query))
+    if not query:
+        if not hosting():
+            return AppResponse("Disconnected", content_type="text/plain; charset=utf-8")
+        lines = "".join("{} - {}\n".format(m.sender, m.text) for m in HISTORY.tail(CHAT_PAGE_MESSAGES))
+        return AppResponse(lines, content_type="text/plain; charset=utf-8")
+
+    try:
+        limit = min(int(query.get("limit", CHAT_PAGE_MESSAGES)), CHAT_PAGE_MESSAGES)
+        since = int(query["since"]) if "since" in query else None
+        wait = min(float(query.get("wait", 0)), POLL_TIMEOUT)
+    except ValueError:
+        return AppResponse({"error": "since, limit and wait must be numbers"}, status=400)
+    if limit < 1:
+        return AppResponse({"error": "limit must be positive"}, status=400)
+    if since is not None and wait > 0 and hosting():
+        await HISTORY_CHANGED.wait(since, wait)
+    if not hosting():
+        return {"connected": False}
+
+    # Read before the messages, which then reach at least last_seq.
+    first_seq, last_seq = HISTORY.first_seq, HISTORY.last_seq
+    if since is None:
+        messages, more = HISTORY.tail(limit), False
+    else:
+        # One extra message tells whether another page follows.
+        messages = HISTORY.since(since, limit + 1)
+        more = len(messages) > limit
+        del messages[limit:]
+    return {
+        "connected": True,
+        "first_seq": first_seq,
+        "last_seq": last_seq,
+        "more": more,
+        "messages": [[m.seq, m.sender, m.text] for m in messages],
+    }
 
 #################################
 # Peer-to-peer paradigm
 #################################
 @app.route("/connect", methods=["POST"])
 def connect(headers, body):
-    print("[SampleApp] connect to peer ip:port. request headers: {}, request body: {}".format(headers, body))
-    global CONNECT_IP, CONNECT_PORT
+    print("[SampleApp] connect to peer ip:port")
     data = json.loads(body)
     addr = data.get("address")
-    CONNECT_IP, CONNECT_PORT = addr.split(":")
-    CONNECT_PORT = int(CONNECT_PORT)
+    connect_ip, connect_port = addr.split(":")
+    SESSION.update(connect_ip=connect_ip, connect_port=int(connect_port))
     return 200
 
 @app.route("/sendMsg", methods=["POST"])
-def send_msg(headers, body):
-    print("[SampleApp] send msg to {}:{}. request headers: {}, request body: {}".format(CONNECT_IP, CONNECT_PORT, headers, body))
+async def send_msg(headers, body):
+    CONNECT_IP, CONNECT_PORT = connected_room()
+    print("[SampleApp] send msg to {}:{}".format(CONNECT_IP, CONNECT_PORT))
     data = json.loads(body)
     msg = data.get("message")
     if (PEER_IP == CONNECT_IP and PEER_PORT == CONNECT_PORT):
-        try:
-            with open(MSG_HIST, "a") as f:
-                f.write(PEER_IP + ":" + str(PEER_PORT) + " - " + msg + "\n")
-        except FileNotFoundError:
-            raise FileNotFoundError
+        await append_message(PEER_IP + ":" + str(PEER_PORT), msg)
     else:
-        request = (
-            f"POST /receiveMsg HTTP/1.1\r\n"
-            f"\r\n"
+        payload = (
             f"sender: {PEER_IP}:{PEER_PORT}\r\n"
             f"message: {msg}\r\n"
         )
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((CONNECT_IP, CONNECT_PORT))
-        s.sendall(request.encode())
-        s.close()
+        await http_request_async(CONNECT_IP, CONNECT_PORT, "POST", "/receiveMsg", payload)
     return 200
     
 @app.route("/receiveMsg", methods=["POST"])
 def receive_msg(headers, body):
-    print("[SampleApp] receive msg. request headers: {}, request body: {}".format(headers, body))
+    print("[SampleApp] receive msg")
     lines = body.split('\r\n')
     data = {}
     for line in lines:
@@ -200,117 +580,72 @@ def receive_msg(headers, body):
             data[key.lower()] = val
     sender = data.get("sender")
     msg = data.get("message")
-    try:
-        with open(MSG_HIST, "a") as f:
-            f.write(sender + " - " + msg + "\n")
-    except FileNotFoundError:
-        raise FileNotFoundError
+    HISTORY.append(sender, msg)
+    HISTORY_CHANGED.notify()
     return 200
 
 #################################
 # Client-server paradigm
 #################################
 @app.route("/submitInfo", methods=["POST"])
-def submit_info(headers, body):
+async def submit_info(headers, body):
     # Peer function
     # Peer call this to forward its info to tracker and open a chatroom
-    print("[SampleApp] This peer submit info to tracker. request headers: {}, request body: {}".format(headers, body))
-    global CONNECT_IP, CONNECT_PORT
-    CONNECT_IP = PEER_IP
-    CONNECT_PORT = PEER_PORT
-    try:
-        open(MSG_HIST, "w").close()
-    except FileNotFoundError:
-        raise FileNotFoundError
+    print("[SampleApp] This peer submit info to tracker")
+    SESSION.update(connect_ip=PEER_IP, connect_port=PEER_PORT)
+    HISTORY.reset()
+    HISTORY_CHANGED.release()
     # Make socket connection and send request to tracker
-    request = (
-        f"POST /addInfo HTTP/1.1\r\n"
-        f"\r\n"
-        f"{PEER_IP}:{PEER_PORT}\r\n"
-    )
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.connect((SERVER_IP, SERVER_PORT))
-    s.sendall(request.encode())
-    s.close()
+    payload = f"{PEER_IP}:{PEER_PORT}\r\n"
+    await http_request_async(SERVER_IP, SERVER_PORT, "POST", "/addInfo", payload)
     return 200
 
 @app.route("/addInfo", methods=["POST"])
 def add_info(headers, body):
     # tracker function
     # tracker call this when receive peer request to add peer info to its list
-    print("[SampleApp] tracker receive peer info and save to list. request headers: {}, request body: {}".format(headers, body))
+    print("[SampleApp] tracker receive peer info and save to list")
     addr = body
     try:
-        with open(PEER_LIST, "r") as f:
-            saved_peer = [line.strip() for line in f if line.strip()]
-        if addr not in saved_peer:
-            with open(PEER_LIST, "a") as f:
-                f.write(addr + "\n")
+        with locked(PEER_LIST):
+            with open(PEER_LIST, "r") as f:
+                saved_peer = [line.strip() for line in f if line.strip()]
+            if addr not in saved_peer:
+                with open(PEER_LIST, "a") as f:
+                    f.write(addr + "\n")
     except FileNotFoundError:
         raise FileNotFoundError
     return 200
 
 @app.route("/getList", methods=["GET"])
-def get_list(headers, body):
+async def get_list(headers, body):
     # Peer function
     # Peer call this to forward its request to get peer_list from tracker
-    print("[SampleApp] This peer request list of active peer. request headers: {}, request body: {}".format(headers, body))
-    # Make socket connection and send request to tracker
-    request = (
-        f"GET /returnList HTTP/1.1\r\n"
-    )
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.connect((SERVER_IP, SERVER_PORT))
-    s.sendall(request.encode())
-    response = s.recv(4096)
-    s.close()
-    # Take response content (from /returnList of tracker) and write to this peer's index.html
-    try:
-        with open("www/index.html", "w") as f:
-            f.write(response.decode("utf-8"))
-    except FileNotFoundError:
-        raise FileNotFoundError
-    return 200
+    print("[SampleApp] This peer request list of active peer")
+    # Request the rendered peer list from tracker and pass it on
+    status, _, response = await http_request_async(SERVER_IP, SERVER_PORT, "GET", "/returnList")
+    return AppResponse(response.decode("utf-8"), status=status)
 
 @app.route("/returnList", methods=["GET"])
 def return_list(headers, body):
     # tracker function
     # tracker call this when receive peer request to get peer list
-    try:
-        with open(PEER_LIST, 'r') as f:
-            pl = [line.strip() for line in f if line.strip()]
-        with open("www/index_form.html", "r") as f:
-            html = f.read()
-        items = "".join(f"<option value=\"{p}\">{p}</option>" for p in pl)
-        html = html.replace("{{ip_list}}", items)
-        with open("www/index.html", "w") as f:
-            f.write(html)
-    except FileNotFoundError:
-        raise FileNotFoundError
-    return 200
+    with locked(PEER_LIST), open(PEER_LIST, 'r') as f:
+        pl = [line.strip() for line in f if line.strip()]
+    return render_index(pl)
 
 @app.route("/disconnect", methods=["DELETE"])
-def disconnect(headers, body):
-    print("[SampleApp] disconnect. request headers: {}, request body: {}".format(headers, body))
+async def disconnect(headers, body):
+    print("[SampleApp] disconnect")
     # If host peer, send request to delete itself from tracker peer list
-    global CONNECT_IP, CONNECT_PORT
+    CONNECT_IP, CONNECT_PORT = connected_room()
     if (PEER_IP == CONNECT_IP and PEER_PORT == CONNECT_PORT):
-        request = (
-            f"DELETE /deleteInfo HTTP/1.1\r\n"
-            f"\r\n"
-            f"{PEER_IP}:{PEER_PORT}\r\n"
-        )
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((SERVER_IP, SERVER_PORT))
-        s.sendall(request.encode())
-        s.close()
-    CONNECT_IP = None
-    CONNECT_PORT = None
-    try:
-        with open(MSG_HIST, "w") as f:
-            f.write("Disconnected")
-    except FileNotFoundError:
-        raise FileNotFoundError
+        payload = f"{PEER_IP}:{PEER_PORT}\r\n"
+        await http_request_async(SERVER_IP, SERVER_PORT, "DELETE", "/deleteInfo", payload)
+    SESSION.update(connect_ip=None, connect_port=None)
+    # Peers asking for the history are now told "Disconnected"
+    HISTORY.reset()
+    HISTORY_CHANGED.release()
     return 200
     
 
@@ -318,24 +653,40 @@ def disconnect(headers, body):
 def delete_info(headers, body):
     # tracker function
     # tracker call this when receive peer request to add peer info to its list
-    print("[SampleApp] tracker delete peer info from the list. request headers: {}, request body: {}".format(headers, body))
+    print("[SampleApp] tracker delete peer info from the list")
     deladdr = body.strip()
     try:
-        with open(PEER_LIST, "r") as f:
-            saved_peer = [line.strip() for line in f if line.strip()]
-        with open(PEER_LIST, "w") as f:
-            for addr in saved_peer:
-                if addr != deladdr:
-                    f.write(addr + "\n")      
+        with locked(PEER_LIST):
+            with open(PEER_LIST, "r") as f:
+                saved_peer = [line.strip() for line in f if line.strip()]
+            with open(PEER_LIST, "w") as f:
+                for addr in saved_peer:
+                    if addr != deladdr:
+                        f.write(addr + "\n")
     except FileNotFoundError:
         raise FileNotFoundError
     return 200
 
+def server_stats(headers, body):
+    """
+    Reports the worker pool of the process that answers, in the ``pool``
+    mode: queue depth, busy workers, shed connections and queue wait.
+    Registered as ``GET /serverStats`` with ``--stats`` only.
+    """
+    return {"pid": os.getpid(), "pool": serving_stats()}
+
 if __name__ == "__main__":
     # Parse command-line arguments to configure server IP and port
     parser = argparse.ArgumentParser(prog='Backend', description='', epilog='Beckend daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PORT)
+    parser.add_argument('--mode', choices=['thread', 'eventloop', 'pool'], default='thread')
+    parser.add_argument('--backlog', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--pool-size', type=int, default=WORKER_POOL_SIZE)
+    parser.add_argument('--queue-size', type=int, default=ACCEPT_QUEUE_SIZE)
+    parser.add_argument('--stats', action='store_true',
+                        help='serve the worker pool counters at /serverStats')
  
     args = parser.parse_args()
     SERVER_IP = args.server_ip
@@ -357,11 +708,16 @@ if __name__ == "__main__":
     # Delete existing peer list file before start
     try:
         open(PEER_LIST, "w").close()
-        with open(MSG_HIST, "w") as f:
-            f.write("Disconnected")
+        HISTORY.reset()
+        SESSION.reset()
     except FileNotFoundError:
         raise FileNotFoundError
 
+    if args.stats:
+        app.route("/serverStats", methods=["GET"])(server_stats)
+
     # Prepare and launch the RESTful application
     app.prepare_address(PEER_IP, PEER_PORT)
-    app.run()
\ No newline at end of file
+    # Workers are forked after the files above were reset.
+    app.run(mode=args.mode, backlog=args.backlog, workers=args.workers,
+            pool_size=args.pool_size, queue_size=args.queue_size)
\ No newline at end of file